@@ -0,0 +1,161 @@
+"""
+Admission control for polling storms.
+
+Clients poll rooms every 2 seconds, so after a network blip a whole
+classroom reconnects at once and their polls line up. AdmissionControl
+caps how many requests are in flight, in the whole process and per room,
+and turns the excess away before it reaches MongoDB.
+
+Polling GETs are shed first: they are only admitted while there is
+headroom (ADMISSION_POLL_SHARE of each limit), so mutations such as moves
+and timer updates keep getting through. A shed request gets a 503 when the
+process is full or a 429 when its room is, with a Retry-After that is
+jittered so the retries don't line up again.
+"""
+import random
+import re
+from collections import Counter
+from os import getenv
+from typing import Optional
+
+from starlette.responses import JSONResponse
+
+ADMISSION_MAX_IN_FLIGHT = int(getenv("ADMISSION_MAX_IN_FLIGHT", "200"))
+ADMISSION_MAX_ROOM_IN_FLIGHT = int(
+    getenv("ADMISSION_MAX_ROOM_IN_FLIGHT", "40"))
+ADMISSION_POLL_SHARE = float(getenv("ADMISSION_POLL_SHARE", "0.75"))
+# Retry-After is drawn from [RETRY_AFTER_SECONDS,
+# RETRY_AFTER_SECONDS + RETRY_AFTER_JITTER_SECONDS]
+RETRY_AFTER_SECONDS = int(getenv("ADMISSION_RETRY_AFTER_SECONDS", "2"))
+RETRY_AFTER_JITTER_SECONDS = int(
+    getenv("ADMISSION_RETRY_AFTER_JITTER_SECONDS", "3"))
+
+POLLING_METHODS = frozenset({"GET", "HEAD"})
+# Probes and monitoring must answer even when the process is overloaded
+EXEMPT_PATHS = re.compile(r"^/(health|readyz|livez|metrics)(/|$)")
+ROOM_PATH = re.compile(r"^/rooms/(?!create$)([^/]+)")
+
+
+def room_of(path: str) -> Optional[str]:
+    """The room code a request path refers to, if any."""
+    match = ROOM_PATH.match(path)
+    # Routes upper-case room codes, so abc123 and ABC123 are one room
+    return match.group(1).upper() if match else None
+
+
+class AdmissionControl:
+    """In-flight counters, limits and counts of shed requests"""
+
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT,
+                 max_room_in_flight: int = ADMISSION_MAX_ROOM_IN_FLIGHT,
+                 poll_share: float = ADMISSION_POLL_SHARE):
+        self.max_in_flight = max_in_flight
+        self.max_room_in_flight = max_room_in_flight
+        self.poll_share = poll_share
+        self.in_flight = 0
+        self.room_in_flight = Counter()
+        self.admitted = 0
+        self.shed = Counter()
+
+    def _limit(self, limit: int, polling: bool) -> int:
+        return max(1, int(limit * self.poll_share)) if polling else limit
+
+    def admit(self, room: Optional[str], polling: bool) -> Optional[str]:
+        """
+        Take a slot for a request, or return why it was shed: "global" if
+        the process is full, "room" if its room is. Admitted requests must
+        be passed to release() when they finish.
+        """
+        kind = "poll" if polling else "mutation"
+        if self.in_flight >= self._limit(self.max_in_flight, polling):
+            self.shed["global", kind] += 1
+            return "global"
+        if room is not None and self.room_in_flight[room] >= self._limit(
+                self.max_room_in_flight, polling):
+            self.shed["room", kind] += 1
+            return "room"
+
+        self.in_flight += 1
+        if room is not None:
+            self.room_in_flight[room] += 1
+        self.admitted += 1
+        return None
+
+    def release(self, room: Optional[str]):
+        """Give back the slot taken by admit()."""
+        self.in_flight -= 1
+        if room is not None:
+            self.room_in_flight[room] -= 1
+            if self.room_in_flight[room] <= 0:
+                del self.room_in_flight[room]
+
+    def reset(self):
+        """Forget shed and admitted counts."""
+        self.admitted = 0
+        self.shed = Counter()
+
+    def snapshot(self) -> dict:
+        """Limits, current use and shed counts for this process."""
+        shed = {"global": {"poll": 0, "mutation": 0},
+                "room": {"poll": 0, "mutation": 0}}
+        for (reason, kind), count in self.shed.items():
+            shed[reason][kind] = count
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_room_in_flight": self.max_room_in_flight,
+            "poll_share": self.poll_share,
+            "in_flight": self.in_flight,
+            "busiest_room_in_flight": max(self.room_in_flight.values(),
+                                          default=0),
+            "admitted": self.admitted,
+            "shed": shed,
+        }
+
+
+admission_control = AdmissionControl()
+
+
+def retry_after_seconds() -> int:
+    """A jittered Retry-After, so shed clients don't retry in lockstep."""
+    return random.randint(RETRY_AFTER_SECONDS,
+                          RETRY_AFTER_SECONDS + RETRY_AFTER_JITTER_SECONDS)
+
+
+def shed_response(reason: str) -> JSONResponse:
+    """429 for a busy room, 503 for a busy process."""
+    retry_after = retry_after_seconds()
+    if reason == "room":
+        status_code, detail = 429, "Too many requests for this room"
+    else:
+        status_code, detail = 503, "Server is busy"
+    # Spread the hint below one second too, for clients that can use it
+    retry_after_ms = retry_after * 1000 + random.randint(0, 999)
+    return JSONResponse(
+        {"detail": detail, "retry_after_ms": retry_after_ms},
+        status_code=status_code,
+        headers={"Retry-After": str(retry_after)})
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware that admits or sheds each HTTP request."""
+
+    def __init__(self, app, control: AdmissionControl = admission_control):
+        self.app = app
+        self.control = control
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] == "OPTIONS"
+                or EXEMPT_PATHS.match(scope["path"])):
+            await self.app(scope, receive, send)
+            return
+
+        room = room_of(scope["path"])
+        reason = self.control.admit(
+            room, polling=scope["method"] in POLLING_METHODS)
+        if reason is not None:
+            await shed_response(reason)(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.control.release(room)
@@ -1,9 +1,11 @@
 """fast api logic"""
+import logging
 from datetime import datetime, timedelta, timezone
-from typing import Dict
+from typing import Dict, Optional
 
 from bson import ObjectId
-from fastapi import APIRouter, Body, Depends, FastAPI, HTTPException, status
+from fastapi import (APIRouter, Body, Depends, FastAPI, Header, HTTPException,
+                     Response, status)
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
@@ -14,13 +16,37 @@ from backend.app.models import (AcceptUser, Boards, Circumstance, DenyUser,
                                  GenerateCodeRequest, LayerData, LoginRequest,
                                  Points, RegisterRequest, RemoveCodeRequest,
                                  RenewRequest, Room, Team, UserData)
+from backend.app.hashing import password_hasher
 from backend.app.security import (create_access_token,
-                                   get_current_active_user, get_password_hash,
-                                   verify_password)
-
-from .db import db
-
-router = APIRouter()
+                                   get_current_active_user,
+                                   get_current_admin_user)
+
+from .admission import admission_control
+from .bandwidth import room_bandwidth
+from .cache import CACHE_TTL_SECONDS, CachedQuery
+from .db import async_db, pool_snapshot
+from .deadlines import request_timeout
+from .health import health_monitor
+from .jobs import job_history
+from .loop_monitor import loop_monitor
+from .metrics import METRICS_CONTENT_TYPE, render
+from .profiling import profile_store
+from .server_timing import TimedJSONResponse, TimingRoute
+from .threadpool import threadpool_statistics
+from .warmup import readiness
+from .write_behind import RevisionConflict, write_buffer
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=TimingRoute,
+                   default_response_class=TimedJSONResponse)
+
+board_templates = CachedQuery(
+    lambda: async_db.boards.find(projection={"_id": False}).to_list(),
+    CACHE_TTL_SECONDS)
+instructions = CachedQuery(
+    lambda: async_db.instructions.find_one({"id": "0"}, {"_id": 0}),
+    CACHE_TTL_SECONDS)
 
 
 @router.get("/", tags=["root"])
@@ -29,9 +55,9 @@ async def read_root() -> dict:
 
 
 @router.get("/items", response_model=Points)
-def get_items():
+async def get_items():
     """Get current energy points"""
-    energy_points = list(db.points.find({}, {"_id": 0}))
+    energy_points = await async_db.points.find({}, {"_id": 0}).to_list()
     return energy_points[0]
 
 
@@ -40,28 +66,28 @@ class ChangePoints(BaseModel):
 
 
 @router.put("/items", response_model=Points)
-def update_points(data: ChangePoints):
+async def update_points(data: ChangePoints):
     """update points in databse"""
-    db.points.update_one(
+    await async_db.points.update_one(
         {"id": "0"}, {"$inc": {"values": data.change}}, upsert=True)
-    updated_points = db.points.find_one({"id": "0"}, {"_id": 0})
+    updated_points = await async_db.points.find_one({"id": "0"}, {"_id": 0})
     return updated_points
 
 
 @router.put("/save_board")
-def save_board(
+async def save_board(
     data: Boards,
     current_user: dict = Depends(get_current_active_user)
 ):
     """Save a board configuration for the current user."""
     email = current_user["email"]
-    result = db.users.update_one(
+    result = await async_db.users.update_one(
         {"email": email, "boards.name": data.name},
         {"$set": {"boards.$": data.model_dump()}}
     )
 
     if result.matched_count == 0:
-        db.users.update_one(
+        await async_db.users.update_one(
             {"email": email},
             {"$push": {"boards": data.model_dump()}}
         )
@@ -76,13 +102,14 @@ class NewBoard(BaseModel):
 
 
 @router.put("/save_default_board")
-def save_default_board(data: NewBoard):
+async def save_default_board(data: NewBoard):
     """Save a default board template."""
-    db.boards.update_one({"name": data.name},
-                         {"$set": {"name": data.name,
-                                   "circumstances": data.circumstances,
-                                   "ringData": data.ringData}},
-                         upsert=True)
+    await async_db.boards.update_one({"name": data.name},
+                                     {"$set": {"name": data.name,
+                                               "circumstances": data.circumstances,
+                                               "ringData": data.ringData}},
+                                     upsert=True)
+    board_templates.invalidate()
     return {"message": "Board saved successfully"}
 
 
@@ -91,13 +118,13 @@ class DeleteBoard(BaseModel):
 
 
 @router.delete("/delete")
-def delete_board(
+async def delete_board(
     data: DeleteBoard,
     current_user: dict = Depends(get_current_active_user)
 ):
     """Delete a board from the current user's collection."""
     email = current_user["email"]
-    db.users.update_one(
+    await async_db.users.update_one(
         {"email": email},
         {"$pull": {"boards": {"name": data.name}}}
     )
@@ -105,22 +132,23 @@ def delete_board(
 
 
 @router.get("/load_boards")
-def load_boards(current_user: dict = Depends(get_current_active_user)):
+async def load_boards(current_user: dict = Depends(get_current_active_user)):
     """Load all boards available to the current user."""
     email = current_user["email"]
-    boards = list(db.boards.find(projection={"_id": False}))
-    user = db.users.find_one({"email": email}, {"_id": 0, "boards": 1})
+    boards = await board_templates.get()
+    user = await async_db.users.find_one({"email": email}, {"_id": 0, "boards": 1})
     if not user["boards"]:
         return boards
     return boards + user["boards"]
 
 
 @router.get("/health", tags=["health"])
+@request_timeout(2000)
 async def health_check():
     """Health check endpoint to verify backend is running"""
 
     try:
-        db.client.server_info()
+        await async_db.client.server_info()
 
         return {
             "status": "healthy",
@@ -133,10 +161,103 @@ async def health_check():
         }
 
 
+@router.get("/livez", tags=["health"])
+async def liveness_check():
+    """The process is up and its event loop answers. No I/O."""
+    return {"status": "alive"}
+
+
+@router.get("/readyz", tags=["health"])
+async def readiness_check(response: Response):
+    """
+    Ready for traffic only once this worker has finished warming up. The
+    database status is refreshed in the background, not per request, so a
+    MongoDB outage shows here without taking every pod out of service.
+    """
+    if not readiness.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {**readiness.snapshot(), "database": health_monitor.snapshot()}
+
+
+@router.get("/health/pool", tags=["health"])
+async def pool_stats():
+    """MongoDB connection pool counters for this process"""
+    return pool_snapshot()
+
+
+@router.get("/health/hashing", tags=["health"])
+async def hashing_stats():
+    """Password hashing pool counters for this process"""
+    return password_hasher.snapshot()
+
+
+@router.get("/health/threadpool", tags=["health"])
+async def threadpool_stats():
+    """Threadpool capacity, current use and per-route waits for a thread"""
+    return threadpool_statistics.snapshot()
+
+
+@router.get("/health/loop", tags=["health"])
+async def loop_stats():
+    """Event loop lag and blocking calls seen by this worker"""
+    return loop_monitor.snapshot()
+
+
+@router.get("/health/admission", tags=["health"])
+async def admission_stats():
+    """Admission limits, requests in flight and shed request counts"""
+    return admission_control.snapshot()
+
+
+@router.get("/metrics", tags=["health"], include_in_schema=False)
+def metrics():
+    """Prometheus metrics for this pod's workers"""
+    # Sync, so reading the multiprocess files happens in the threadpool
+    return Response(render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@router.get("/admin/profiles/{profile_id}", tags=["admin"])
+async def get_profile(
+    profile_id: str,
+    download: bool = False,
+    current_user: dict = Depends(get_current_admin_user)  # pylint: disable=unused-argument
+):
+    """A request profile: a text report, or the .prof file to download"""
+    profile = await profile_store.load(profile_id)
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    if download:
+        return Response(
+            bytes(profile["pstats"]), media_type="application/octet-stream",
+            headers={"Content-Disposition":
+                     f'attachment; filename="profile-{profile_id}.prof"'})
+    return Response(profile["report"], media_type="text/plain")
+
+
+@router.get("/admin/jobs", tags=["admin"])
+async def get_job_history(
+    current_user: dict = Depends(get_current_admin_user)  # pylint: disable=unused-argument
+):
+    """Recent runs of each scheduled job, and any alerts about them"""
+    return await job_history.recent()
+
+
+@router.get("/admin/rooms/bandwidth", tags=["admin"])
+async def get_room_bandwidth(
+    limit: int = 50,
+    current_user: dict = Depends(get_current_admin_user)  # pylint: disable=unused-argument
+):
+    """The rooms served the most response bytes, most first"""
+    return await room_bandwidth.top(limit)
+
+
 @router.get("/instructions")
-def load_instructions():
+async def load_instructions():
     """Load instructions from database"""
-    instructions_doc = db.instructions.find_one({"id": "0"}, {"_id": 0})
+    instructions_doc = await instructions.get()
     if instructions_doc:
         return instructions_doc
     return {"instructions": "No instructions found."}
@@ -148,10 +269,10 @@ def load_instructions():
 
 
 @router.post("/login")
-def login(form_data: LoginRequest):
+async def login(form_data: LoginRequest):
     """Authenticate a user and return an access token."""
-    user_in_db = db.users.find_one({"email": form_data.email})
-    user_access_code = db.codes.find_one({"usedByUser": form_data.email})
+    user_in_db = await async_db.users.find_one({"email": form_data.email})
+    user_access_code = await async_db.codes.find_one({"usedByUser": form_data.email})
 
     if not user_in_db:
         raise HTTPException(
@@ -175,12 +296,11 @@ def login(form_data: LoginRequest):
     user = UserData(email=user_in_db["email"], password=user_in_db["password"],
                     role=user_in_db["role"])
 
-    if not verify_password(form_data.password, user.password):
+    if not await password_hasher.verify(form_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
         )
-    print("Past the if statements!")
     access_token = create_access_token(
         data={"sub": user.email, "role": user.role}
     )
@@ -191,9 +311,9 @@ def login(form_data: LoginRequest):
 
 
 @router.post("/register")
-def register(form_data: RegisterRequest):
+async def register(form_data: RegisterRequest):
     """Register a new user with an access code."""
-    user_in_db = db.users.find_one({"email": form_data.email})
+    user_in_db = await async_db.users.find_one({"email": form_data.email})
 
     if user_in_db:
         raise HTTPException(
@@ -201,7 +321,7 @@ def register(form_data: RegisterRequest):
             detail="Email already in use"
         )
 
-    unactivated_code = db.codes.find_one({"code": form_data.code})
+    unactivated_code = await async_db.codes.find_one({"code": form_data.code})
 
     if not unactivated_code:
         raise HTTPException(
@@ -209,35 +329,35 @@ def register(form_data: RegisterRequest):
             detail="Incorrect activation code"
         )
 
-    hashed_password = get_password_hash(form_data.password)
+    hashed_password = await password_hasher.hash(form_data.password)
     user = UserData(
         email=form_data.email,
         password=hashed_password).model_dump()
 
-    db.users.update_one({"email": user["email"]},
-                        {"$set": user}, upsert=True)
+    await async_db.users.update_one({"email": user["email"]},
+                                    {"$set": user}, upsert=True)
 
     activated_code = activate_code(
         unactivated_code,
         user["email"]).model_dump()
 
-    db.codes.update_one({"code": activated_code["code"]},
-                        {"$set": activated_code}, upsert=True)
+    await async_db.codes.update_one({"code": activated_code["code"]},
+                                    {"$set": activated_code}, upsert=True)
 
 
 @router.post("/renew-access")
-def renew_access(form_data: RenewRequest):
+async def renew_access(form_data: RenewRequest):
     """Renew a user's access with a new access code."""
-    user_in_db = db.users.find_one({"email": form_data.email})
+    user_in_db = await async_db.users.find_one({"email": form_data.email})
 
-    if not user_in_db or not verify_password(
+    if not user_in_db or not await password_hasher.verify(
             form_data.password, user_in_db["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
 
-    new_code = db.codes.find_one({"code": form_data.new_code, "isUsed": False})
+    new_code = await async_db.codes.find_one({"code": form_data.new_code, "isUsed": False})
     if not new_code:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -246,7 +366,7 @@ def renew_access(form_data: RenewRequest):
 
     updated_code = activate_code(new_code, form_data.email).model_dump()
 
-    db.codes.update_one(
+    await async_db.codes.update_one(
         {"code": new_code["code"]},
         {"$set": updated_code}
     )
@@ -255,7 +375,7 @@ def renew_access(form_data: RenewRequest):
 
 
 @router.post("/generate_access_code")
-def generate_access_code(
+async def generate_access_code(
     data: GenerateCodeRequest,
     current_user: dict = Depends(get_current_active_user)
 ):
@@ -263,29 +383,28 @@ def generate_access_code(
     while True:
         new_code = generate_new_access_code(valid_for)
 
-        code_in_db = db.codes.find_one({"code": new_code.code})
+        code_in_db = await async_db.codes.find_one({"code": new_code.code})
 
         if not code_in_db:
             break
 
     code_data_dict = new_code.model_dump()
-    db.codes.update_one(
+    await async_db.codes.update_one(
         {"code": code_data_dict["code"]},
         {"$set": code_data_dict},
         upsert=True)
 
 
 @router.delete("/remove_access_code")
-def remove_access_code(
+async def remove_access_code(
     data: RemoveCodeRequest,
     current_user: dict = Depends(get_current_active_user)
 ):
-    db.codes.delete_one({"code": data.code})
+    await async_db.codes.delete_one({"code": data.code})
 
 
 @router.get("/users/me", tags=["auth"])
-def read_current_user(current_user: dict = Depends(get_current_active_user)):
-    print(current_user)
+async def read_current_user(current_user: dict = Depends(get_current_active_user)):
     return current_user
 
 
@@ -295,7 +414,7 @@ def read_current_user(current_user: dict = Depends(get_current_active_user)):
 
 
 @router.get("/timer")
-def get_time(site: str = "game"):
+async def get_time(site: str = "game"):
     """Get timer information for a specific site."""
     durations = {"lobby": 5 * 60, "game": 30 * 60}
 
@@ -310,26 +429,186 @@ def get_time(site: str = "game"):
     }
 
 # Room Management Endpoints
+#
+# Rooms and teams carry a "revision" counter that every mutation increments.
+# Reads expose it as an ETag, and writes sent with an If-Match header only
+# apply if nothing else has been written in between; otherwise they get a
+# 409 with the current state. Documents from before revisions existed count
+# as revision 0.
+#
+# Mutations also stamp "last_activity_at" with the server's clock, which the
+# cleanup job uses to expire rooms nobody is using any more.
+
+TEAM_STATE_FIELDS = {
+    "revision": "$$team.revision",
+    "circumstance": "$$team.circumstance",
+    "current_energy": "$$team.current_energy",
+    "gameboard_state": "$$team.gameboard_state"
+}
+ENERGY_UPDATE_ATTEMPTS = 3
+# Database reads of a team a write-behind flush keeps overtaking
+BUFFER_LOAD_ATTEMPTS = 3
+
+
+def _parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Turn an If-Match header into the expected revision (None if unset)."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    tag = if_match.strip().removeprefix("W/").strip('"')
+    try:
+        return int(tag)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid If-Match header"
+        ) from exc
+
+
+def _etag(revision: Optional[int]) -> str:
+    return f'"{revision or 0}"'
+
+
+def _revision_condition(revision: int):
+    # Rooms and teams created before revisions were tracked have no field
+    return {"$in": [0, None]} if revision == 0 else revision
+
+
+def _room_filter(room_code: str, expected: Optional[int]) -> dict:
+    query = {"room_code": room_code.upper()}
+    if expected is not None:
+        query["revision"] = _revision_condition(expected)
+    return query
+
+
+def _team_filter(room_code: str, team_name: str,
+                 expected: Optional[int]) -> dict:
+    if expected is None:
+        return {"room_code": room_code.upper(), "teams.team_name": team_name}
+    return {
+        "room_code": room_code.upper(),
+        "teams": {"$elemMatch": {
+            "team_name": team_name,
+            "revision": _revision_condition(expected)
+        }}
+    }
+
+
+def _conflict(message: str, revision: Optional[int], **current):
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={"message": message, "revision": revision or 0, **current},
+        headers={"ETag": _etag(revision)}
+    )
+
+
+async def _room_write_error(room_code: str, expected: Optional[int],
+                            detail: str = "Room not found") -> HTTPException:
+    """409 if a conditional room write lost a race, otherwise 404."""
+    if expected is not None:
+        room = await async_db.rooms.find_one({"room_code": room_code.upper()}, {"_id": 0})
+        if room and (room.get("revision") or 0) != expected:
+            return _conflict("Room was modified by another request",
+                             room.get("revision"), room=room)
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=detail
+    )
+
+
+async def _team_write_error(room_code: str, team_name: str,
+                            expected: Optional[int]) -> HTTPException:
+    """409 if a conditional team write lost a race, otherwise 404."""
+    if expected is not None:
+        _, team = await _find_team(room_code, team_name, TEAM_STATE_FIELDS)
+        if (team.get("revision") or 0) != expected:
+            return _conflict("Team was modified by another request",
+                             team.get("revision"), team=team)
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Room or team not found"
+    )
+
+
+async def _find_team(room_code: str, team_name: str, team_fields: dict,
+                     room_fields: dict = None):
+    """
+    Fetch a single team from a room without loading the other teams.
+
+    Only the requested team is projected out of the room's teams array
+    (with just the fields given in team_fields), so reads don't transfer
+    and decode every team's gameboard state. Raises 404 if either the
+    room or the team doesn't exist.
+    """
+    matching_teams = {"$filter": {
+        "input": {"$ifNull": ["$teams", []]},
+        "as": "team",
+        "cond": {"$eq": ["$$team.team_name", {"$literal": team_name}]}
+    }}
+    projection = {
+        "_id": 0,
+        "room_code": 1,
+        **(room_fields or {}),
+        "teams": {"$map": {
+            "input": matching_teams,
+            "as": "team",
+            "in": {"team_name": "$$team.team_name", **team_fields}
+        }}
+    }
+
+    room = await async_db.rooms.find_one({"room_code": room_code.upper()}, projection)
+    if not room:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Room not found"
+        )
+
+    team = next((t for t in room.get("teams") or []
+                if t["team_name"] == team_name), None)
+    if not team:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Team not found"
+        )
+
+    return room, team
+
+
+async def _buffered_team_update(room_code: str, team_name: str,
+                                expected: Optional[int], change) -> dict:
+    """Apply a team change through the write-behind buffer."""
+    try:
+        for _ in range(BUFFER_LOAD_ATTEMPTS):
+            team = write_buffer.apply(room_code, team_name, change, expected)
+            if team is not None:
+                return team
+            # load() turns down a read that a flush overtook, and the team
+            # is read again
+            room, current = await _find_team(
+                room_code, team_name, TEAM_STATE_FIELDS, {"_id": 1})
+            write_buffer.load(room_code, team_name, current, room["_id"])
+        team = write_buffer.apply(room_code, team_name, change, expected)
+    except RevisionConflict as exc:
+        raise _conflict(str(exc), exc.team["revision"], team=exc.team) from exc
+    if team is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Team is being saved, try again",
+            headers={"Retry-After": "1"})
+    return team
 
 
 @router.post("/rooms/create")
-def create_room(
+async def create_room(
     room: Room,
     current_user: dict = Depends(get_current_active_user)  # pylint: disable=unused-argument
 ):
     """Create a new game room"""
     try:
-        print("=== CREATE ROOM REQUEST ===")
-        print(f"room_code: {room.room_code}")
-        print(f"gamemaster_name: {room.gamemaster_name}")
-        print(f"board_config type: {type(room.board_config)}")
-        print(f"board_config: {room.board_config}")
-        print(f"time_remaining: {room.time_remaining}")
-        print(f"teams: {room.teams}")
-        print(f"game_started: {room.game_started}")
+        logger.debug("Creating room %s for %s with %d team(s)",
+                     room.room_code, room.gamemaster_name, len(room.teams))
 
         # Check if room already exists
-        existing_room = db.rooms.find_one(
+        existing_room = await async_db.rooms.find_one(
             {"room_code": room.room_code.upper()})
         if existing_room:
             raise HTTPException(
@@ -347,47 +626,53 @@ def create_room(
             "board_config": board_config_data,
             "teams": [],
             "time_remaining": room.time_remaining,
-            "game_started": False
+            "game_started": False,
+            "revision": 0,
+            "last_activity_at": datetime.now(timezone.utc)
         }
 
-        print("=== ROOM DOCUMENT TO INSERT ===")
-        print(room_doc)
-
-        db.rooms.insert_one(room_doc)
+        await async_db.rooms.insert_one(room_doc)
         return {
             "message": "Room created successfully",
             "room_code": room.room_code.upper()
         }
-    except Exception as e:
-        print("=== ERROR CREATING ROOM ===")
-        print(f"Error type: {type(e)}")
-        print(f"Error: {e}")
-        import traceback  # pylint: disable=import-outside-toplevel
-        traceback.print_exc()
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Could not create room %s", room.room_code)
         raise
 
 
 @router.get("/rooms/{room_code}")
-def get_room(room_code: str):
+async def get_room(room_code: str, response: Response):
     """Get room data by room code"""
-    room = db.rooms.find_one({"room_code": room_code.upper()}, {"_id": 0})
+    room = await async_db.rooms.find_one({"room_code": room_code.upper()}, {"_id": 0})
     if not room:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Room not found"
         )
+    if write_buffer.enabled:
+        write_buffer.overlay(room)
+    response.headers["ETag"] = _etag(room.get("revision"))
     return room
 
 
 @router.post("/rooms/{room_code}/teams")
-def add_team(room_code: str, team: Team):
+async def add_team(room_code: str, team: Team, response: Response,
+                   if_match: Optional[str] = Header(None)):
     """Add a team to a room"""
-    room = db.rooms.find_one({"room_code": room_code.upper()})
+    expected = _parse_if_match(if_match)
+    room = await async_db.rooms.find_one({"room_code": room_code.upper()})
     if not room:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Room not found"
         )
+    if expected is not None and (room.get("revision") or 0) != expected:
+        room.pop("_id", None)
+        raise _conflict("Room was modified by another request",
+                        room.get("revision"), room=room)
 
     # Check if team name already exists
     existing_teams = room.get("teams", [])
@@ -406,34 +691,48 @@ def add_team(room_code: str, team: Team):
         "team_name": team.team_name,
         "circumstance": team.circumstance,
         "current_energy": team.current_energy,
-        "gameboard_state": gameboard_data
+        "gameboard_state": gameboard_data,
+        "revision": 0
     }
 
-    db.rooms.update_one(
-        {"room_code": room_code.upper()},
-        {"$push": {"teams": team_doc}}
+    result = await async_db.rooms.update_one(
+        _room_filter(room_code, expected),
+        {"$push": {"teams": team_doc}, "$inc": {"revision": 1},
+         "$currentDate": {"last_activity_at": True}}
     )
 
+    if result.matched_count == 0:
+        raise await _room_write_error(room_code, expected)
+    if expected is not None:
+        response.headers["ETag"] = _etag(expected + 1)
+
     return {"message": "Team added successfully"}
 
 
 @router.delete("/rooms/{room_code}/teams/{team_name}")
-def delete_team(
+async def delete_team(
     room_code: str,
     team_name: str,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_active_user)  # pylint: disable=unused-argument
 ):
     """Delete a team from a room"""
-    result = db.rooms.update_one(
-        {"room_code": room_code.upper()},
-        {"$pull": {"teams": {"team_name": team_name}}}
+    expected = _parse_if_match(if_match)
+    query = _room_filter(room_code, expected)
+    query["teams.team_name"] = team_name
+    result = await async_db.rooms.update_one(
+        query,
+        {"$pull": {"teams": {"team_name": team_name}},
+         "$inc": {"revision": 1},
+         "$currentDate": {"last_activity_at": True}}
     )
 
     if result.modified_count == 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Team not found"
-        )
+        raise await _room_write_error(room_code, expected, "Team not found")
+    write_buffer.discard(room_code, team_name)
+    if expected is not None:
+        response.headers["ETag"] = _etag(expected + 1)
 
     return {"message": "Team deleted successfully"}
 
@@ -443,23 +742,35 @@ class CircumstanceUpdate(BaseModel):
 
 
 @router.put("/rooms/{room_code}/teams/{team_name}/circumstance")
-def update_team_circumstance(
+async def update_team_circumstance(
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
     room_code: str,
     team_name: str,
     update: CircumstanceUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_active_user)  # pylint: disable=unused-argument
 ):
     """Update a team's circumstance"""
-    result = db.rooms.update_one(
-        {"room_code": room_code.upper(), "teams.team_name": team_name},
-        {"$set": {"teams.$.circumstance": update.circumstance}}
+    expected = _parse_if_match(if_match)
+    if write_buffer.enabled:
+        team = await _buffered_team_update(
+            room_code, team_name, expected,
+            lambda _: {"circumstance": update.circumstance})
+        response.headers["ETag"] = _etag(team["revision"])
+        return {"message": "Circumstance updated successfully"}
+
+    result = await async_db.rooms.update_one(
+        _team_filter(room_code, team_name, expected),
+        {"$set": {"teams.$.circumstance": update.circumstance},
+         "$inc": {"revision": 1, "teams.$.revision": 1},
+         "$currentDate": {"last_activity_at": True}}
     )
 
     if result.matched_count == 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Room or team not found"
-        )
+        raise await _team_write_error(room_code, team_name, expected)
+    if expected is not None:
+        response.headers["ETag"] = _etag(expected + 1)
 
     return {"message": "Circumstance updated successfully"}
 
@@ -470,12 +781,15 @@ class TimeUpdate(BaseModel):
 
 
 @router.post("/rooms/{room_code}/time")
-def update_time(
+async def update_time(
     room_code: str,
     time_update: TimeUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_active_user)  # pylint: disable=unused-argument
 ):
     """Update time remaining for a room"""
+    expected = _parse_if_match(if_match)
     update_fields = {"time_remaining": time_update.time_remaining}
 
     # If reset_timer is True, reset the game_started_at timestamp and accumulated_pause_time
@@ -488,78 +802,94 @@ def update_time(
         update_fields["paused_at"] = None
         update_fields["game_paused"] = False
 
-    result = db.rooms.update_one(
-        {"room_code": room_code.upper()},
-        {"$set": update_fields}
+    result = await async_db.rooms.update_one(
+        _room_filter(room_code, expected),
+        {"$set": update_fields, "$inc": {"revision": 1},
+         "$currentDate": {"last_activity_at": True}}
     )
 
     if result.matched_count == 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Room not found"
-        )
+        raise await _room_write_error(room_code, expected)
+    if expected is not None:
+        response.headers["ETag"] = _etag(expected + 1)
 
     return {"message": "Time updated successfully"}
 
 
 @router.post("/rooms/{room_code}/start")
-def start_game(
+async def start_game(
     room_code: str,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_active_user)  # pylint: disable=unused-argument
 ):
     """Start the game for a room"""
-    result = db.rooms.update_one(
-        {"room_code": room_code.upper()},
+    expected = _parse_if_match(if_match)
+    result = await async_db.rooms.update_one(
+        _room_filter(room_code, expected),
         {"$set": {"game_started": True,
                   "game_started_at": datetime.now(timezone.utc).isoformat()
-                  }}
+                  },
+         "$inc": {"revision": 1},
+         "$currentDate": {"last_activity_at": True}}
     )
 
     if result.matched_count == 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Room not found"
-        )
+        raise await _room_write_error(room_code, expected)
+    if expected is not None:
+        response.headers["ETag"] = _etag(expected + 1)
 
     return {"message": "Game started successfully"}
 
 
 @router.post("/rooms/{room_code}/pause")
-def pause_game(
+async def pause_game(
     room_code: str,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_active_user)  # pylint: disable=unused-argument
 ):
     """Pause the game timer for a room"""
-    result = db.rooms.update_one(
-        {"room_code": room_code.upper()},
+    expected = _parse_if_match(if_match)
+    result = await async_db.rooms.update_one(
+        _room_filter(room_code, expected),
         {"$set": {
             "game_paused": True,
             "paused_at": datetime.now(timezone.utc).isoformat()
-        }}
+        },
+         "$inc": {"revision": 1},
+         "$currentDate": {"last_activity_at": True}}
     )
 
     if result.matched_count == 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Room not found"
-        )
+        raise await _room_write_error(room_code, expected)
+    if expected is not None:
+        response.headers["ETag"] = _etag(expected + 1)
 
     return {"message": "Game paused successfully"}
 
 
 @router.post("/rooms/{room_code}/resume")
-def resume_game(
+async def resume_game(
     room_code: str,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_active_user)  # pylint: disable=unused-argument
 ):
     """Resume the game timer for a room"""
-    room = db.rooms.find_one({"room_code": room_code.upper()})
+    expected = _parse_if_match(if_match)
+    room = await async_db.rooms.find_one({"room_code": room_code.upper()})
 
     if not room:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Room not found"
         )
+    revision = room.get("revision") or 0
+    if expected is not None and revision != expected:
+        room.pop("_id", None)
+        raise _conflict("Room was modified by another request",
+                        revision, room=room)
 
     # Calculate accumulated pause time
     accumulated_pause_time = room.get("accumulated_pause_time", 0)
@@ -570,91 +900,95 @@ def resume_game(
         ).total_seconds()
         accumulated_pause_time += int(pause_duration)
 
-    db.rooms.update_one(
-        {"room_code": room_code.upper()},
+    # Conditional on the revision read above so a concurrent pause or
+    # resume can't be overwritten with a stale accumulated pause time
+    result = await async_db.rooms.update_one(
+        _room_filter(room_code, revision),
         {"$set": {
             "game_paused": False,
             "paused_at": None,
             "accumulated_pause_time": accumulated_pause_time
-        }}
+        },
+         "$inc": {"revision": 1},
+         "$currentDate": {"last_activity_at": True}}
     )
 
+    if result.matched_count == 0:
+        raise await _room_write_error(room_code, revision)
+    response.headers["ETag"] = _etag(revision + 1)
+
     return {"message": "Game resumed successfully"}
 
 
 @router.post("/rooms/{room_code}/end")
-def end_game(
+async def end_game(
     room_code: str,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_active_user)  # pylint: disable=unused-argument
 ):
     """End the game for a room"""
-    result = db.rooms.update_one(
-        {"room_code": room_code.upper()},
+    expected = _parse_if_match(if_match)
+    result = await async_db.rooms.update_one(
+        _room_filter(room_code, expected),
         {"$set": {
             "game_started": False,
             "game_paused": False,
             "time_remaining": 0
-        }}
+        },
+         "$inc": {"revision": 1},
+         "$currentDate": {"last_activity_at": True}}
     )
 
     if result.matched_count == 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Room not found"
-        )
+        raise await _room_write_error(room_code, expected)
+    if expected is not None:
+        response.headers["ETag"] = _etag(expected + 1)
 
     return {"message": "Game ended successfully"}
 
 
 @router.post("/rooms/{room_code}/start_comparison")
-def start_comparison(room_code: str):
+async def start_comparison(room_code: str, response: Response,
+                           if_match: Optional[str] = Header(None)):
     """Enable comparison mode for a room"""
-    result = db.rooms.update_one(
-        {"room_code": room_code.upper()},
-        {"$set": {"comparison_mode": True}}
+    expected = _parse_if_match(if_match)
+    result = await async_db.rooms.update_one(
+        _room_filter(room_code, expected),
+        {"$set": {"comparison_mode": True}, "$inc": {"revision": 1},
+         "$currentDate": {"last_activity_at": True}}
     )
 
     if result.matched_count == 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Room not found"
-        )
+        raise await _room_write_error(room_code, expected)
+    if expected is not None:
+        response.headers["ETag"] = _etag(expected + 1)
 
     return {"message": "Comparison mode started"}
 
 
 @router.delete("/rooms/{room_code}")
-def delete_room(room_code: str):
+async def delete_room(room_code: str, if_match: Optional[str] = Header(None)):
     """Delete a room and free the game code"""
-    result = db.rooms.delete_one({"room_code": room_code.upper()})
+    expected = _parse_if_match(if_match)
+    result = await async_db.rooms.delete_one(_room_filter(room_code, expected))
 
     if result.deleted_count == 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Room not found"
-        )
+        raise await _room_write_error(room_code, expected)
+    write_buffer.discard(room_code)
 
     return {"message": "Room deleted successfully"}
 
 
 @router.get("/rooms/{room_code}/teams/{team_name}/mistakes")
-def get_team_mistakes(room_code: str, team_name: str):
+async def get_team_mistakes(room_code: str, team_name: str):
     """Get a list of mistakes (missing required tiles) for a team based on their circumstance"""
-    room = db.rooms.find_one({"room_code": room_code.upper()}, {"_id": 0})
-    if not room:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Room not found"
-        )
-
-    # Find the team
-    team = next((t for t in room.get("teams", [])
-                if t["team_name"] == team_name), None)
-    if not team:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Team not found"
-        )
+    room, team = await _find_team(
+        room_code, team_name,
+        {"circumstance": "$$team.circumstance",
+         "gameboard_state": {"ringData": "$$team.gameboard_state.ringData"}},
+        {"board_config.ringData": 1})
+    team.update(write_buffer.get(room_code, team_name) or {})
 
     # Get the team's circumstance
     circumstance_name = team.get("circumstance")
@@ -702,40 +1036,44 @@ class UpdateTeamBoard(BaseModel):
 
 
 @router.get("/rooms/{room_code}/teams/{team_name}/board")
-def get_team_board(room_code: str, team_name: str):
+async def get_team_board(room_code: str, team_name: str, response: Response):
     """Get a team's board state"""
-    room = db.rooms.find_one({"room_code": room_code.upper()}, {"_id": 0})
-    if not room:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Room not found"
-        )
-
-    # Find the team in the room
-    team = next((t for t in room.get("teams", [])
-                if t["team_name"] == team_name), None)
-    if not team:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Team not found"
-        )
+    team = write_buffer.get(room_code, team_name)
+    if team is None:
+        _, team = await _find_team(
+            room_code, team_name,
+            {"revision": "$$team.revision",
+             "gameboard_state": {
+                 "ringData": "$$team.gameboard_state.ringData"}})
+    response.headers["ETag"] = _etag(team.get("revision"))
 
     return {"ringData": team.get("gameboard_state", {}).get("ringData", [])}
 
 
 @router.put("/rooms/{room_code}/teams/{team_name}/board")
-def update_team_board(room_code: str, team_name: str, data: UpdateTeamBoard):
+async def update_team_board(room_code: str, team_name: str, data: UpdateTeamBoard,
+                            response: Response,
+                            if_match: Optional[str] = Header(None)):
     """Update a team's board state"""
-    result = db.rooms.update_one(
-        {"room_code": room_code.upper(), "teams.team_name": team_name},
-        {"$set": {"teams.$.gameboard_state": data.board_state}}
+    expected = _parse_if_match(if_match)
+    if write_buffer.enabled:
+        team = await _buffered_team_update(
+            room_code, team_name, expected,
+            lambda _: {"gameboard_state": data.board_state})
+        response.headers["ETag"] = _etag(team["revision"])
+        return {"message": "Board updated successfully"}
+
+    result = await async_db.rooms.update_one(
+        _team_filter(room_code, team_name, expected),
+        {"$set": {"teams.$.gameboard_state": data.board_state},
+         "$inc": {"revision": 1, "teams.$.revision": 1},
+         "$currentDate": {"last_activity_at": True}}
     )
 
     if result.matched_count == 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Room or team not found"
-        )
+        raise await _team_write_error(room_code, team_name, expected)
+    if expected is not None:
+        response.headers["ETag"] = _etag(expected + 1)
 
     return {"message": "Board updated successfully"}
 
@@ -745,90 +1083,93 @@ class UpdateTeamEnergy(BaseModel):
 
 
 @router.get("/rooms/{room_code}/teams/{team_name}/energy")
-def get_team_energy(room_code: str, team_name: str):
+async def get_team_energy(room_code: str, team_name: str, response: Response):
     """Get a team's current energy"""
-    room = db.rooms.find_one({"room_code": room_code.upper()}, {"_id": 0})
-    if not room:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Room not found"
-        )
-
-    # Find the team in the room
-    team = next((t for t in room.get("teams", [])
-                if t["team_name"] == team_name), None)
-    if not team:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Team not found"
-        )
+    team = write_buffer.get(room_code, team_name)
+    if team is None:
+        _, team = await _find_team(
+            room_code, team_name,
+            {"revision": "$$team.revision",
+             "current_energy": "$$team.current_energy"})
+    response.headers["ETag"] = _etag(team.get("revision"))
 
     return {"current_energy": team.get("current_energy", 0)}
 
 
 @router.put("/rooms/{room_code}/teams/{team_name}/energy")
-def update_team_energy(room_code: str, team_name: str, data: UpdateTeamEnergy):
+async def update_team_energy(room_code: str, team_name: str, data: UpdateTeamEnergy,
+                             response: Response,
+                             if_match: Optional[str] = Header(None)):
     """Update a team's energy (increment/decrement)"""
-    room = db.rooms.find_one({"room_code": room_code.upper()})
-    if not room:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Room not found"
-        )
-
-    # Find the team in the room
-    team = next((t for t in room.get("teams", [])
-                if t["team_name"] == team_name), None)
-    if not team:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Team not found"
-        )
-
-    # Calculate new energy (ensure it doesn't go below 0)
-    current_energy = team.get("current_energy", 0)
-    new_energy = max(0, current_energy + data.change)
+    expected = _parse_if_match(if_match)
+    if write_buffer.enabled:
+        team = await _buffered_team_update(
+            room_code, team_name, expected,
+            lambda state: {"current_energy": max(
+                0, (state["current_energy"] or 0) + data.change)})
+        response.headers["ETag"] = _etag(team["revision"])
+        return {"current_energy": team["current_energy"]}
+
+    # The new value depends on the current one, so the write is conditional
+    # on the revision it was computed from. Without If-Match a lost race is
+    # simply retried against the fresh value.
+    for _ in range(ENERGY_UPDATE_ATTEMPTS):
+        _, team = await _find_team(
+            room_code, team_name,
+            {"revision": "$$team.revision",
+             "current_energy": "$$team.current_energy"})
+        revision = team.get("revision") or 0
+        if expected is not None and revision != expected:
+            break
 
-    # Update in database
-    result = db.rooms.update_one(
-        {"room_code": room_code.upper(), "teams.team_name": team_name},
-        {"$set": {"teams.$.current_energy": new_energy}}
-    )
+        # Calculate new energy (ensure it doesn't go below 0)
+        current_energy = team.get("current_energy", 0)
+        new_energy = max(0, current_energy + data.change)
 
-    if result.matched_count == 0:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Room or team not found"
+        # Update in database
+        result = await async_db.rooms.update_one(
+            _team_filter(room_code, team_name, revision),
+            {"$set": {"teams.$.current_energy": new_energy},
+             "$inc": {"revision": 1, "teams.$.revision": 1},
+             "$currentDate": {"last_activity_at": True}}
         )
 
-    return {"current_energy": new_energy}
+        if result.matched_count:
+            response.headers["ETag"] = _etag(revision + 1)
+            return {"current_energy": new_energy}
+        if expected is not None:
+            break
+
+    raise await _team_write_error(room_code, team_name,
+                                  expected if expected is not None else revision)
 
 
 @router.put("/accept_user")
-def add_user(
+async def add_user(
     data: AcceptUser,
     current_user: dict = Depends(get_current_active_user)  # pylint: disable=unused-argument
 ):
     """Accept a pending user and assign them a role."""
-    db.users.update_one({"email": data.email},
-                        {"$set": {"role": data.role, "pending": False}},
-                        upsert=True)
+    await async_db.users.update_one({"email": data.email},
+                                    {"$set": {"role": data.role, "pending": False}},
+                                    upsert=True)
 
 
 @router.delete("/remove_user")
-def remove_user(
+async def remove_user(
     data: DenyUser,
     current_user: dict = Depends(get_current_active_user)  # pylint: disable=unused-argument
 ):
     """Remove a user from the system."""
-    db.users.delete_one({"email": data.email})
+    await async_db.users.delete_one({"email": data.email})
 
 
 @router.get("/load_user_data")
-def load_users(current_user: dict = Depends(get_current_active_user)):
+@request_timeout(15000)
+async def load_users(current_user: dict = Depends(get_current_active_user)):
     """Load all users and access codes (admin only)."""
-    users = list(db.users.find(projection={"_id": False, "password": False}))
-    codes = list(db.codes.find(projection={"_id": False}))
+    users = await async_db.users.find(projection={"_id": False, "password": False}).to_list()
+    codes = await async_db.codes.find(projection={"_id": False}).to_list()
     return {"users": users, "codes": codes}
 
 
@@ -838,13 +1179,13 @@ class SaveCircumstance(BaseModel):
 
 
 @router.put("/save_circumstance/{cid}")
-def save_edited_circumstance(
+async def save_edited_circumstance(
     cid: str,
     data: SaveCircumstance,
     current_user: dict = Depends(get_current_active_user)  # pylint: disable=unused-argument
 ):
     """Update an existing circumstance."""
-    db.circumstance.update_one(
+    await async_db.circumstance.update_one(
         {"_id": ObjectId(cid)},
         {"$set": {
             "title": data.title,
@@ -854,38 +1195,38 @@ def save_edited_circumstance(
 
 
 @router.post("/save_circumstance")
-def save_new_circumstance(
+async def save_new_circumstance(
     data: SaveCircumstance,
     current_user: dict = Depends(get_current_active_user)
 ):
     """Create a new circumstance."""
     email = current_user["email"]
-    new_note = db.circumstance.insert_one(
+    new_note = await async_db.circumstance.insert_one(
         {"title": data.title, "description": data.description, "author": email})
-    fetch_new_note = db.circumstance.find_one({"_id": new_note.inserted_id})
+    fetch_new_note = await async_db.circumstance.find_one({"_id": new_note.inserted_id})
     fetch_new_note["_id"] = str(fetch_new_note["_id"])
     return fetch_new_note
 
 
 @router.get("/circumstances")
-def get_circumstances(current_user: dict = Depends(get_current_active_user)):
+async def get_circumstances(current_user: dict = Depends(get_current_active_user)):
     """Get all circumstances for the current user."""
     email = current_user["email"]
-    circumstances = list(db.circumstance.find(
-        {"author": {"$in": ["default", email]}}))
+    circumstances = await async_db.circumstance.find(
+        {"author": {"$in": ["default", email]}}).to_list()
     for c in circumstances:
         c["_id"] = str(c["_id"])
     return circumstances
 
 
 @router.delete("/circumstance/{circumstance_id}")
-def delete_circumstance(
+async def delete_circumstance(
     circumstance_id: str,
     current_user: dict = Depends(get_current_active_user)
 ):
     """Delete a circumstance created by the current user."""
     email = current_user["email"]
-    result = db.circumstance.delete_one(
+    result = await async_db.circumstance.delete_one(
         {"_id": ObjectId(circumstance_id), "author": email})
 
     if result.deleted_count == 0:
@@ -0,0 +1,102 @@
+"""
+Response bytes served per room.
+
+MetricsMiddleware adds the size of each successful room response to
+room_bandwidth. A room code is all it takes to join or change a game, so
+codes never become labels on the public /metrics. Instead the totals are
+flushed every ROOM_BANDWIDTH_FLUSH_SECONDS with $inc into the
+room_bandwidth collection, which adds up every worker and pod, and the
+admin-only /admin/rooms/bandwidth lists the rooms that cost the most.
+Each flush also observes every room's bytes in room_bandwidth_bytes, so
+/metrics shows what a room's polling costs per interval without naming
+any room. Totals expire ROOM_BANDWIDTH_RETENTION_HOURS after a room's
+last flush.
+"""
+import asyncio
+import logging
+import threading
+from collections import Counter
+from os import getenv
+from typing import Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from .db import async_db
+from .metrics import room_bandwidth_bytes
+
+logger = logging.getLogger(__name__)
+
+ROOM_BANDWIDTH_FLUSH_SECONDS = float(
+    getenv("ROOM_BANDWIDTH_FLUSH_SECONDS", "30"))
+ROOM_BANDWIDTH_RETENTION_HOURS = float(
+    getenv("ROOM_BANDWIDTH_RETENTION_HOURS", "24"))
+
+
+class RoomBandwidth:
+    """Bytes served per room, flushed to MongoDB in the background"""
+
+    def __init__(self, flush_seconds: float = ROOM_BANDWIDTH_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._index_created = False
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, room: str, size: int):
+        """Count bytes served for a room."""
+        with self._lock:
+            self._pending[room] += size
+
+    async def flush(self):
+        """Add the bytes counted since the last flush to the totals."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return
+        for size in pending.values():
+            room_bandwidth_bytes.observe(size)
+        try:
+            if not self._index_created:
+                await async_db.room_bandwidth.create_index(
+                    "updated_at",
+                    expireAfterSeconds=int(
+                        ROOM_BANDWIDTH_RETENTION_HOURS * 3600))
+                self._index_created = True
+            await async_db.room_bandwidth.bulk_write([
+                UpdateOne({"_id": room},
+                          {"$inc": {"bytes": size},
+                           "$currentDate": {"updated_at": True}},
+                          upsert=True)
+                for room, size in pending.items()], ordered=False)
+        except PyMongoError as e:
+            logger.warning("Could not save room bandwidth: %s", e)
+            with self._lock:
+                self._pending.update(pending)
+
+    async def top(self, limit: int = 50) -> list:
+        """The rooms that have been served the most bytes."""
+        rooms = await async_db.room_bandwidth.find().sort(
+            "bytes", -1).to_list(limit)
+        return [{"room_code": room["_id"], "bytes": room["bytes"],
+                 "updated_at": room["updated_at"]} for room in rooms]
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+    def start(self):
+        """Start flushing in the background on the running loop."""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop flushing, and flush what is left."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        await self.flush()
+
+
+room_bandwidth = RoomBandwidth()
@@ -0,0 +1,47 @@
+"""
+Short-lived caches for rarely changing documents.
+
+Board templates and game instructions are read on every board load and
+game page, but only change when an admin edits them. CachedQuery keeps a
+query's result for CACHE_TTL_SECONDS and is invalidated by the endpoints
+that write it. Each worker process has its own copy, so an edit made
+through one worker shows up in the others within the TTL.
+"""
+import asyncio
+import copy
+import time
+from os import getenv
+from typing import Awaitable, Callable
+
+CACHE_TTL_SECONDS = float(getenv("CACHE_TTL_SECONDS", "30"))
+
+
+class CachedQuery:
+    """The result of an async query, reused until it expires"""
+
+    def __init__(self, load: Callable[[], Awaitable], ttl_seconds: float):
+        self._load = load
+        self.ttl_seconds = ttl_seconds
+        self._value = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self):
+        """The cached result, loading it first if it is missing or stale."""
+        if time.monotonic() >= self._expires_at:
+            async with self._lock:
+                # Concurrent misses share one load
+                if time.monotonic() >= self._expires_at:
+                    await self.refresh()
+        # Callers may modify what they get back
+        return copy.deepcopy(self._value)
+
+    async def refresh(self):
+        """Load the result now, e.g. to warm the cache at startup."""
+        self._value = await self._load()
+        self._expires_at = time.monotonic() + self.ttl_seconds
+
+    def invalidate(self):
+        """Drop the cached result so the next get() reloads it."""
+        self._value = None
+        self._expires_at = 0.0
@@ -1,39 +1,170 @@
 """Database cleanup tasks for removing old game rooms"""
 import logging
+import time
+from collections import Counter
 from datetime import datetime, timedelta, timezone
+from os import getenv
+
+import pymongo
+from opentelemetry import trace
+from opentelemetry.trace import StatusCode
 
 from backend.app.db import db
+from backend.app.metrics import (cleanup_deleted_rooms, cleanup_duration,
+                                 cleanup_runs)
+from backend.app.tracing import traced
 
 logger = logging.getLogger(__name__)
 
+CLEANUP_TIMEOUT_MS = int(getenv("CLEANUP_TIMEOUT_MS", "60000"))
+CLEANUP_BATCH_SIZE = int(getenv("CLEANUP_BATCH_SIZE", "500"))
+CLEANUP_BATCH_PAUSE_MS = int(getenv("CLEANUP_BATCH_PAUSE_MS", "100"))
+CLEANUP_TIME_BUDGET_SECONDS = float(
+    getenv("CLEANUP_TIME_BUDGET_SECONDS", "300"))
+# Prefix of the documents in the maintenance collection that record where an
+# unfinished run of each policy stopped
+CLEANUP_PROGRESS_ID = "cleanup_old_games"
+
+
+def _hours(env_name: str, default: str) -> timedelta:
+    return timedelta(hours=float(getenv(env_name, default)))
+
+
+# Policy name -> (how long rooms are kept, query for rooms past a cutoff).
+# Started games are aged from game_started_at, an ISO string; the others
+# from last_activity_at, which every room mutation updates.
+EXPIRY_POLICIES = {
+    "started_games": (timedelta(hours=3), lambda cutoff: {
+        # Using $lt (less than) for ISO string comparison works correctly
+        "game_started_at": {"$ne": None, "$lt": cutoff.isoformat()}}),
+    "abandoned_lobbies": (
+        _hours("ROOM_LOBBY_EXPIRY_HOURS", "12"), lambda cutoff: {
+            "game_started_at": None, "last_activity_at": {"$lt": cutoff}}),
+    "finished_games": (
+        _hours("ROOM_FINISHED_EXPIRY_HOURS", "1"), lambda cutoff: {
+            "game_started": False, "game_started_at": {"$ne": None},
+            "comparison_mode": {"$ne": True},
+            "last_activity_at": {"$lt": cutoff}}),
+    "comparison_rooms": (
+        _hours("ROOM_COMPARISON_EXPIRY_HOURS", "2"), lambda cutoff: {
+            "comparison_mode": True, "last_activity_at": {"$lt": cutoff}}),
+}
+
+
+def _expire(policy: str, deadline: float, deleted: Counter) -> tuple:
+    """
+    Delete one policy's expired rooms in batches, resuming an unfinished
+    run. Returns (batches, finished); finished is False if the run's time
+    budget ran out first.
+    """
+    keep_for, expired_query = EXPIRY_POLICIES[policy]
+    progress_id = f"{CLEANUP_PROGRESS_ID}:{policy}"
+    progress = db.maintenance.find_one({"_id": progress_id})
+    if progress:
+        cutoff = datetime.fromisoformat(progress["cutoff"])
+        last_id = progress.get("last_id")
+    else:
+        cutoff = datetime.now(timezone.utc) - keep_for
+        last_id = None
+    expired = expired_query(cutoff)
+
+    batches = 0
+    while True:
+        query = dict(expired)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        with pymongo.timeout(CLEANUP_TIMEOUT_MS / 1000):
+            ids = [room["_id"] for room in db.rooms.find(
+                query, {"_id": 1}).sort("_id", 1).limit(CLEANUP_BATCH_SIZE)]
+            if not ids:
+                break
+            result = db.rooms.delete_many({**expired, "_id": {"$in": ids}})
+            last_id = ids[-1]
+            db.maintenance.update_one(
+                {"_id": progress_id},
+                {"$set": {"cutoff": cutoff.isoformat(), "last_id": last_id}},
+                upsert=True)
+        deleted[policy] += result.deleted_count
+        batches += 1
+        logger.debug("Cleanup batch %d of %s deleted %d room(s)",
+                     batches, policy, result.deleted_count)
+
+        if len(ids) < CLEANUP_BATCH_SIZE:
+            break
+        if time.monotonic() > deadline:
+            return batches, False
+        time.sleep(CLEANUP_BATCH_PAUSE_MS / 1000)
+
+    # Finished this cutoff; the next run starts over with a new one
+    db.maintenance.delete_one({"_id": progress_id})
+    return batches, True
+
 
+def _record_run(result: str, started: float, deleted: Counter):
+    cleanup_runs.labels(result).inc()
+    cleanup_duration.observe(time.monotonic() - started)
+    for policy, count in deleted.items():
+        cleanup_deleted_rooms.labels(policy).inc(count)
+    # The run's span, from @traced
+    span = trace.get_current_span()
+    span.set_attributes({"cleanup.result": result,
+                         "cleanup.deleted": deleted.total(),
+                         **{f"cleanup.deleted.{policy}": count
+                            for policy, count in deleted.items()}})
+    if result == "error":
+        span.set_status(StatusCode.ERROR)
+
+
+@traced("cleanup_old_games")
 def cleanup_old_games():
     """
-    Delete game rooms that started at least 3 hours ago.
-    Uses efficient MongoDB bulk delete operation.
+    Delete expired game rooms: games that started at least 3 hours ago, and
+    lobbies, finished games and comparison rooms that have been idle longer
+    than their EXPIRY_POLICIES allow.
+
+    Rooms are deleted by _id in batches of CLEANUP_BATCH_SIZE with a pause of
+    CLEANUP_BATCH_PAUSE_MS between batches, so cleanup doesn't compete with
+    live games for I/O. A run stops after CLEANUP_TIME_BUDGET_SECONDS; each
+    policy's cutoff and position are saved after every batch, and the next
+    run carries on from there.
+
+    Returns the number of rooms deleted. Errors are logged and raised, so
+    the job history in jobs.py sees the run fail.
     """
+    started = time.monotonic()
+    deadline = started + CLEANUP_TIME_BUDGET_SECONDS
+    deleted = Counter()
+    batches = 0
     try:
-        # Calculate cutoff time (3 hours ago)
-        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=3)
-        cutoff_iso = cutoff_time.isoformat()
+        for policy in EXPIRY_POLICIES:
+            policy_batches, finished = _expire(policy, deadline, deleted)
+            batches += policy_batches
+            if not finished:
+                logger.warning(
+                    "Cleanup stopped after %d batch(es) at its time budget, "
+                    "the next run resumes where it left off", batches)
+                _record_run("partial", started, deleted)
+                return deleted.total()
 
-        # Delete all rooms where game_started_at exists and is older than cutoff
-        # Using $lt (less than) for ISO string comparison works correctly
-        result = db.rooms.delete_many({
-            "game_started_at": {"$ne": None, "$lt": cutoff_iso}
-        })
-
-        deleted_count = result.deleted_count
+        deleted_count = deleted.total()
         if deleted_count > 0:
-            logger.info("Cleaned up %d old game room(s)", deleted_count)
+            logger.info("Cleaned up %d old game room(s) in %d batch(es), "
+                        "%.0f ms (%s)", deleted_count, batches,
+                        (time.monotonic() - started) * 1000,
+                        ", ".join(f"{policy}: {count}"
+                                  for policy, count in deleted.items()))
         else:
             logger.debug("No old game rooms to clean up")
 
+        _record_run("success", started, deleted)
         return deleted_count
 
-    except Exception as e:  # pylint: disable=broad-exception-caught
-        logger.error("Error during game cleanup: %s", e)
-        return 0
+    except Exception as e:
+        logger.error("Error during game cleanup after %d room(s): %s",
+                     deleted.total(), e)
+        _record_run("error", started, deleted)
+        # Raised on so the scheduler's job history records the failure
+        raise
 
 
 def create_cleanup_index():
@@ -44,7 +175,24 @@ def create_cleanup_index():
     try:
         # Create index on game_started_at for fast cleanup queries
         # Sparse index only includes documents where the field exists
-        db.rooms.create_index("game_started_at", sparse=True)
+        with pymongo.timeout(CLEANUP_TIMEOUT_MS / 1000):
+            db.rooms.create_index("game_started_at", sparse=True)
         logger.info("Created index on game_started_at field")
     except Exception as e:  # pylint: disable=broad-exception-caught
         logger.warning("Could not create cleanup index: %s", e)
+
+
+def create_activity_index():
+    """
+    Index last_activity_at for the activity-based expiry policies, and
+    start the clock on rooms created before the field existed.
+    """
+    try:
+        with pymongo.timeout(CLEANUP_TIMEOUT_MS / 1000):
+            db.rooms.create_index("last_activity_at")
+            db.rooms.update_many(
+                {"last_activity_at": {"$exists": False}},
+                {"$currentDate": {"last_activity_at": True}})
+        logger.info("Created index on last_activity_at field")
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logger.warning("Could not create activity index: %s", e)
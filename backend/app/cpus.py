@@ -0,0 +1,57 @@
+"""
+CPUs this process can actually use.
+
+os.cpu_count() is the host's count, and os.sched_getaffinity() only
+follows cpusets. In a container with a CPU limit the kernel enforces it as
+a CFS quota instead, which is read from the cgroup: cpu.max on cgroup v2,
+cpu.cfs_quota_us and cpu.cfs_period_us on v1. This module is imported by
+gunicorn_conf and the hashing pool, so it has no other imports.
+"""
+import math
+import os
+from typing import Optional
+
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, encoding="ascii") as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit() -> Optional[int]:
+    """The cgroup's CPU quota rounded up to whole CPUs, or None if unset."""
+    cpu_max = _read(CGROUP_V2_CPU_MAX)
+    if cpu_max is not None:
+        quota, _, period = cpu_max.partition(" ")
+    else:
+        quota, period = _read(CGROUP_V1_QUOTA), _read(CGROUP_V1_PERIOD)
+    # "max" on v2 and -1 on v1 mean no limit
+    if not quota or not period or quota in ("max", "-1"):
+        return None
+    return max(1, math.ceil(int(quota) / int(period)))
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on, within its cpuset and CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    return min(cpus, limit) if limit else cpus
+
+
+def worker_processes() -> int:
+    """Worker processes serving the app, as gunicorn_conf tells each one."""
+    return int(os.getenv("WEB_CONCURRENCY", "1"))
+
+
+def cpus_per_worker(workers: Optional[int] = None) -> int:
+    """Each worker's share of the available CPUs, at least one."""
+    return max(1, available_cpus() // (workers or worker_processes()))
@@ -1,15 +1,196 @@
 """backend code that handles the mongo database"""
+import threading
 from os import getenv
 from dotenv import load_dotenv
+from pymongo.asynchronous.mongo_client import AsyncMongoClient
 from pymongo.mongo_client import MongoClient
+from pymongo.monitoring import ConnectionPoolListener
 from pymongo.server_api import ServerApi
 
+from .lazy import LazyProxy
+from .query_monitor import query_monitor
+
 load_dotenv()
 uri = getenv("MONGO_URI")
-# Create a new client and connect to the server
-client = MongoClient(uri, server_api=ServerApi('1'))
-# Send a ping to confirm a successful connection
-db = client.get_database()
+
+# Environment variable -> MongoClient keyword. Unset variables keep the
+# driver's default.
+INT_CLIENT_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": "maxPoolSize",
+    "MONGO_MIN_POOL_SIZE": "minPoolSize",
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+    "MONGO_SOCKET_TIMEOUT_MS": "socketTimeoutMS",
+    "MONGO_CONNECT_TIMEOUT_MS": "connectTimeoutMS",
+}
+
+
+def client_options() -> dict:
+    """
+    Collect MongoClient pool, timeout and compression settings from the
+    environment.
+
+    MONGO_COMPRESSORS takes a comma separated list such as "zstd,snappy".
+    Compressors whose python package isn't installed are skipped by the
+    driver with a warning, so listing them is always safe.
+    """
+    options = {}
+    for env_name, option in INT_CLIENT_OPTIONS.items():
+        value = getenv(env_name)
+        if value:
+            options[option] = int(value)
+
+    compressors = getenv("MONGO_COMPRESSORS")
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+
+# A checkout that takes longer than this had to wait for a connection to be
+# returned or opened, rather than taking an idle one
+POOL_WAIT_THRESHOLD_MS = float(getenv("MONGO_POOL_WAIT_THRESHOLD_MS", "1"))
+
+
+def _pool_counters() -> dict:
+    return {
+        "checkouts": 0,
+        "checkout_failures": 0,
+        "waits": 0,
+        "waiting": 0,
+        "in_use": 0,
+        "open_connections": 0,
+        "connections_created": 0,
+        "connections_closed": 0,
+        "pool_cleared": 0,
+        "wait_time_ms_total": 0.0,
+        "wait_time_ms_max": 0.0,
+    }
+
+
+class PoolStatistics(ConnectionPoolListener):
+    """
+    Connection pool listener that keeps running counters of checkouts,
+    waits and pool clears, so we can see when requests queue for a
+    connection rather than for the database itself.
+
+    Each client has its own listener, and the driver keeps a pool per
+    server, so counters are kept per server address. A checkout counts as
+    a wait when it took longer than POOL_WAIT_THRESHOLD_MS.
+    """
+
+    def __init__(self, wait_threshold_ms: float = POOL_WAIT_THRESHOLD_MS):
+        self.wait_threshold_ms = wait_threshold_ms
+        self._lock = threading.Lock()
+        self._servers = {}
+
+    def reset(self):
+        """Zero all counters."""
+        with self._lock:
+            self._servers = {}
+
+    def _counts(self, event) -> dict:
+        # Called with the lock held
+        host, port = event.address
+        return self._servers.setdefault(f"{host}:{port}", _pool_counters())
+
+    def snapshot(self) -> dict:
+        """Counters summed over all servers, and for each server."""
+        with self._lock:
+            servers = {address: dict(counts)
+                       for address, counts in self._servers.items()}
+        totals = _pool_counters()
+        for counts in servers.values():
+            for name, value in counts.items():
+                if name == "wait_time_ms_max":
+                    totals[name] = max(totals[name], value)
+                else:
+                    totals[name] += value
+        return {**totals, "servers": servers}
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._counts(event)["pool_cleared"] += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            counts = self._counts(event)
+            counts["connections_created"] += 1
+            counts["open_connections"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            counts = self._counts(event)
+            counts["connections_closed"] += 1
+            counts["open_connections"] -= 1
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self._counts(event)["waiting"] += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            counts = self._counts(event)
+            counts["waiting"] -= 1
+            counts["checkout_failures"] += 1
+
+    def connection_checked_out(self, event):
+        wait_ms = event.duration * 1000
+        with self._lock:
+            counts = self._counts(event)
+            counts["waiting"] -= 1
+            counts["in_use"] += 1
+            counts["checkouts"] += 1
+            if wait_ms > self.wait_threshold_ms:
+                counts["waits"] += 1
+            counts["wait_time_ms_total"] += wait_ms
+            counts["wait_time_ms_max"] = max(
+                counts["wait_time_ms_max"], wait_ms)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._counts(event)["in_use"] -= 1
+
+
+sync_pool_statistics = PoolStatistics()
+async_pool_statistics = PoolStatistics()
+
+
+def pool_snapshot() -> dict:
+    """Pool counters for the sync and async clients."""
+    return {"sync": sync_pool_statistics.snapshot(),
+            "async": async_pool_statistics.snapshot()}
+
+
+# Clients are created on first use, so importing this module doesn't connect.
+# Background jobs (cleanup, write-behind flushes) run in threads and use the
+# synchronous client
+client = LazyProxy(lambda: MongoClient(
+    uri, server_api=ServerApi('1'),
+    event_listeners=[sync_pool_statistics, query_monitor],
+    **client_options()))
+# Without the lambdas, looking up get_database would create the client now
+db = LazyProxy(lambda: client.get_database())  # pylint: disable=unnecessary-lambda
+
+# Request handlers are async and use the async driver, so a worker serves
+# concurrent requests from the event loop instead of the threadpool
+async_client = LazyProxy(lambda: AsyncMongoClient(
+    uri, server_api=ServerApi('1'),
+    event_listeners=[async_pool_statistics, query_monitor],
+    **client_options()))
+async_db = LazyProxy(
+    lambda: async_client.get_database())  # pylint: disable=unnecessary-lambda
 
 
 def initialize_database():
@@ -0,0 +1,70 @@
+"""
+Per-request deadlines for database work.
+
+Every route on the API router runs inside a pymongo.timeout() block, so all
+MongoDB operations it makes (including those in dependencies such as
+get_current_active_user) share one time budget. The budget comes from the
+route's default, which @request_timeout can override, and a client can
+shorten it with the X-Request-Timeout header (milliseconds). Time spent
+queueing for a threadpool worker counts against the budget, so requests
+that are already late fail fast with a 503 instead of piling up.
+"""
+from os import getenv
+
+import pymongo
+from fastapi import HTTPException, Request, status
+from fastapi.routing import APIRoute
+from pymongo.errors import PyMongoError
+
+DEFAULT_REQUEST_TIMEOUT_MS = int(getenv("REQUEST_TIMEOUT_MS", "5000"))
+TIMEOUT_HEADER = "X-Request-Timeout"
+
+
+def request_timeout(milliseconds: int):
+    """Override the default deadline for a route."""
+    def decorator(func):
+        func.request_timeout_ms = milliseconds
+        return func
+    return decorator
+
+
+def requested_budget_ms(request: Request, default_ms: int) -> int:
+    """The route's budget, shortened by the client's header if it asks."""
+    header = request.headers.get(TIMEOUT_HEADER)
+    if header is None:
+        return default_ms
+    try:
+        requested = int(header)
+    except ValueError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid {TIMEOUT_HEADER} header"
+        ) from exc
+    return max(1, min(requested, default_ms))
+
+
+class DeadlineRoute(APIRoute):
+    """Route class that runs the endpoint under a MongoDB deadline."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        default_ms = getattr(self.endpoint, "request_timeout_ms",
+                             DEFAULT_REQUEST_TIMEOUT_MS)
+
+        async def deadline_handler(request: Request):
+            budget_ms = requested_budget_ms(request, default_ms)
+            # pymongo.timeout is context-local, and sync endpoints and
+            # dependencies run in the threadpool with a copy of this context
+            with pymongo.timeout(budget_ms / 1000):
+                try:
+                    return await handler(request)
+                except PyMongoError as exc:
+                    if not exc.timeout:
+                        raise
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="Request deadline exceeded",
+                        headers={"Retry-After": "1"}
+                    ) from exc
+
+        return deadline_handler
@@ -0,0 +1,170 @@
+"""
+Password hashing on a dedicated process pool.
+
+bcrypt is CPU bound, so a classroom of gamemasters logging in at once would
+otherwise tie up request workers. PasswordHasher runs hashes and checks in
+a bounded pool of HASH_WORKERS processes, rejects work with a 503 once
+HASH_QUEUE_DEPTH requests are already waiting, and keeps timings for queue
+wait and hash time. HASH_WORKERS=0 hashes on the threadpool instead, which
+avoids extra processes in local development.
+
+Both limits are per gunicorn worker, so a pod runs up to WEB_CONCURRENCY
+times as many hashes and queued requests. HASH_WORKERS therefore defaults
+to the worker's share of the pod's CPUs, at most 4, worked out when the
+pool is first used, once the worker knows how many workers there are.
+
+This module is imported by the pool's worker processes, so it must stay
+free of database and application imports; tracing only brings in
+OpenTelemetry's API.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from bcrypt import checkpw, gensalt, hashpw
+from fastapi import HTTPException, status
+from opentelemetry import trace
+from starlette.concurrency import run_in_threadpool
+
+from .cpus import cpus_per_worker
+from .tracing import traced
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS = 10
+MAX_DEFAULT_HASH_WORKERS = 4
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return checkpw(plain_password.encode("utf-8"),
+                   hashed_password.encode("utf-8"))
+
+
+def get_password_hash(password: str) -> str:
+    return hashpw(password.encode("utf-8"),
+                  gensalt(rounds=BCRYPT_ROUNDS)).decode("utf-8")
+
+
+def _timed(func, *args):
+    """Run func in the worker and report when it started and how long it took."""
+    started = time.time()
+    begin = time.perf_counter()
+    result = func(*args)
+    return result, started, time.perf_counter() - begin
+
+
+class PasswordHasher:
+    """Bounded process pool for bcrypt work, with timing statistics"""
+
+    def __init__(self, workers: Optional[int], queue_depth: int):
+        # None sizes the pool from this worker's CPU share on first use
+        self._workers = workers
+        self.queue_depth = queue_depth
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {}
+        self.reset()
+
+    @property
+    def workers(self) -> int:
+        """Hashing processes; 0 means hashing on the threadpool."""
+        if self._workers is None:
+            self._workers = min(MAX_DEFAULT_HASH_WORKERS, cpus_per_worker())
+        return self._workers
+
+    def reset(self):
+        """Zero all counters."""
+        with self._lock:
+            self._stats = {
+                "completed": 0,
+                "rejected": 0,
+                "queue_wait_ms_total": 0.0,
+                "queue_wait_ms_max": 0.0,
+                "hash_time_ms_total": 0.0,
+                "hash_time_ms_max": 0.0,
+            }
+
+    def snapshot(self) -> dict:
+        """Return a copy of the current counters."""
+        with self._lock:
+            return {**self._stats, "in_flight": self._in_flight,
+                    "workers": self.workers,
+                    "queue_depth": self.queue_depth}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created on first use so importing the app doesn't start processes.
+        # Spawned rather than forked: the server process has Mongo monitor
+        # and scheduler threads that aren't safe to fork.
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"))
+            logger.info("Started password hashing pool with %d workers",
+                        self.workers)
+        return self._executor
+
+    async def _run(self, func, *args):
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_depth:
+                self._stats["rejected"] += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is busy, please try again",
+                    headers={"Retry-After": "1"}
+                )
+            self._in_flight += 1
+
+        try:
+            submitted = time.time()
+            if self.workers:
+                result, started, elapsed = await asyncio.get_running_loop(
+                ).run_in_executor(self._get_executor(), _timed, func, *args)
+            else:
+                result, started, elapsed = await run_in_threadpool(
+                    _timed, func, *args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        wait_ms = max(0.0, started - submitted) * 1000
+        hash_ms = elapsed * 1000
+        trace.get_current_span().set_attributes(
+            {"bcrypt.queue_wait_ms": wait_ms, "bcrypt.hash_ms": hash_ms})
+        with self._lock:
+            self._stats["completed"] += 1
+            self._stats["queue_wait_ms_total"] += wait_ms
+            self._stats["queue_wait_ms_max"] = max(
+                self._stats["queue_wait_ms_max"], wait_ms)
+            self._stats["hash_time_ms_total"] += hash_ms
+            self._stats["hash_time_ms_max"] = max(
+                self._stats["hash_time_ms_max"], hash_ms)
+        return result
+
+    @traced("bcrypt.verify")
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Check a password against its bcrypt hash on the pool."""
+        return await self._run(verify_password, plain_password,
+                               hashed_password)
+
+    @traced("bcrypt.hash")
+    async def hash(self, password: str) -> str:
+        """Hash a password with bcrypt on the pool."""
+        return await self._run(get_password_hash, password)
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+_hash_workers = os.getenv("HASH_WORKERS")
+password_hasher = PasswordHasher(
+    workers=int(_hash_workers) if _hash_workers else None,
+    queue_depth=int(os.getenv("HASH_QUEUE_DEPTH", "32")))
@@ -0,0 +1,84 @@
+"""
+Cached database status for health endpoints.
+
+Browsers, the Docker HEALTHCHECK and Kubernetes probes all poll for
+health, and a MongoDB round trip per poll grows with the number of open
+tabs. Instead, HealthMonitor pings MongoDB from a background task every
+HEALTH_REFRESH_SECONDS and keeps the result together with the pool
+counters and scheduler state. /readyz serves that cached status and /livez
+does no I/O at all, so health traffic adds no load to MongoDB however many
+clients poll it.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from os import getenv
+from typing import Optional
+
+from .db import async_db, pool_snapshot
+from .leader import maintenance_lease
+
+logger = logging.getLogger(__name__)
+
+HEALTH_REFRESH_SECONDS = float(getenv("HEALTH_REFRESH_SECONDS", "5"))
+
+
+def scheduler_state(scheduler) -> dict:
+    """Whether the scheduler runs, and its jobs' next run times."""
+    state = {"running": False, "leader": maintenance_lease.is_leader,
+             "jobs": {}}
+    if scheduler is not None and scheduler.created and scheduler.running:
+        state["running"] = True
+        state["jobs"] = {job.id: job.next_run_time.isoformat()
+                         if job.next_run_time else None
+                         for job in scheduler.get_jobs()}
+    return state
+
+
+class HealthMonitor:
+    """Database status, refreshed in the background"""
+
+    def __init__(self, refresh_seconds: float = HEALTH_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.scheduler = None
+        self._status = {"status": "unknown"}
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self):
+        """Ping MongoDB and update the cached status."""
+        started = time.perf_counter()
+        try:
+            await async_db.command("ping")
+            status = {"status": "ok", "error": None}
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            status = {"status": "error", "error": str(e)}
+            logger.warning("Health check ping failed: %s", e)
+        status["ping_ms"] = (time.perf_counter() - started) * 1000
+        status["checked_at"] = datetime.now(timezone.utc).isoformat()
+        status["pool"] = pool_snapshot()
+        status["scheduler"] = scheduler_state(self.scheduler)
+        self._status = status
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self, scheduler=None):
+        """Start refreshing in the background on the running loop."""
+        self.scheduler = scheduler
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        """Stop refreshing."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def snapshot(self) -> dict:
+        """The last database status. No I/O."""
+        return self._status
+
+
+health_monitor = HealthMonitor()
@@ -0,0 +1,207 @@
+"""
+Run history for scheduled maintenance jobs.
+
+job_history listens to the scheduler's events and records each run of a
+job: when it was due and when it started (its lag), how long it took, the
+rows it affected (the job's return value) and its exception, if any.
+Every run is
+
+- counted in the scheduler_job_* metrics,
+- stored in the job_runs collection for JOB_HISTORY_DAYS, so /admin/jobs
+  shows the same history whichever worker or pod answers,
+- checked for trouble. A run that outlasts its job's interval, or that the
+  scheduler skips because the previous run is still going, is an overrun,
+  and JOB_FAILURE_ALERT failed runs in a row mean the job is failing. Both
+  are logged as errors, listed in /admin/jobs and alerted on from the
+  metrics by manifests/prometheus-rules.yaml.
+
+Runs skipped by followers, where leader_only() returns None, are only
+counted in the metrics.
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timezone
+from os import getenv
+from typing import Optional
+
+from pymongo.errors import PyMongoError
+
+from .db import async_db, db
+from .metrics import (scheduler_job_consecutive_failures,
+                      scheduler_job_duration, scheduler_job_lag,
+                      scheduler_job_overruns, scheduler_job_rows,
+                      scheduler_job_runs)
+
+logger = logging.getLogger(__name__)
+
+JOB_HISTORY_DAYS = float(getenv("JOB_HISTORY_DAYS", "14"))
+JOB_FAILURE_ALERT = int(getenv("JOB_FAILURE_ALERT", "3"))
+# Runs per job listed by /admin/jobs
+JOB_HISTORY_LIMIT = 20
+
+
+def job_alerts(runs: list) -> list:
+    """What is wrong with a job, given its runs, most recent first."""
+    alerts = []
+    latest = runs[0] if runs else None
+    if latest and latest["result"] == "overrun":
+        alerts.append("last run was skipped, the one before it was still "
+                      "running")
+    elif latest and latest["overrun"]:
+        alerts.append(f"last run took {latest['duration_seconds']:.0f} s, "
+                      f"longer than its {latest['interval_seconds']:.0f} s "
+                      "interval")
+    failures = 0
+    for run in runs:
+        if run["result"] != "error":
+            break
+        failures += 1
+    if failures >= JOB_FAILURE_ALERT:
+        alerts.append(f"last {failures} runs failed: {latest['error']}")
+    return alerts
+
+
+class JobHistory:
+    """Records scheduled job runs from the scheduler's events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scheduler = None
+        self._started = {}
+        self._failures = {}
+        self._index_created = False
+        self.process = None
+
+    def listen(self, scheduler):
+        """Start recording the runs of the scheduler's jobs."""
+        # APScheduler is only imported once the app starts outside tests
+        from apscheduler.events import (  # pylint: disable=import-outside-toplevel
+            EVENT_JOB_ERROR, EVENT_JOB_EXECUTED, EVENT_JOB_MAX_INSTANCES,
+            EVENT_JOB_MISSED, EVENT_JOB_SUBMITTED)
+        self._scheduler = scheduler
+        # Worked out here rather than at import, since preloaded workers
+        # are forked from the process that imported the app
+        self.process = f"{socket.gethostname()}:{os.getpid()}"
+        scheduler.add_listener(self._submitted, EVENT_JOB_SUBMITTED)
+        scheduler.add_listener(self._finished,
+                               EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+        scheduler.add_listener(self._missed, EVENT_JOB_MISSED)
+        scheduler.add_listener(self._skipped_running, EVENT_JOB_MAX_INSTANCES)
+
+    def _interval_seconds(self, job_id: str) -> Optional[float]:
+        job = self._scheduler.get_job(job_id) if self._scheduler else None
+        interval = getattr(job.trigger, "interval", None) if job else None
+        return interval.total_seconds() if interval else None
+
+    def _submitted(self, event):
+        # Sent once the run is handed to the executor, so it is as good as
+        # the run's start
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            for run_time in event.scheduled_run_times:
+                self._started[(event.job_id, run_time)] = now
+
+    def _finished(self, event):
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            started_at = self._started.pop(
+                (event.job_id, event.scheduled_run_time), now)
+        self.record(event.job_id, event.scheduled_run_time, started_at, now,
+                    retval=event.retval, exception=event.exception)
+
+    def _missed(self, event):
+        now = datetime.now(timezone.utc)
+        self.record(event.job_id, event.scheduled_run_time, now, now,
+                    result="missed")
+
+    def _skipped_running(self, event):
+        now = datetime.now(timezone.utc)
+        self.record(event.job_id, event.scheduled_run_times[0], now, now,
+                    result="overrun")
+
+    def record(self, job_id: str, scheduled_at: datetime,  # pylint: disable=too-many-arguments
+               started_at: datetime, finished_at: datetime, *, retval=None,
+               exception: Optional[BaseException] = None,
+               result: Optional[str] = None) -> dict:
+        """Record a finished, skipped or missed run and return it."""
+        if result is None:
+            if exception is not None:
+                result = "error"
+            else:
+                result = "skipped" if retval is None else "success"
+        interval_seconds = self._interval_seconds(job_id)
+        run = {
+            "job_id": job_id,
+            "result": result,
+            "scheduled_at": scheduled_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "lag_seconds": max(
+                0.0, (started_at - scheduled_at).total_seconds()),
+            "duration_seconds": (finished_at - started_at).total_seconds(),
+            "rows": retval if isinstance(retval, int) else None,
+            "error": str(exception) if exception is not None else None,
+            "interval_seconds": interval_seconds,
+            "process": self.process,
+        }
+        run["overrun"] = result == "overrun" or (
+            interval_seconds is not None
+            and run["duration_seconds"] > interval_seconds)
+
+        scheduler_job_runs.labels(job_id, result).inc()
+        if result == "skipped":
+            return run
+        if result in ("success", "error"):
+            scheduler_job_duration.labels(job_id).observe(
+                run["duration_seconds"])
+            scheduler_job_lag.labels(job_id).observe(run["lag_seconds"])
+        if run["rows"]:
+            scheduler_job_rows.labels(job_id).inc(run["rows"])
+        if result == "overrun":
+            scheduler_job_overruns.labels(job_id).inc()
+            logger.error("Job %s skipped a run, its previous run is still "
+                         "going", job_id)
+        elif run["overrun"]:
+            scheduler_job_overruns.labels(job_id).inc()
+            logger.error("Job %s overran its %.0f s interval, the run took "
+                         "%.0f s", job_id, interval_seconds,
+                         run["duration_seconds"])
+        with self._lock:
+            if result == "error":
+                self._failures[job_id] = self._failures.get(job_id, 0) + 1
+            elif result == "success":
+                self._failures[job_id] = 0
+            failures = self._failures.get(job_id, 0)
+        scheduler_job_consecutive_failures.labels(job_id).set(failures)
+        if failures >= JOB_FAILURE_ALERT:
+            logger.error("Job %s has failed %d times in a row: %s",
+                         job_id, failures, run["error"])
+        self._save(run)
+        return run
+
+    def _save(self, run: dict):
+        try:
+            if not self._index_created:
+                db.job_runs.create_index(
+                    "finished_at",
+                    expireAfterSeconds=int(JOB_HISTORY_DAYS * 86400))
+                db.job_runs.create_index([("job_id", 1), ("started_at", -1)])
+                self._index_created = True
+            db.job_runs.insert_one(dict(run))
+        except PyMongoError as e:
+            logger.warning("Could not save %s run: %s", run["job_id"], e)
+
+    async def recent(self, limit: int = JOB_HISTORY_LIMIT) -> dict:
+        """Each job's latest runs, most recent first, and its alerts."""
+        jobs = {}
+        for job_id in sorted(await async_db.job_runs.distinct("job_id")):
+            runs = await async_db.job_runs.find(
+                {"job_id": job_id}, {"_id": 0}).sort(
+                    "started_at", -1).to_list(limit)
+            jobs[job_id] = {"alerts": job_alerts(runs), "runs": runs}
+        return jobs
+
+
+job_history = JobHistory()
@@ -0,0 +1,56 @@
+"""
+Deferred imports and objects, to keep worker start-up and test collection
+fast. `python -m backend.importtime` shows what importing the app costs.
+"""
+import importlib.util
+import sys
+import threading
+
+
+def lazy_import(name: str):
+    """
+    Return module `name`, but only execute it when one of its attributes
+    is first used. Its parent packages are imported straight away.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+class LazyProxy:
+    """
+    Stand-in for an object that is only built when first used.
+
+    db.py uses these for the MongoDB clients, so importing the app doesn't
+    connect or start monitor threads, and a preloading server can fork
+    before any client exists.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self._factory()
+        return self._target
+
+    @property
+    def created(self) -> bool:
+        """Whether the real object has been built yet."""
+        return self._target is not None
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, name):
+        return self._resolve()[name]
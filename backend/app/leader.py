@@ -0,0 +1,153 @@
+"""
+Lease-based leader election for maintenance jobs.
+
+Every worker process starts the scheduler, but jobs wrapped with
+LeaderLease.leader_only() only run in the process that holds the lease. The
+lease is a document in the leases collection naming its holder and when it
+expires. The holder renews it every LEADER_RENEW_SECONDS, and any process
+may take it over once it has gone LEADER_LEASE_SECONDS without renewal, so
+a follower takes over within seconds of the leader dying. Expiry is
+compared against the database's clock ($$NOW), so clock skew between pods
+doesn't matter, and a TTL index removes leases nobody renews.
+"""
+import functools
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from os import getenv
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLease:
+    """A named lease in the leases collection, renewed from a thread"""
+
+    def __init__(self, name: str, lease_seconds: float,
+                 renew_seconds: float):
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.renew_seconds = renew_seconds
+        self.holder = self._new_holder()
+        self._valid_until = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        # With PRELOAD, gunicorn forks workers from a master that already
+        # created the lease, and each worker must compete as itself
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    @staticmethod
+    def _new_holder() -> str:
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def _reset_after_fork(self):
+        # The parent's renewal thread doesn't exist in the child
+        self.holder = self._new_holder()
+        self._valid_until = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_leader(self) -> bool:
+        """Whether this process holds the lease right now."""
+        return time.monotonic() < self._valid_until
+
+    def try_acquire(self) -> bool:
+        """Take the lease if it is free or expired, or renew it if ours."""
+        was_leader = self.is_leader
+        # Measured before the request, so our view of the lease never
+        # outlives the database's
+        requested = time.monotonic()
+        try:
+            lease = db.leases.find_one_and_update(
+                {"_id": self.name,
+                 "$or": [{"holder": self.holder},
+                         {"$expr": {"$lt": ["$expires_at", "$$NOW"]}}]},
+                [{"$set": {
+                    "holder": self.holder,
+                    "expires_at": {"$add": ["$$NOW",
+                                            self.lease_seconds * 1000]}}}],
+                upsert=True,
+                return_document=ReturnDocument.AFTER)
+            acquired = lease is not None and \
+                lease.get("holder") == self.holder
+        except DuplicateKeyError:
+            # Someone else holds an unexpired lease
+            acquired = False
+        except PyMongoError as e:
+            logger.warning("Could not renew %s lease: %s", self.name, e)
+            # Keep leading until the current lease runs out
+            return self.is_leader
+
+        self._valid_until = requested + self.lease_seconds if acquired \
+            else 0.0
+        if acquired and not was_leader:
+            logger.info("Acquired %s lease as %s", self.name, self.holder)
+        elif was_leader and not acquired:
+            logger.warning("Lost %s lease", self.name)
+        return acquired
+
+    def release(self):
+        """Give up the lease so a follower can take over immediately."""
+        if not self.is_leader:
+            return
+        self._valid_until = 0.0
+        try:
+            db.leases.delete_one({"_id": self.name, "holder": self.holder})
+            logger.info("Released %s lease", self.name)
+        except PyMongoError as e:
+            logger.warning("Could not release %s lease: %s", self.name, e)
+
+    def leader_only(self, func):
+        """Wrap a job so it only runs while this process holds the lease."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.is_leader:
+                logger.debug("Skipping %s: %s lease is held elsewhere",
+                             func.__name__, self.name)
+                return None
+            return func(*args, **kwargs)
+        return wrapper
+
+    def start(self):
+        """Start competing for the lease in a background thread."""
+        if self._thread:
+            return
+        try:
+            db.leases.create_index("expires_at", expireAfterSeconds=0)
+        except PyMongoError as e:
+            logger.warning("Could not create lease TTL index: %s", e)
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="LeaderLease", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop renewing and release the lease if we hold it."""
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.release()
+
+    def _run(self):
+        while True:
+            try:
+                self.try_acquire()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error("Leader election error: %s", e)
+            if self._stop.wait(self.renew_seconds):
+                return
+
+
+maintenance_lease = LeaderLease(
+    "maintenance",
+    lease_seconds=float(getenv("LEADER_LEASE_SECONDS", "15")),
+    renew_seconds=float(getenv("LEADER_RENEW_SECONDS", "5")))
@@ -0,0 +1,195 @@
+"""
+Structured, non-blocking logging.
+
+queue_logging.start() puts a QueueHandler on the root logger. Logging calls
+only format the message and put the record on a queue; a QueueListener
+thread does the slow part, writing JSON lines to stdout, so request
+handlers never wait on the log stream.
+
+Each record carries the request ID that RequestIdMiddleware gave the
+request (or took from its X-Request-ID header, which is echoed back), so
+all lines for one request can be found together, the route template and,
+when the request is traced, its trace_id.
+DEBUG records are sampled per request: LOG_DEBUG_SAMPLE_RATE of requests
+keep all their debug lines and the rest keep none.
+
+Settings come from the environment:
+    LOG_LEVEL              root log level (INFO)
+    LOG_FORMAT             "json", or "text" for development (json)
+    LOG_DEBUG_SAMPLE_RATE  share of requests whose DEBUG lines are kept (0.1)
+"""
+import copy
+import json
+import logging
+import queue
+import re
+import sys
+import uuid
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from os import getenv
+from typing import Optional
+
+from opentelemetry import trace
+from opentelemetry.trace import format_trace_id
+
+from .threadpool import current_route
+
+LOG_LEVEL = getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = getenv("LOG_FORMAT", "json")
+LOG_DEBUG_SAMPLE_RATE = float(getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+REQUEST_ID_HEADER = "X-Request-ID"
+TEXT_FORMAT = ("%(asctime)s - %(name)s - %(levelname)s - "
+               "[%(request_id)s] %(message)s")
+
+# Client supplied IDs are echoed and logged, so only plain ones are kept
+VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+# Attributes every LogRecord has, so anything else was passed in `extra`
+RECORD_ATTRIBUTES = frozenset(
+    logging.makeLogRecord({}).__dict__) | {"message", "asctime"}
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+class ContextFilter(logging.Filter):
+    """
+    Copies the request ID, route and trace ID onto records, and samples
+    DEBUG ones.
+
+    It runs on the logging thread, where the request's context is still
+    available; the listener thread that formats records doesn't have it.
+    """
+
+    def __init__(self, sample_rate: float = LOG_DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def _sampled(self, current_id: Optional[str]) -> bool:
+        # Hashing the request ID keeps or drops a request's lines together
+        if current_id is None:
+            return True
+        return zlib.crc32(current_id.encode()) % 1000 < \
+            self.sample_rate * 1000
+
+    def filter(self, record):
+        current_id = request_id.get()
+        if record.levelno <= logging.DEBUG and not self._sampled(current_id):
+            return False
+        record.request_id = current_id or "-"
+        record.route = current_route.get() or "-"
+        span_context = trace.get_current_span().get_span_context()
+        if span_context.trace_flags.sampled:
+            record.trace_id = format_trace_id(span_context.trace_id)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(
+                record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+            "route": getattr(record, "route", "-"),
+            "process": record.process,
+        }
+        entry.update({key: value for key, value in record.__dict__.items()
+                      if key not in RECORD_ATTRIBUTES
+                      and key not in ("request_id", "route")})
+        if record.exc_info:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    """QueueHandler that keeps the message and traceback apart."""
+
+    def prepare(self, record):
+        # The stock prepare() formats the traceback into the message
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class QueueLogging:
+    """Root logger -> queue -> listener thread -> stream"""
+
+    def __init__(self):
+        self.handler: Optional[QueueHandler] = None
+        self.listener: Optional[QueueListener] = None
+
+    def start(self, stream=None, log_format: str = LOG_FORMAT,
+              level: str = LOG_LEVEL):
+        """
+        Route the root logger through a queue to `stream` (stdout). Call it
+        in each worker process, as the listener's thread doesn't survive a
+        fork.
+        """
+        self.stop()
+        output = logging.StreamHandler(stream or sys.stdout)
+        if log_format == "json":
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+        self.handler = _QueueHandler(queue.SimpleQueue())
+        self.handler.setFormatter(logging.Formatter())
+        self.handler.addFilter(ContextFilter())
+        self.listener = QueueListener(self.handler.queue, output)
+        self.listener.start()
+
+        root = logging.getLogger()
+        root.setLevel(level)
+        root.addHandler(self.handler)
+
+    def stop(self):
+        """Write out queued records and remove the queue handler."""
+        if self.listener is not None:
+            self.listener.stop()
+            logging.getLogger().removeHandler(self.handler)
+            self.handler = self.listener = None
+
+
+queue_logging = QueueLogging()
+
+
+class RequestIdMiddleware:
+    """ASGI middleware that gives each request an ID for its log lines."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        supplied = dict(scope["headers"]).get(
+            REQUEST_ID_HEADER.lower().encode(), b"").decode("latin-1")
+        current_id = supplied if VALID_REQUEST_ID.match(supplied) \
+            else uuid.uuid4().hex
+        token = request_id.set(current_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (REQUEST_ID_HEADER.lower().encode(), current_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
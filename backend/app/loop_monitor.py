@@ -0,0 +1,136 @@
+"""
+Event loop lag monitoring and blocking call detection.
+
+Every request a worker serves shares its event loop, so one blocking call
+in an async route (a sync MongoDB call, bcrypt, a large json.dumps)
+stalls all of them. LoopMonitor runs a task that sleeps for
+LOOP_MONITOR_INTERVAL_MS at a time and records how late it wakes up: the
+event_loop_lag_seconds histogram, and a warning above LOOP_LAG_WARN_MS.
+
+With LOOP_BLOCKING_DETECTOR=true (meant for development and staging), a
+watchdog thread also notices when the loop hasn't woken that task for
+LOOP_BLOCKING_THRESHOLD_MS, and logs the stack of whatever the loop's
+thread is running at that moment, which points at the blocking call. A
+stall only shows up once it delays one of the task's wake-ups, so with the
+detector on the task wakes every quarter of LOOP_BLOCKING_THRESHOLD_MS
+instead, and a blocking call longer than the threshold can't fit between
+two wake-ups unnoticed.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from os import getenv
+from typing import Optional
+
+from .metrics import event_loop_blocked, event_loop_lag
+
+logger = logging.getLogger(__name__)
+
+LOOP_MONITOR_INTERVAL_MS = float(getenv("LOOP_MONITOR_INTERVAL_MS", "500"))
+LOOP_LAG_WARN_MS = float(getenv("LOOP_LAG_WARN_MS", "100"))
+LOOP_BLOCKING_DETECTOR = getenv(
+    "LOOP_BLOCKING_DETECTOR", "false").lower() == "true"
+LOOP_BLOCKING_THRESHOLD_MS = float(
+    getenv("LOOP_BLOCKING_THRESHOLD_MS", "100"))
+
+
+class LoopMonitor:
+    """Measures event loop lag and, optionally, reports blocking calls."""
+
+    def __init__(self, interval_ms: float = LOOP_MONITOR_INTERVAL_MS,
+                 warn_ms: float = LOOP_LAG_WARN_MS,
+                 detect_blocking: bool = LOOP_BLOCKING_DETECTOR,
+                 blocking_ms: float = LOOP_BLOCKING_THRESHOLD_MS):
+        self.warn_ms = warn_ms
+        self.detect_blocking = detect_blocking
+        self.blocking = blocking_ms / 1000
+        self.interval = interval_ms / 1000
+        if detect_blocking:
+            self.interval = min(self.interval, self.blocking / 4)
+        self.lag_ms_last = 0.0
+        self.lag_ms_max = 0.0
+        self.blocked = 0
+        self._heartbeat = time.perf_counter()
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def record(self, lag: float):
+        """Record one wake-up that came `lag` seconds late."""
+        lag_ms = lag * 1000
+        self.lag_ms_last = lag_ms
+        self.lag_ms_max = max(self.lag_ms_max, lag_ms)
+        event_loop_lag.observe(lag)
+        if lag_ms >= self.warn_ms:
+            logger.warning("Event loop lagged %.0f ms", lag_ms)
+
+    async def _run(self):
+        while True:
+            self._heartbeat = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, time.perf_counter() - self._heartbeat
+                            - self.interval))
+
+    def _stack(self) -> str:
+        frame = sys._current_frames().get(  # pylint: disable=protected-access
+            self._loop_thread)
+        return "".join(traceback.format_stack(frame)) if frame else ""
+
+    def check(self) -> bool:
+        """Report the loop if it's blocked now. Returns whether it is."""
+        stalled = time.perf_counter() - self._heartbeat - self.interval
+        if stalled < self.blocking:
+            return False
+        self.blocked += 1
+        event_loop_blocked.inc()
+        logger.warning("Event loop blocked for at least %.0f ms in:\n%s",
+                       stalled * 1000, self._stack())
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.blocking / 2):
+            if self.check():
+                # Report each stall once: wait for the loop to wake up
+                heartbeat = self._heartbeat
+                while heartbeat == self._heartbeat and \
+                        not self._stop.wait(self.blocking / 2):
+                    pass
+
+    def start(self):
+        """Start monitoring the running event loop."""
+        self._loop_thread = threading.get_ident()
+        self._task = asyncio.create_task(self._run())
+        if self.detect_blocking:
+            self._stop.clear()
+            self._watchdog = threading.Thread(
+                target=self._watch, name="LoopWatchdog", daemon=True)
+            self._watchdog.start()
+            logger.info("Blocking call detector on, threshold %.0f ms",
+                        self.blocking * 1000)
+
+    def stop(self):
+        """Stop the monitor task and watchdog."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._stop.set()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    def snapshot(self) -> dict:
+        """Lag figures for the /health/loop endpoint."""
+        return {
+            "interval_ms": self.interval * 1000,
+            "lag_ms_last": self.lag_ms_last,
+            "lag_ms_max": self.lag_ms_max,
+            "blocking_detector": self.detect_blocking,
+            "blocked": self.blocked,
+        }
+
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,178 @@
+"""
+Prometheus metrics, served at /metrics.
+
+MetricsMiddleware counts and times every HTTP request, labelled by method,
+status and route template (/rooms/{room_code}, never the raw path, so label
+cardinality stays bounded). It also measures request and response bodies
+by route, and hands the bytes served for each room to bandwidth.py; room
+codes are secrets, so they are never used as labels here.
+query_monitor.py times MongoDB commands by collection, cleanup_old_games
+records its runs here, and jobs.py records every scheduled job run.
+
+Under gunicorn every worker is a separate process with its own counters.
+gunicorn_conf.py sets PROMETHEUS_MULTIPROC_DIR, where prometheus_client
+then keeps each worker's values in files, and render() adds them up, so a
+scrape of any worker reports the whole pod.
+"""
+import os
+import time
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from starlette.routing import Match
+
+from .admission import room_of
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if MULTIPROC_DIR:
+    # A preloaded app creates its metrics before gunicorn's on_starting hook
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+UNMATCHED_ROUTE = "unmatched"
+# Methods whose request bodies are measured
+BODY_METHODS = frozenset({"POST", "PUT", "PATCH"})
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576,
+                4194304)
+
+http_requests = Counter(
+    "http_requests_total", "HTTP requests handled",
+    ["method", "route", "status"])
+http_requests_in_progress = Gauge(
+    "http_requests_in_progress", "HTTP requests being handled",
+    ["method", "route"], multiprocess_mode="livesum")
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Time to handle an HTTP request",
+    ["method", "route", "status"],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10))
+http_request_size = Histogram(
+    "http_request_size_bytes", "Size of HTTP request bodies",
+    ["method", "route"], buckets=SIZE_BUCKETS)
+http_response_size = Histogram(
+    "http_response_size_bytes", "Size of HTTP response bodies",
+    ["method", "route"], buckets=SIZE_BUCKETS)
+room_bandwidth_bytes = Histogram(
+    "room_bandwidth_bytes",
+    "Response bytes served for one room between bandwidth flushes",
+    buckets=(1024, 16384, 65536, 262144, 1048576, 4194304, 16777216,
+             67108864))
+
+mongodb_command_duration = Histogram(
+    "mongodb_command_duration_seconds", "Time for MongoDB commands",
+    ["collection", "command", "outcome"],
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 5))
+
+event_loop_lag = Histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a sleeping task",
+    buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 5))
+event_loop_blocked = Counter(
+    "event_loop_blocked_total",
+    "Times the blocking call detector found the event loop stalled")
+
+cleanup_runs = Counter(
+    "cleanup_runs_total", "Room cleanup runs", ["result"])
+cleanup_deleted_rooms = Counter(
+    "cleanup_deleted_rooms_total", "Rooms deleted by cleanup", ["policy"])
+cleanup_duration = Histogram(
+    "cleanup_duration_seconds", "Time for a room cleanup run",
+    buckets=(.1, .5, 1, 5, 10, 30, 60, 120, 300, 600))
+
+# Labelled job_id, as Prometheus gives every scraped series a job label
+scheduler_job_runs = Counter(
+    "scheduler_job_runs_total", "Scheduled job runs", ["job_id", "result"])
+scheduler_job_duration = Histogram(
+    "scheduler_job_duration_seconds", "Time for a scheduled job run",
+    ["job_id"], buckets=(.1, .5, 1, 5, 10, 30, 60, 120, 300, 600, 1800))
+scheduler_job_lag = Histogram(
+    "scheduler_job_lag_seconds", "How late a scheduled job run started",
+    ["job_id"], buckets=(.01, .05, .1, .5, 1, 5, 30, 60, 300))
+scheduler_job_rows = Counter(
+    "scheduler_job_rows_total", "Rows affected by scheduled job runs",
+    ["job_id"])
+scheduler_job_overruns = Counter(
+    "scheduler_job_overruns_total",
+    "Scheduled job runs that outlasted the job's interval",
+    ["job_id"])
+scheduler_job_consecutive_failures = Gauge(
+    "scheduler_job_consecutive_failures",
+    "Failed runs of a scheduled job since its last success",
+    ["job_id"], multiprocess_mode="mostrecent")
+
+
+def render() -> bytes:
+    """The current metrics in Prometheus' text format."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def route_template(scope) -> str:
+    """The path template of the route a request will be handled by."""
+    router = getattr(scope.get("app"), "router", None)
+    for route in getattr(router, "routes", ()):
+        match, _ = route.matches(scope)
+        # PARTIAL is a path match with the wrong method, answered with 405
+        if match is not Match.NONE:
+            return route.path
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that counts and times HTTP requests, and adds the bytes
+    of successful room responses to `bandwidth`, if given.
+    """
+
+    def __init__(self, app, bandwidth=None):
+        self.app = app
+        self.bandwidth = bandwidth
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        status_code = 500
+        request_bytes = 0
+        response_bytes = 0
+
+        async def receive_counting():
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def send_with_status(message):
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = http_requests_in_progress.labels(method, route)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive_counting, send_with_status)
+        finally:
+            in_progress.dec()
+            status = str(status_code)
+            http_requests.labels(method, route, status).inc()
+            http_request_duration.labels(method, route, status).observe(
+                time.perf_counter() - started)
+            http_response_size.labels(method, route).observe(response_bytes)
+            if method in BODY_METHODS:
+                http_request_size.labels(method, route).observe(
+                    request_bytes)
+            room = room_of(scope["path"])
+            if self.bandwidth is not None and room is not None and \
+                    status_code < 400:
+                self.bandwidth.add(room, response_bytes)
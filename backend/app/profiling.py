@@ -0,0 +1,151 @@
+"""
+On-demand request profiling for admins.
+
+An admin request that sends `X-Profile: 1` is run under cProfile. Its
+response carries an X-Profile-ID, and the profile is kept in the profiles
+collection for PROFILE_RETENTION_HOURS, so it can be fetched from any
+worker with GET /admin/profiles/{id}: a text report of the slowest calls
+by cumulative time, or with ?download=true a .prof file for pstats or
+snakeviz, which show the full call tree.
+
+cProfile profiles the event loop's thread, so a profile also includes
+whatever other requests ran on that loop while the profiled one awaited
+MongoDB, and leaves out work done in the threadpool. Only one request per
+worker is profiled at a time.
+
+With PROFILING_ENABLED=false the middleware isn't installed at all, and
+requests without the header only pay for one header lookup.
+"""
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from os import getenv
+
+from bson import Binary
+
+from .db import async_db
+from .metrics import route_template
+from .security import admin_from_authorization
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = getenv("PROFILING_ENABLED", "true").lower() == "true"
+PROFILE_RETENTION_HOURS = float(getenv("PROFILE_RETENTION_HOURS", "24"))
+PROFILE_REPORT_LINES = int(getenv("PROFILE_REPORT_LINES", "50"))
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-ID"
+
+
+def report(profiler: cProfile.Profile) -> str:
+    """The slowest calls of a profile, by cumulative time."""
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(
+        PROFILE_REPORT_LINES)
+    return stream.getvalue()
+
+
+def dump(profiler: cProfile.Profile) -> bytes:
+    """A profile in the format pstats.Stats() and snakeviz load."""
+    profiler.create_stats()
+    return marshal.dumps(profiler.stats)
+
+
+class ProfileStore:
+    """Saves profiles to MongoDB, where they expire after a while."""
+
+    def __init__(self):
+        self._index_created = False
+
+    async def save(self, profile_id: str, profiler: cProfile.Profile,
+                   **details):
+        """Store a finished profile under `profile_id`."""
+        if not self._index_created:
+            await async_db.profiles.create_index(
+                "created_at",
+                expireAfterSeconds=int(PROFILE_RETENTION_HOURS * 3600))
+            self._index_created = True
+        await async_db.profiles.insert_one({
+            "_id": profile_id,
+            "created_at": datetime.now(timezone.utc),
+            "report": report(profiler),
+            "pstats": Binary(dump(profiler)),
+            **details,
+        })
+
+    async def load(self, profile_id: str):
+        """A stored profile, or None."""
+        return await async_db.profiles.find_one({"_id": profile_id})
+
+
+profile_store = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles admin requests that ask for it."""
+
+    def __init__(self, app, store: ProfileStore = profile_store):
+        self.app = app
+        self.store = store
+        # cProfile can only run one profiler per thread at a time
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if PROFILE_HEADER.lower().encode() not in headers:
+            await self.app(scope, receive, send)
+            return
+
+        admin = admin_from_authorization(
+            headers.get(b"authorization", b"").decode("latin-1"))
+        if admin is None:
+            await self.app(scope, receive, send)
+            return
+        if not self._busy.acquire(  # pylint: disable=consider-using-with
+                blocking=False):
+            # Another request on this worker is being profiled
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self._profile(scope, receive, send, admin)
+        finally:
+            self._busy.release()
+
+    async def _profile(self, scope, receive, send, admin: str):
+        profile_id = uuid.uuid4().hex
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (PROFILE_ID_HEADER.lower().encode(), profile_id.encode())]
+            await send(message)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.disable()
+            duration_ms = (time.perf_counter() - started) * 1000
+            try:
+                await self.store.save(
+                    profile_id, profiler, method=scope["method"],
+                    path=scope["path"], route=route_template(scope),
+                    user=admin, duration_ms=duration_ms)
+                logger.info("Profiled %s %s in %.0f ms as %s",
+                            scope["method"], scope["path"], duration_ms,
+                            profile_id)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.warning("Could not save profile %s: %s",
+                               profile_id, e)
@@ -0,0 +1,193 @@
+"""
+MongoDB command monitoring.
+
+QueryMonitor is a PyMongo command listener registered on both clients in
+db.py. For every command it:
+
+- observes mongodb_command_duration_seconds by collection and command,
+- adds the command to the current request's QueryStats, which
+  QueryStatsMiddleware reports in the X-DB-Queries response header, so a
+  route that makes more queries than it should (an N+1 loop, an insert
+  followed by a find) shows up in the browser's network tab,
+- logs commands slower than SLOW_QUERY_MS with the shape of their filter.
+  Shapes keep field names and operators but replace values with "?", so
+  the log shows which index a query needed without user data,
+- runs the command in a client span when tracing is on, a child of the
+  request's or cleanup run's span.
+
+Commands made outside a request (cleanup, write-behind flushes, warm-up)
+are timed and logged but not attributed to any request.
+"""
+import logging
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from os import getenv
+from typing import Optional
+
+from opentelemetry.trace import SpanKind, StatusCode
+from pymongo.monitoring import CommandListener
+
+from .metrics import mongodb_command_duration
+from .threadpool import current_route
+from .tracing import tracing
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(getenv("SLOW_QUERY_MS", "100"))
+DB_DEBUG_HEADER = getenv("DB_DEBUG_HEADER", "true").lower() == "true"
+QUERY_HEADER = "X-DB-Queries"
+
+# Where each command keeps its filter
+FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+# Write commands keep their filters in a list of statements
+STATEMENT_FIELDS = {"update": "updates", "delete": "deletes"}
+
+
+class QueryStats:
+    """Commands one request has made, and the time they took"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.duration_ms = 0.0
+        self.commands = Counter()
+
+    def record(self, collection: str, command: str, duration_ms: float):
+        """Add a finished command."""
+        with self._lock:
+            self.count += 1
+            self.duration_ms += duration_ms
+            self.commands[f"{collection}.{command}" if collection
+                          else command] += 1
+
+    def header(self) -> str:
+        """E.g. "count=2; time_ms=3.1; users.find=1, codes.find=1"."""
+        with self._lock:
+            commands = ", ".join(f"{name}={count}"
+                                 for name, count in self.commands.items())
+            summary = f"count={self.count}; time_ms={self.duration_ms:.1f}"
+        return f"{summary}; {commands}" if commands else summary
+
+
+current_queries: ContextVar[Optional[QueryStats]] = ContextVar(
+    "current_queries", default=None)
+
+
+def shape(value):
+    """A filter with its values replaced by "?"."""
+    if isinstance(value, dict):
+        return {key: shape(item) for key, item in value.items()}
+    if isinstance(value, list) and any(isinstance(item, (dict, list))
+                                       for item in value):
+        return [shape(item) for item in value]
+    return "?"
+
+
+def filter_shape(command_name: str, command) -> Optional[object]:
+    """The shape of a command's filter, or pipeline stages, if it has one."""
+    if command_name in FILTER_FIELDS:
+        return shape(command.get(FILTER_FIELDS[command_name], {}))
+    if command_name in STATEMENT_FIELDS:
+        statements = command.get(STATEMENT_FIELDS[command_name]) or [{}]
+        return shape(statements[0].get("q", {}))
+    if command_name == "aggregate":
+        return [next(iter(stage), "?")
+                for stage in command.get("pipeline", [])]
+    return None
+
+
+class QueryMonitor(CommandListener):
+    """Times MongoDB commands and attributes them to the current request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = {}
+
+    @staticmethod
+    def _key(event):
+        return event.request_id, event.connection_id
+
+    def started(self, event):
+        # Most commands name their collection in their first field, such
+        # as {"find": "rooms", ...}. Others (ping, hello) have none.
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ""
+        span = None
+        if tracing.enabled:
+            span = tracing.tracer.start_span(
+                f"{event.command_name} {collection}".rstrip(),
+                kind=SpanKind.CLIENT,
+                attributes={"db.system": "mongodb",
+                            "db.namespace": event.database_name,
+                            "db.collection.name": collection,
+                            "db.operation.name": event.command_name})
+        with self._lock:
+            self._started[self._key(event)] = (
+                collection, event.command, current_queries.get(), span)
+
+    def _finished(self, event, outcome: str):
+        with self._lock:
+            collection, command, stats, span = self._started.pop(
+                self._key(event), ("", {}, None, None))
+        duration_ms = event.duration_micros / 1000
+        if span is not None:
+            if outcome == "failure":
+                span.set_status(StatusCode.ERROR,
+                                str(event.failure.get("errmsg", "")))
+            span.end()
+
+        mongodb_command_duration.labels(
+            collection, event.command_name, outcome).observe(
+                duration_ms / 1000)
+        if stats is not None:
+            stats.record(collection, event.command_name, duration_ms)
+        if duration_ms >= SLOW_QUERY_MS:
+            logger.warning(
+                "Slow MongoDB %s on %s: %.1f ms (%s), filter %s, route %s",
+                event.command_name, collection or "-", duration_ms, outcome,
+                filter_shape(event.command_name, command),
+                current_route.get() or "-")
+
+    def succeeded(self, event):
+        self._finished(event, "success")
+
+    def failed(self, event):
+        self._finished(event, "failure")
+
+
+query_monitor = QueryMonitor()
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware that reports a request's MongoDB commands."""
+
+    def __init__(self, app, header: bool = DB_DEBUG_HEADER):
+        self.app = app
+        self.header = header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_queries.set(stats)
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start" and self.header:
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (QUERY_HEADER.lower().encode(), stats.header().encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            current_queries.reset(token)
@@ -1,35 +1,34 @@
 """Security functions for authentication and authorization."""
+import logging
 from datetime import datetime, timedelta, timezone
 from os import getenv
 from typing import Optional
 
-from bcrypt import checkpw, gensalt, hashpw
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt
 
-from .db import db
+from .db import async_db
+from .hashing import get_password_hash, verify_password  # pylint: disable=unused-import
+from .lazy import lazy_import
+from .server_timing import timed, timed_phase
+from .tracing import traced
+
+# jose.jwt loads the cryptography backends, which is a large share of the
+# app's import time, so it's loaded on the first token instead
+jwt = lazy_import("jose.jwt")
+
+logger = logging.getLogger(__name__)
 
 
 load_dotenv()
 SECRET_KEY = getenv("SECRET_KEY")
-print("Secret key:", SECRET_KEY)
 ALGORITHM = getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return checkpw(plain_password.encode("utf-8"),
-                   hashed_password.encode("utf-8"))
-
-
-def get_password_hash(password: str) -> str:
-    return hashpw(password.encode("utf-8"), gensalt(rounds=10)).decode("utf-8")
-
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Creates a new JWT access token."""
     to_encode = data.copy()
@@ -47,14 +46,17 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def get_current_active_user(response: Response,
-                            token: str = Depends(oauth2_scheme)):
+@traced("auth.get_current_active_user")
+@timed_phase("auth")
+async def get_current_active_user(response: Response,
+                                  token: str = Depends(oauth2_scheme)):
     """
     Decodes token, verifies user in DB, and handles token refresh.
     This is the all-in-one dependency for protected routes.
     """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with timed("jwt"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email = payload.get("sub")
         issued_at_ts = payload.get("iat")
 
@@ -73,21 +75,22 @@ def get_current_active_user(response: Response,
             response.headers["X-Token-Refresh"] = new_token
 
     except jwt.ExpiredSignatureError as exc:
-        print("Expired")
+        logger.debug("Rejected expired token")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token expired"
         ) from exc
     except (jwt.InvalidTokenError, Exception) as exc:
-        print("Could not validate")
+        logger.debug("Rejected token that could not be validated: %s", exc)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate token"
         ) from exc
 
-    user_doc = db.users.find_one({"email": email}, {"_id": 0, "password": 0})
+    user_doc = await async_db.users.find_one(
+        {"email": email}, {"_id": 0, "password": 0})
     if not user_doc:
-        print("User not found")
+        logger.debug("Rejected token for unknown user")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
@@ -95,3 +98,32 @@ def get_current_active_user(response: Response,
 
     # Return the user document
     return user_doc
+
+
+async def get_current_admin_user(
+        current_user: dict = Depends(get_current_active_user)):
+    """Like get_current_active_user, but only admins get through."""
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
+
+
+def admin_from_authorization(authorization: Optional[str]) -> Optional[str]:
+    """
+    The email of a valid admin bearer token in an Authorization header, or
+    None. Only the signed claims are checked, not the users collection, so
+    middleware can call it before routing without a database round trip.
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except Exception:  # pylint: disable=broad-exception-caught
+        return None
+    if payload.get("role") != "admin":
+        return None
+    return payload.get("sub")
@@ -0,0 +1,159 @@
+"""
+Server-Timing response headers.
+
+Every response on the API router gets a Server-Timing header that browser
+devtools show as a breakdown of the request's time:
+
+    auth            get_current_active_user, including its user lookup
+    jwt             decoding and verifying the token, part of auth
+    db              MongoDB commands, summed (they overlap auth and
+                    endpoint, and concurrent ones overlap each other)
+    endpoint        the route function itself
+    serialization   rendering the response body to JSON
+    validation      the rest of the route: parsing and validating the
+                    request, validating and encoding the response model,
+                    and any wait for a threadpool thread
+    total           until the response starts
+
+timed() records a phase when the request is being timed and is only a
+context variable lookup otherwise. SERVER_TIMING=false drops the header.
+"""
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from os import getenv
+from typing import Dict, Optional
+
+from fastapi.responses import JSONResponse
+
+from .query_monitor import current_queries
+from .threadpool import ThreadpoolRoute
+
+SERVER_TIMING = getenv("SERVER_TIMING", "true").lower() == "true"
+# Phases the route handler measures directly; validation is the remainder
+MEASURED_PHASES = ("auth", "endpoint", "serialization")
+
+
+class Timings:
+    """Milliseconds spent in each phase of one request"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases: Dict[str, float] = {}
+
+    def add(self, phase: str, duration_ms: float):
+        """Add time to a phase."""
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + duration_ms
+
+    def header(self, total_ms: float) -> str:
+        """The Server-Timing header value."""
+        entries = [f"{phase};dur={duration_ms:.1f}"
+                   for phase, duration_ms in self.phases.items()]
+        stats = current_queries.get()
+        if stats is not None and stats.count:
+            entries.append(f'db;dur={stats.duration_ms:.1f};'
+                           f'desc="{stats.count} queries"')
+        entries.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(entries)
+
+
+current_timings: ContextVar[Optional[Timings]] = ContextVar(
+    "current_timings", default=None)
+
+
+@contextmanager
+def timed(phase: str):
+    """Add the time spent in the block to the current request's phase."""
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, (time.perf_counter() - started) * 1000)
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse that times rendering as the serialization phase."""
+
+    def render(self, content) -> bytes:
+        with timed("serialization"):
+            return super().render(content)
+
+
+def timed_phase(phase: str):
+    """Decorator that times each call of a function as `phase`."""
+    def decorator(func):
+        # A sync function stays sync, so ThreadpoolRoute still offloads it
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timed(phase):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TimingRoute(ThreadpoolRoute):
+    """Route class that breaks the route's time down into phases."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, timed_phase("endpoint")(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timing_handler(request):
+            timings = current_timings.get()
+            if timings is None:
+                return await handler(request)
+            started = time.perf_counter()
+            response = await handler(request)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            measured_ms = sum(timings.phases.get(phase, 0.0)
+                              for phase in MEASURED_PHASES)
+            timings.add("validation", max(0.0, elapsed_ms - measured_ms))
+            return response
+
+        return timing_handler
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware that adds the Server-Timing header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = Timings()
+        token = current_timings.set(timings)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total_ms = (time.perf_counter() - started) * 1000
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", timings.header(total_ms).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timings.reset(token)
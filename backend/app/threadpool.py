@@ -0,0 +1,120 @@
+"""
+AnyIO threadpool sizing and saturation statistics.
+
+Sync endpoints, sync dependencies and run_in_threadpool() calls all share
+AnyIO's default thread limiter, which allows 40 threads unless
+THREADPOOL_TOKENS says otherwise. ThreadpoolRoute runs sync endpoints through
+run_in_threadpool() below, which records how long each call waited for a
+thread, per route, so time spent queueing for a thread can be told apart
+from time spent in MongoDB.
+"""
+import functools
+import inspect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from os import getenv
+from typing import Optional
+
+import anyio.to_thread
+from starlette.concurrency import \
+    run_in_threadpool as starlette_run_in_threadpool
+
+from .deadlines import DeadlineRoute
+
+logger = logging.getLogger(__name__)
+
+current_route: ContextVar[Optional[str]] = ContextVar(
+    "current_route", default=None)
+
+
+def configure_threadpool():
+    """Apply THREADPOOL_TOKENS to the running event loop's thread limiter."""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    tokens = getenv("THREADPOOL_TOKENS")
+    if tokens:
+        limiter.total_tokens = int(tokens)
+    logger.info("Threadpool limited to %d threads", limiter.total_tokens)
+
+
+class ThreadpoolStatistics:
+    """Per-route counters for time spent waiting for a threadpool thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def reset(self):
+        """Forget all recorded waits."""
+        with self._lock:
+            self._routes = {}
+
+    def record(self, route: str, wait_ms: float):
+        """Record one call's wait for a thread."""
+        with self._lock:
+            stats = self._routes.setdefault(route, {
+                "calls": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0})
+            stats["calls"] += 1
+            stats["wait_ms_total"] += wait_ms
+            stats["wait_ms_max"] = max(stats["wait_ms_max"], wait_ms)
+
+    def snapshot(self) -> dict:
+        """Limiter gauges plus per-route waits. Must run on the event loop."""
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        statistics = limiter.statistics()
+        with self._lock:
+            routes = {route: dict(stats)
+                      for route, stats in self._routes.items()}
+        return {
+            "total_tokens": limiter.total_tokens,
+            "borrowed_tokens": statistics.borrowed_tokens,
+            "tasks_waiting": statistics.tasks_waiting,
+            "routes": routes,
+        }
+
+
+threadpool_statistics = ThreadpoolStatistics()
+
+
+async def run_in_threadpool(func, *args, **kwargs):
+    """starlette's run_in_threadpool, recording the wait for a thread."""
+    label = current_route.get() or func.__qualname__
+    submitted = time.perf_counter()
+
+    def timed():
+        threadpool_statistics.record(
+            label, (time.perf_counter() - submitted) * 1000)
+        return func(*args, **kwargs)
+
+    return await starlette_run_in_threadpool(timed)
+
+
+def _offloaded(endpoint):
+    # functools.wraps keeps the signature FastAPI reads for injection, while
+    # the wrapper itself is a coroutine so FastAPI awaits it directly
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        return await run_in_threadpool(endpoint, *args, **kwargs)
+    return wrapper
+
+
+class ThreadpoolRoute(DeadlineRoute):
+    """Route class that tracks threadpool waits for the route's work."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if not inspect.iscoroutinefunction(endpoint):
+            endpoint = _offloaded(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request):
+            token = current_route.set(self.path)
+            try:
+                return await handler(request)
+            finally:
+                current_route.reset(token)
+
+        return route_handler
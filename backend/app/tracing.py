@@ -0,0 +1,214 @@
+"""
+Request tracing with OpenTelemetry.
+
+Metrics show that some requests are slow; a trace shows where one slow
+request spent its time, and on which pod. With tracing configured, every
+request gets a server span named after its route template, with child
+spans for
+
+    auth.get_current_active_user   the auth dependency
+    <command> <collection>         each MongoDB command, from QueryMonitor
+    bcrypt.verify, bcrypt.hash     password work, including the wait for
+                                   the hashing pool
+
+and every cleanup_old_games run is a root span with its MongoDB commands
+beneath it. Incoming traceparent headers are honoured, so a trace started
+by a proxy continues here, and traced responses carry their trace ID in
+X-Trace-ID for matching a slow request to its trace.
+
+TRACING_EXPORTER picks where spans go:
+
+    none      tracing is off and spans are no-ops (the default)
+    console   spans are printed as JSON, for local development
+    otlp      spans are batched to an OTLP/HTTP collector at
+              OTEL_EXPORTER_OTLP_ENDPOINT; needs the optional
+              opentelemetry-exporter-otlp-proto-http package
+    memory    spans are kept in memory, for tests
+
+Other exporters can be added to EXPORTERS or passed to tracing.configure().
+TRACING_SAMPLE_RATIO keeps that share of new traces. This module only
+imports OpenTelemetry's API, so the hashing pool's worker processes can
+import it; the SDK is imported when tracing is configured.
+"""
+import functools
+import inspect
+import logging
+import os
+import socket
+from os import getenv
+
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind, StatusCode, format_trace_id
+from opentelemetry.trace.propagation.tracecontext import \
+    TraceContextTextMapPropagator
+
+logger = logging.getLogger(__name__)
+
+TRACING_EXPORTER = getenv("TRACING_EXPORTER", "none").lower()
+TRACING_SAMPLE_RATIO = float(getenv("TRACING_SAMPLE_RATIO", "1.0"))
+SERVICE_NAME = getenv("OTEL_SERVICE_NAME", "walkamile-backend")
+TRACE_HEADER = "X-Trace-ID"
+
+_propagator = TraceContextTextMapPropagator()
+
+# pylint: disable=import-outside-toplevel
+
+
+def _console_exporter():
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+    return ConsoleSpanExporter()
+
+
+def _memory_exporter():
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import \
+        InMemorySpanExporter
+    return InMemorySpanExporter()
+
+
+def _otlp_exporter():
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import \
+            OTLPSpanExporter
+    except ImportError:
+        logger.warning("TRACING_EXPORTER=otlp needs the "
+                       "opentelemetry-exporter-otlp-proto-http package, "
+                       "tracing is off")
+        return None
+    return OTLPSpanExporter()
+
+
+# Exporter name -> factory returning a SpanExporter, or None to stay off
+EXPORTERS = {
+    "none": lambda: None,
+    "console": _console_exporter,
+    "memory": _memory_exporter,
+    "otlp": _otlp_exporter,
+}
+
+
+class Tracing:
+    """The tracer the app's spans are made with, and its exporter"""
+
+    def __init__(self):
+        self.provider = None
+        self.tracer = trace.NoOpTracer()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether spans are being recorded."""
+        return self.provider is not None
+
+    def configure(self, exporter=None, batch: bool = True,
+                  sample_ratio: float = TRACING_SAMPLE_RATIO):
+        """
+        Start sending spans to exporter, or to the TRACING_EXPORTER one.
+        Spans are exported in the background unless batch is False, in
+        which case each is exported as it ends. Returns the exporter, or
+        None if tracing stays off.
+        """
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import (BatchSpanProcessor,
+                                                    SimpleSpanProcessor)
+        from opentelemetry.sdk.trace.sampling import (ParentBased,
+                                                      TraceIdRatioBased)
+
+        if exporter is None:
+            factory = EXPORTERS.get(TRACING_EXPORTER)
+            if factory is None:
+                logger.warning("Unknown TRACING_EXPORTER %r, tracing is off",
+                               TRACING_EXPORTER)
+                return None
+            exporter = factory()
+            batch = TRACING_EXPORTER != "memory"
+        if exporter is None:
+            return None
+
+        self.shutdown()
+        provider = TracerProvider(
+            resource=Resource.create({
+                "service.name": SERVICE_NAME,
+                # The pod and worker a span comes from
+                "service.instance.id": f"{socket.gethostname()}:"
+                                       f"{os.getpid()}"}),
+            sampler=ParentBased(TraceIdRatioBased(sample_ratio)))
+        provider.add_span_processor(BatchSpanProcessor(exporter) if batch
+                                    else SimpleSpanProcessor(exporter))
+        self.provider = provider
+        self.tracer = provider.get_tracer(__name__)
+        logger.info("Tracing to %s", type(exporter).__name__)
+        return exporter
+
+    def shutdown(self):
+        """Export any spans still queued and stop tracing."""
+        if self.provider is not None:
+            self.provider.shutdown()
+            self.provider = None
+            self.tracer = trace.NoOpTracer()
+
+
+tracing = Tracing()
+
+
+def traced(name: str):
+    """Decorator that runs each call of a function in a span."""
+    def decorator(func):
+        # A sync function stays sync, so ThreadpoolRoute still offloads it
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracing.tracer.start_as_current_span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracing.tracer.start_as_current_span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracingMiddleware:
+    """ASGI middleware that runs each request in a server span."""
+
+    def __init__(self, app, control: Tracing = tracing):
+        self.app = app
+        self.tracing = control
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracing.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        parent = _propagator.extract({
+            name.decode("latin-1"): value.decode("latin-1")
+            for name, value in scope["headers"]})
+        with self.tracing.tracer.start_as_current_span(
+                method, context=parent, kind=SpanKind.SERVER,
+                attributes={"http.request.method": method,
+                            "url.path": scope["path"]}) as span:
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    # FastAPI puts the matched route in the scope
+                    route = scope.get("route")
+                    if route is not None:
+                        span.update_name(f"{method} {route.path}")
+                        span.set_attribute("http.route", route.path)
+                    status_code = message["status"]
+                    span.set_attribute("http.response.status_code",
+                                       status_code)
+                    if status_code >= 500:
+                        span.set_status(StatusCode.ERROR)
+                    if span.is_recording():
+                        trace_id = format_trace_id(
+                            span.get_span_context().trace_id)
+                        message["headers"] = [
+                            *message.get("headers", []),
+                            (TRACE_HEADER.lower().encode(),
+                             trace_id.encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
@@ -0,0 +1,84 @@
+"""
+Startup warm-up and readiness gating.
+
+Without a warm-up, a new worker's first requests pay for opening MongoDB
+connections and loading board templates and instructions, and index builds
+run alongside them. warm_up() does that work once, in the background, as
+the worker starts, retrying until the database is reachable. /readyz
+reports 503 until it has finished, so Kubernetes only sends traffic to
+warm pods.
+"""
+import asyncio
+import logging
+import time
+from os import getenv
+from typing import Optional
+
+from .cache import CachedQuery
+from .cleanup import create_activity_index, create_cleanup_index
+from .db import async_db, initialize_database
+
+logger = logging.getLogger(__name__)
+
+# Connections to open in the async client's pool before reporting ready
+WARMUP_CONNECTIONS = int(
+    getenv("WARMUP_CONNECTIONS", getenv("MONGO_MIN_POOL_SIZE") or "4"))
+WARMUP_MAX_RETRY_SECONDS = 30
+
+
+class Readiness:
+    """Whether this worker has finished warming up"""
+
+    def __init__(self):
+        self.ready = False
+        self.attempts = 0
+        self.last_error: Optional[str] = None
+        self.warm_up_ms: Optional[float] = None
+
+    def snapshot(self) -> dict:
+        """Readiness state for the /readyz endpoint."""
+        return {
+            "status": "ready" if self.ready else "warming up",
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "warm_up_ms": self.warm_up_ms,
+        }
+
+
+readiness = Readiness()
+
+
+async def _warm_up_once(caches):
+    # Concurrent pings each need a connection of their own, so this opens
+    # WARMUP_CONNECTIONS connections in the pool
+    await asyncio.gather(*(async_db.command("ping")
+                           for _ in range(WARMUP_CONNECTIONS)))
+    # Seeding and index builds use the sync client, off the event loop
+    await asyncio.to_thread(initialize_database)
+    await asyncio.to_thread(create_cleanup_index)
+    await asyncio.to_thread(create_activity_index)
+    for cache in caches:
+        await cache.refresh()
+
+
+async def warm_up(*caches: CachedQuery):
+    """Warm this worker up, retrying with backoff, then mark it ready."""
+    started = time.perf_counter()
+    delay = 1
+    while True:
+        readiness.attempts += 1
+        try:
+            await _warm_up_once(caches)
+            break
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            readiness.last_error = str(e)
+            logger.warning("Warm-up attempt %d failed, retrying in %ds: %s",
+                           readiness.attempts, delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WARMUP_MAX_RETRY_SECONDS)
+
+    readiness.warm_up_ms = (time.perf_counter() - started) * 1000
+    readiness.last_error = None
+    readiness.ready = True
+    logger.info("Warm-up finished in %.0f ms, ready for traffic",
+                readiness.warm_up_ms)
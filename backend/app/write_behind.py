@@ -0,0 +1,236 @@
+"""
+Optional write-behind buffering for team board, energy and circumstance
+updates.
+
+During play every marker click is a board or energy write. With
+WRITE_BEHIND_ENABLED=true those updates are applied to an in-memory copy of
+the team and acknowledged straight away, and a background thread flushes
+the changes to MongoDB as one bulk_write per room every
+WRITE_BEHIND_FLUSH_MS milliseconds. Circumstance changes go through the
+buffer too, so a buffered team's revision only ever moves in one place and
+If-Match works the same for all three. Updates made since the last flush are
+lost if the process dies, so the loss window is bounded by the flush
+interval. The buffer is per process and nothing routes a room's requests
+to one worker, so it stays off when WEB_CONCURRENCY, which gunicorn_conf
+sets in each worker, is more than 1.
+"""
+import logging
+import threading
+import time
+from os import getenv
+from typing import Callable, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from .cpus import worker_processes
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+BUFFERED_FIELDS = ("circumstance", "current_energy", "gameboard_state")
+# How long a flushed team's revision is remembered after it is evicted, so
+# a database read that started before the flush can't be loaded over it
+EVICTED_REVISION_SECONDS = 60
+
+
+class RevisionConflict(Exception):
+    """Raised when a buffered write's If-Match revision is stale."""
+
+    def __init__(self, team: dict):
+        super().__init__("Team was modified by another request")
+        self.team = team
+
+
+class WriteBehindBuffer:
+    """In-memory per-team state that is flushed to the rooms collection"""
+
+    def __init__(self, enabled: bool, flush_interval_ms: int):
+        self.enabled = enabled
+        self.flush_interval_ms = flush_interval_ms
+        self._lock = threading.Lock()
+        self._teams = {}
+        self._evicted = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _key(room_code: str, team_name: str):
+        return room_code.upper(), team_name
+
+    def get(self, room_code: str, team_name: str) -> Optional[dict]:
+        """Buffered state of a team, or None if it isn't buffered."""
+        with self._lock:
+            entry = self._teams.get(self._key(room_code, team_name))
+            return dict(entry["team"]) if entry else None
+
+    def load(self, room_code: str, team_name: str, team: dict,
+             room_id=None) -> bool:
+        """
+        Start buffering a team from its current database state.
+
+        room_id is the _id of the room document the team was read from.
+        Returns False if the state is older than what the last flush wrote
+        to that same document, which happens when the team was flushed and
+        evicted while it was being read. The caller should read it again.
+        A room deleted and created again under the same code is a new
+        document, so its teams load normally.
+        """
+        key = self._key(room_code, team_name)
+        state = {field: team.get(field) for field in BUFFERED_FIELDS}
+        state["team_name"] = team_name
+        state["revision"] = team.get("revision") or 0
+        with self._lock:
+            evicted = self._evicted.get(key)
+            if (evicted and evicted[1] == room_id
+                    and state["revision"] < evicted[0]):
+                return False
+            self._teams.setdefault(key, {
+                "team": state, "room_id": room_id, "dirty": set(),
+                "pending": 0})
+            return True
+
+    def apply(self, room_code: str, team_name: str,
+              change: Callable[[dict], dict],
+              expected: Optional[int] = None) -> Optional[dict]:
+        """
+        Apply change(state) -> {field: value} to a buffered team.
+
+        Returns the new state, or None if the team isn't buffered (the
+        caller should load it and try again). Raises RevisionConflict if
+        expected doesn't match the buffered revision.
+        """
+        with self._lock:
+            entry = self._teams.get(self._key(room_code, team_name))
+            if entry is None:
+                return None
+            state = entry["team"]
+            if expected is not None and state["revision"] != expected:
+                raise RevisionConflict(dict(state))
+
+            updates = change(state)
+            state.update(updates)
+            state["revision"] += 1
+            entry["dirty"].update(updates)
+            entry["pending"] += 1
+            return dict(state)
+
+    def overlay(self, room: dict) -> dict:
+        """Replace a room document's teams with their buffered state."""
+        room_code = room.get("room_code", "")
+        with self._lock:
+            for team in room.get("teams") or []:
+                entry = self._teams.get(
+                    self._key(room_code, team.get("team_name")))
+                if entry:
+                    team.update(entry["team"])
+        return room
+
+    def discard(self, room_code: str, team_name: Optional[str] = None):
+        """Drop buffered state for a deleted team, or a whole deleted room."""
+        room_code = room_code.upper()
+        with self._lock:
+            for key in list(self._teams):
+                if key[0] == room_code and team_name in (None, key[1]):
+                    del self._teams[key]
+            for key in list(self._evicted):
+                if key[0] == room_code and team_name in (None, key[1]):
+                    del self._evicted[key]
+
+    def flush(self) -> int:
+        """Write all dirty teams to MongoDB. Returns the number of teams."""
+        rooms = {}
+        with self._lock:
+            for (room_code, team_name), entry in self._teams.items():
+                if not entry["dirty"]:
+                    continue
+                fields = {field: entry["team"][field]
+                          for field in entry["dirty"]}
+                rooms.setdefault(room_code, []).append(
+                    (team_name, fields, entry["pending"]))
+                entry["dirty"] = set()
+                entry["pending"] = 0
+
+        written = 0
+        for room_code, teams in rooms.items():
+            requests = [
+                UpdateOne(
+                    {"room_code": room_code, "teams.team_name": team_name},
+                    {"$set": {f"teams.$.{field}": value
+                              for field, value in fields.items()},
+                     "$inc": {"revision": pending,
+                              "teams.$.revision": pending},
+                     "$currentDate": {"last_activity_at": True}})
+                for team_name, fields, pending in teams
+            ]
+            try:
+                db.rooms.bulk_write(requests, ordered=False)
+                written += len(teams)
+            except PyMongoError as e:
+                logger.error("Write-behind flush failed for room %s: %s",
+                             room_code, e)
+                self._requeue(room_code, teams)
+
+        self._evict_clean()
+        return written
+
+    def _requeue(self, room_code: str, teams: list):
+        with self._lock:
+            for team_name, fields, pending in teams:
+                entry = self._teams.get((room_code, team_name))
+                if entry:
+                    entry["dirty"].update(fields)
+                    entry["pending"] += pending
+
+    def _evict_clean(self):
+        # Once flushed the database is up to date, so idle teams are
+        # reloaded on their next write rather than cached indefinitely
+        now = time.monotonic()
+        with self._lock:
+            for key in [key for key, entry in self._teams.items()
+                        if not entry["dirty"]]:
+                entry = self._teams.pop(key)
+                self._evicted[key] = (entry["team"]["revision"],
+                                      entry["room_id"], now)
+            for key in [key for key, (*_, evicted_at) in self._evicted.items()
+                        if now - evicted_at > EVICTED_REVISION_SECONDS]:
+                del self._evicted[key]
+
+    def start(self):
+        """Start the background flush thread."""
+        if not self.enabled or self._thread:
+            return
+        workers = worker_processes()
+        if workers > 1:
+            logger.error("Write-behind buffering needs a single worker, but "
+                         "%d are running; writing straight to MongoDB",
+                         workers)
+            self.enabled = False
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="WriteBehindFlush", daemon=True)
+        self._thread.start()
+        logger.info("Write-behind buffer started: flushing every %d ms",
+                    self.flush_interval_ms)
+
+    def stop(self):
+        """Stop the flush thread and write out anything still buffered."""
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if self.enabled:
+            self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval_ms / 1000):
+            try:
+                self.flush()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error("Write-behind flush error: %s", e)
+
+
+write_buffer = WriteBehindBuffer(
+    enabled=getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true",
+    flush_interval_ms=int(getenv("WRITE_BEHIND_FLUSH_MS", "200")))
@@ -0,0 +1,98 @@
+"""Tests for admission control and load shedding"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app.admission import (RETRY_AFTER_JITTER_SECONDS,
+                                   RETRY_AFTER_SECONDS, AdmissionControl,
+                                   AdmissionControlMiddleware, room_of)
+
+app = FastAPI()
+
+
+@app.get("/rooms/{room_code}")
+async def poll_room(room_code: str):
+    return {"room_code": room_code}
+
+
+@app.post("/rooms/{room_code}/time")
+async def update_time(room_code: str):
+    return {"room_code": room_code}
+
+
+@app.get("/health")
+async def health():
+    return {"status": "healthy"}
+
+
+control = AdmissionControl(max_in_flight=8, max_room_in_flight=4,
+                           poll_share=0.5)
+app.add_middleware(AdmissionControlMiddleware, control=control)
+client = TestClient(app)
+
+
+def _fill(room, count, polling=False):
+    for _ in range(count):
+        assert control.admit(room, polling) is None
+
+
+def _drain(room, count):
+    for _ in range(count):
+        control.release(room)
+
+
+def test_room_of_path():
+    """Test that room codes are read from room paths only"""
+    assert room_of("/rooms/ABC123") == "ABC123"
+    assert room_of("/rooms/ABC123/teams/Red/board") == "ABC123"
+    assert room_of("/rooms/abc123/teams/Red/board") == "ABC123"
+    assert room_of("/rooms/create") is None
+    assert room_of("/login") is None
+
+
+def test_polls_are_shed_before_mutations_in_a_busy_room():
+    """Test that a busy room sheds polls with 429 but admits mutations"""
+    control.reset()
+    _fill("ABC123", 2)
+    try:
+        response = client.get("/rooms/ABC123")
+        assert response.status_code == 429
+        retry_after = int(response.headers["Retry-After"])
+        assert RETRY_AFTER_SECONDS <= retry_after <= \
+            RETRY_AFTER_SECONDS + RETRY_AFTER_JITTER_SECONDS
+        assert response.json()["retry_after_ms"] >= retry_after * 1000
+
+        assert client.post("/rooms/ABC123/time").status_code == 200
+        assert client.get("/rooms/OTHER").status_code == 200
+    finally:
+        _drain("ABC123", 2)
+
+    shed = control.snapshot()["shed"]
+    assert shed["room"] == {"poll": 1, "mutation": 0}
+    assert control.snapshot()["in_flight"] == 0
+
+
+def test_full_process_sheds_everything_with_503():
+    """Test that a full process sheds all requests but keeps probes up"""
+    control.reset()
+    _fill(None, 8)
+    try:
+        assert client.get("/rooms/ABC123").status_code == 503
+        assert client.post("/rooms/ABC123/time").status_code == 503
+        assert client.get("/health").status_code == 200
+    finally:
+        _drain(None, 8)
+
+    snapshot = control.snapshot()
+    assert snapshot["shed"]["global"] == {"poll": 1, "mutation": 1}
+    assert snapshot["admitted"] == 8
+    assert client.get("/rooms/ABC123").status_code == 200
+
+
+def test_release_forgets_idle_rooms():
+    """Test that per-room counters don't grow with every room seen"""
+    control.reset()
+    client.get("/rooms/ABC123")
+    client.post("/rooms/XYZ789/time")
+
+    assert not control.room_in_flight
+    assert control.snapshot()["busiest_room_in_flight"] == 0
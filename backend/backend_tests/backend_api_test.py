@@ -9,6 +9,7 @@ from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
 from backend.app.models import AccessCode
+from backend.backend_tests.mocks import AsyncDatabaseMock
 
 os.environ['TESTING'] = 'true'
 
@@ -49,12 +50,12 @@ def test_read_root():
     assert response.json() == {"message": "Welcome to your todo list."}
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_get_items(mock_db_instance):
     """Test getting items from database"""
     # Mock database response
     mock_db_instance.list_collection_names.return_value = ["points"]
-    mock_db_instance.points.find.return_value = [
+    mock_db_instance.points.find.return_value.to_list.return_value = [
         {"id": "0", "values": 100}
     ]
 
@@ -71,7 +72,7 @@ def test_get_items(mock_db_instance):
 # --------------------------------------------------------------------------------------------
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_update_points_increase(mock_db_instance):
     """Test updating points with positive change"""
     # Mock database response
@@ -93,7 +94,7 @@ def test_update_points_increase(mock_db_instance):
                                                              "_id": 0})
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_update_points_decrease(mock_db_instance):
     """Test updating points with negative change"""
     # Mock database response
@@ -130,7 +131,7 @@ def test_update_points_no_body():
 # --------------------------------------------------------------------------------------------
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_health_check_healthy(mock_db_instance):
     """Test health check when database connection is healthy"""
     # Mock successful database connection
@@ -147,7 +148,7 @@ def test_health_check_healthy(mock_db_instance):
     mock_db_instance.client.server_info.assert_called_once()
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_health_check_unhealthy(mock_db_instance):
     """Test health check when database connection fails"""
     # Mock database connection failure
@@ -166,7 +167,7 @@ def test_health_check_unhealthy(mock_db_instance):
     mock_db_instance.client.server_info.assert_called_once()
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_health_check_various_db_errors(mock_db_instance):
     """Test health check with different database error types"""
     # Test with different error messages
@@ -192,7 +193,7 @@ def test_health_check_various_db_errors(mock_db_instance):
 # --------------------------------------------------------------------------------------------
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_login_user_doesnt_exist(mock_db_instance):
     """Test login attempt with non-existing user"""
 
@@ -210,8 +211,8 @@ def test_login_user_doesnt_exist(mock_db_instance):
         {"email": "test@example.com"})
 
 
-@patch('backend.app.api.verify_password')
-@patch('backend.app.api.db')
+@patch('backend.app.api.password_hasher.verify')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_login_wrong_password_or_email(mock_db_instance, mock_verify_password):
     """Test login attempt with incorrect credentials"""
 
@@ -245,8 +246,8 @@ def test_login_wrong_password_or_email(mock_db_instance, mock_verify_password):
 
 
 @patch('backend.app.api.create_access_token')
-@patch('backend.app.api.verify_password')
-@patch('backend.app.api.db')
+@patch('backend.app.api.password_hasher.verify')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_login_successful_login_attempt(
         mock_db_instance, mock_verify_password, mock_create_access_token):
     """Test successful login attempt"""
@@ -285,7 +286,7 @@ def test_login_successful_login_attempt(
         {"email": "test@example.com"})
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_login_un_activated_user(mock_db_instance):
     """Test login attempt when no active access code for user"""
 
@@ -312,9 +313,9 @@ def test_login_un_activated_user(mock_db_instance):
         {"usedByUser": "test@example.com"})
 
 
-@patch('backend.app.api.verify_password')
+@patch('backend.app.api.password_hasher.verify')
 @patch('backend.app.api.is_code_expired')
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_login_expired_code(
         mock_db_instance, mock_is_code_expired, mock_verify_password):
     """Test login attempt when no active access code for user"""
@@ -353,9 +354,9 @@ def test_login_expired_code(
 
 
 @patch('backend.app.api.create_access_token')
-@patch('backend.app.api.verify_password')
+@patch('backend.app.api.password_hasher.verify')
 @patch('backend.app.api.is_code_expired')
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_admins_ignore_expired_code_on_login(
         mock_db_instance, mock_is_code_expired, mock_verify_password, mock_create_access_token):
     """Test login attempt with expired code, but user is admin so it should be ignored"""
@@ -398,7 +399,7 @@ def test_admins_ignore_expired_code_on_login(
         {"usedByUser": "test@example.com"})
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_register_email_already_in_use(mock_db_instance):
     """Test register attempt with already existing email"""
 
@@ -432,7 +433,7 @@ def test_register_email_already_in_use(mock_db_instance):
         {"email": "test@example.com"})
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_register_incorrect_activation_code(mock_db_instance):
     """Test register attempt with already existing email"""
 
@@ -456,7 +457,7 @@ def test_register_incorrect_activation_code(mock_db_instance):
         {"code": "invalid_code"})
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_register_invalid_email(mock_db_instance):
     """Test register attempt with invalid email"""
 
@@ -476,8 +477,8 @@ def test_register_invalid_email(mock_db_instance):
     assert response.json()['detail'][0]['msg'] == error_msg
 
 
-@patch('backend.app.api.get_password_hash')
-@patch('backend.app.api.db')
+@patch('backend.app.api.password_hasher.hash')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_register_successful_register_attempt(
         mock_db_instance, mock_get_password_hash):
     """Test registering successfully"""
@@ -521,8 +522,8 @@ def test_register_successful_register_attempt(
     )
 
 
-@patch('backend.app.api.verify_password')
-@patch('backend.app.api.db')
+@patch('backend.app.api.password_hasher.verify')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_renew_access_code_wrong_user(mock_db_instance, mock_verify_password):
     """Test renewing access code with wrong user"""
 
@@ -555,8 +556,8 @@ def test_renew_access_code_wrong_user(mock_db_instance, mock_verify_password):
 
 
 @patch('backend.app.api.activate_code')
-@patch('backend.app.api.verify_password')
-@patch('backend.app.api.db')
+@patch('backend.app.api.password_hasher.verify')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_renew_access_code_invalid_code(
         mock_db_instance, mock_verify_password, mock_activate_code):
     """Test renewing access code with invalid code"""
@@ -597,8 +598,8 @@ def test_renew_access_code_invalid_code(
 
 
 @patch('backend.app.api.activate_code')
-@patch('backend.app.api.verify_password')
-@patch('backend.app.api.db')
+@patch('backend.app.api.password_hasher.verify')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_renew_access_code_successfully(
         mock_db_instance, mock_verify_password, mock_activate_code):
     """Test renewing access code successfully"""
@@ -655,7 +656,7 @@ def test_renew_access_code_successfully(
 
 
 @patch('backend.app.api.generate_new_access_code')
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_generate_new_access_code(
         mock_db_instance, mock_generate_new_access_code):
     """Test generating new access code"""
@@ -701,7 +702,7 @@ def test_read_current_user():
     app.dependency_overrides = {}
     
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_remove_access_code(mock_db_instance):
     """Test removing accesscode from db"""
     code = "AAAA-AAAA-AAAA-AAAA"
@@ -717,7 +718,7 @@ def test_remove_access_code(mock_db_instance):
     )
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_accept_user_success(mock_db_instance):
     """Test successfully accepting a user"""
     mock_db_instance.users.update_one.return_value = MagicMock()
@@ -735,7 +736,7 @@ def test_accept_user_success(mock_db_instance):
     )
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_accept_user_invalid_data(mock_db_instance):
     """Test accepting a user with invalid data"""
     response = client.put("/accept_user", json={
@@ -746,7 +747,7 @@ def test_accept_user_invalid_data(mock_db_instance):
     assert response.status_code == 422
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_remove_user_success(mock_db_instance):
     """Test successfully removing a user"""
     mock_db_instance.users.delete_one.return_value = MagicMock()
@@ -760,7 +761,7 @@ def test_remove_user_success(mock_db_instance):
         {"email": "test@example.com"})
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_load_users_success(mock_db_instance):
     """Test successfully loading all users"""
     mock_users = [
@@ -768,8 +769,8 @@ def test_load_users_success(mock_db_instance):
         {"email": "user2@example.com", "role": "gamemaster"}
     ]
     mock_codes = ["mock_code_1", "mock_code_2"]
-    mock_db_instance.users.find.return_value = mock_users
-    mock_db_instance.codes.find.return_value = mock_codes
+    mock_db_instance.users.find.return_value.to_list.return_value = mock_users
+    mock_db_instance.codes.find.return_value.to_list.return_value = mock_codes
 
     response = client.get("/load_user_data")
 
@@ -785,11 +786,11 @@ def test_load_users_success(mock_db_instance):
     mock_db_instance.codes.find.assert_called_once()
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_load_users_empty(mock_db_instance):
     """Test loading users when none exist"""
-    mock_db_instance.users.find.return_value = []
-    mock_db_instance.codes.find.return_value = []
+    mock_db_instance.users.find.return_value.to_list.return_value = []
+    mock_db_instance.codes.find.return_value.to_list.return_value = []
 
     response = client.get("/load_user_data")
 
@@ -802,7 +803,7 @@ def test_load_users_empty(mock_db_instance):
 # --------------------------------------------------------------------------------------------
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_save_board_success(mock_db_instance):
     """Test successfully saving a board"""
     mock_db_instance.users.update_one.return_value = MagicMock()
@@ -823,7 +824,7 @@ def test_save_board_success(mock_db_instance):
     mock_db_instance.users.update_one.assert_called_once()
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_save_board_invalid_data(mock_db_instance):
     """Test saving a board with invalid data"""
     response = client.put("/save_board", json={
@@ -834,7 +835,7 @@ def test_save_board_invalid_data(mock_db_instance):
     assert response.status_code == 422
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_delete_board_success(mock_db_instance):
     """Test successfully deleting a board"""
     mock_db_instance.users.update_one.return_value = MagicMock()
@@ -848,14 +849,14 @@ def test_delete_board_success(mock_db_instance):
         {"email": "admin@test.com"}, {"$pull": {"boards": {"name": "Test Board"}}})
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_load_all_boards(mock_db_instance):
     """Test loading all boards"""
     mock_boards = [
         {"name": "Board 1", "ringData": []},
         {"name": "Board 2", "ringData": []}
     ]
-    mock_db_instance.boards.find.return_value = mock_boards
+    mock_db_instance.boards.find.return_value.to_list.return_value = mock_boards
     mock_db_instance.users.find_one.return_value = {"boards": []}
 
     response = client.get("/load_boards")
@@ -865,10 +866,10 @@ def test_load_all_boards(mock_db_instance):
     mock_db_instance.boards.find.assert_called_once()
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_load_all_boards_empty(mock_db_instance):
     """Test loading boards when none exist"""
-    mock_db_instance.boards.find.return_value = []
+    mock_db_instance.boards.find.return_value.to_list.return_value = []
     mock_db_instance.users.find_one.return_value = {"boards": []}
 
     response = client.get("/load_boards")
@@ -882,7 +883,7 @@ def test_load_all_boards_empty(mock_db_instance):
 # --------------------------------------------------------------------------------------------
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_load_instructions_success(mock_db_instance):
     """Test successfully loading instructions"""
     mock_instructions = {
@@ -899,7 +900,7 @@ def test_load_instructions_success(mock_db_instance):
                                                                    "_id": 0})
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_load_instructions_not_found(mock_db_instance):
     """Test loading instructions when none exist"""
     mock_db_instance.instructions.find_one.return_value = None
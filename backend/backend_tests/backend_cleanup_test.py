@@ -2,7 +2,11 @@
 from unittest.mock import MagicMock, patch
 from datetime import datetime, timezone, timedelta
 
-from backend.app.cleanup import cleanup_old_games, create_cleanup_index
+import pytest
+
+from backend.app.cleanup import (cleanup_old_games, create_activity_index,
+                                 create_cleanup_index)
+from backend.backend_tests.mocks import mock_expired_rooms
 
 
 class TestCleanupOldGames:
@@ -12,6 +16,7 @@ class TestCleanupOldGames:
     def test_cleanup_deletes_old_games(self, mock_db):
         """Test that games older than 3 hours are deleted"""
         # Setup mock
+        mock_expired_rooms(mock_db, 5)
         mock_result = MagicMock()
         mock_result.deleted_count = 5
         mock_db.rooms.delete_many.return_value = mock_result
@@ -38,6 +43,7 @@ class TestCleanupOldGames:
     @patch('backend.app.cleanup.db')
     def test_cleanup_uses_correct_cutoff_time(self, mock_db):
         """Test that cleanup uses 3-hour cutoff time"""
+        mock_expired_rooms(mock_db, 2)
         mock_result = MagicMock()
         mock_result.deleted_count = 2
         mock_db.rooms.delete_many.return_value = mock_result
@@ -64,6 +70,7 @@ class TestCleanupOldGames:
     @patch('backend.app.cleanup.db')
     def test_cleanup_returns_zero_when_no_games_deleted(self, mock_db):
         """Test that cleanup returns 0 when no games are deleted"""
+        mock_expired_rooms(mock_db, 0)
         mock_result = MagicMock()
         mock_result.deleted_count = 0
         mock_db.rooms.delete_many.return_value = mock_result
@@ -71,12 +78,13 @@ class TestCleanupOldGames:
         deleted = cleanup_old_games()
 
         assert deleted == 0
-        assert mock_db.rooms.delete_many.called
+        assert not mock_db.rooms.delete_many.called
 
     @patch('backend.app.cleanup.db')
     @patch('backend.app.cleanup.logger')
     def test_cleanup_logs_deletion_count(self, mock_logger, mock_db):
         """Test that cleanup logs the number of deleted games"""
+        mock_expired_rooms(mock_db, 3)
         mock_result = MagicMock()
         mock_result.deleted_count = 3
         mock_db.rooms.delete_many.return_value = mock_result
@@ -96,6 +104,7 @@ class TestCleanupOldGames:
     def test_cleanup_logs_debug_when_nothing_deleted(
             self, mock_logger, mock_db):
         """Test that cleanup logs debug message when nothing is deleted"""
+        mock_expired_rooms(mock_db, 0)
         mock_result = MagicMock()
         mock_result.deleted_count = 0
         mock_db.rooms.delete_many.return_value = mock_result
@@ -110,14 +119,16 @@ class TestCleanupOldGames:
     @patch('backend.app.cleanup.db')
     @patch('backend.app.cleanup.logger')
     def test_cleanup_handles_exceptions(self, mock_logger, mock_db):
-        """Test that cleanup handles database exceptions gracefully"""
+        """Test that cleanup logs database exceptions and raises them"""
+        mock_expired_rooms(mock_db, 2)
         mock_db.rooms.delete_many.side_effect = Exception(
             "Database connection error")
 
-        deleted = cleanup_old_games()
+        # Raised for the scheduler's job history, after logging the error
+        # (using lazy logging format)
+        with pytest.raises(Exception, match="Database connection error"):
+            cleanup_old_games()
 
-        # Should return 0 and log error (using lazy logging format)
-        assert deleted == 0
         mock_logger.error.assert_called_once()
         log_format = mock_logger.error.call_args[0][0]
         assert "error" in log_format.lower()
@@ -125,6 +136,7 @@ class TestCleanupOldGames:
     @patch('backend.app.cleanup.db')
     def test_cleanup_query_format(self, mock_db):
         """Test that the MongoDB query has the correct structure"""
+        mock_expired_rooms(mock_db, 1)
         mock_result = MagicMock()
         mock_result.deleted_count = 1
         mock_db.rooms.delete_many.return_value = mock_result
@@ -141,6 +153,93 @@ class TestCleanupOldGames:
         assert "$ne" in query["game_started_at"]
         assert "$lt" in query["game_started_at"]
 
+    @patch('backend.app.cleanup.CLEANUP_BATCH_SIZE', 2)
+    @patch('backend.app.cleanup.time.sleep')
+    @patch('backend.app.cleanup.db')
+    def test_cleanup_deletes_in_batches_by_id(self, mock_db, mock_sleep):
+        """Test that expired rooms are deleted by _id, batch by batch"""
+        mock_db.maintenance.find_one.return_value = None
+        # Two batches of started games, then nothing for the other policies
+        batches = [[{"_id": 1}, {"_id": 2}], [{"_id": 3}], [], [], []]
+        mock_db.rooms.find.return_value.sort.return_value.limit.side_effect = \
+            batches
+        mock_db.rooms.delete_many.side_effect = [
+            MagicMock(deleted_count=2), MagicMock(deleted_count=1)]
+
+        assert cleanup_old_games() == 3
+
+        deletes = [c[0][0] for c in mock_db.rooms.delete_many.call_args_list]
+        assert [d["_id"] for d in deletes] == [
+            {"$in": [1, 2]}, {"$in": [3]}]
+        second_find = mock_db.rooms.find.call_args_list[1][0][0]
+        assert second_find["_id"] == {"$gt": 2}
+        mock_sleep.assert_called_once()
+        # Finished, so the next run starts over with a fresh cutoff
+        mock_db.maintenance.delete_one.assert_any_call(
+            {"_id": "cleanup_old_games:started_games"})
+
+    @patch('backend.app.cleanup.CLEANUP_BATCH_SIZE', 2)
+    @patch('backend.app.cleanup.CLEANUP_TIME_BUDGET_SECONDS', -1)
+    @patch('backend.app.cleanup.db')
+    def test_cleanup_stops_at_time_budget(self, mock_db):
+        """Test that a run over its budget stops and keeps its progress"""
+        mock_expired_rooms(mock_db, 2)
+        mock_db.rooms.delete_many.return_value = MagicMock(deleted_count=2)
+
+        assert cleanup_old_games() == 2
+
+        assert mock_db.rooms.delete_many.call_count == 1
+        progress = mock_db.maintenance.update_one.call_args[0][1]["$set"]
+        assert progress["last_id"] == 1
+        assert not mock_db.maintenance.delete_one.called
+
+    @patch('backend.app.cleanup.db')
+    def test_cleanup_resumes_saved_progress(self, mock_db):
+        """Test that a run continues an unfinished run's cutoff and position"""
+        mock_expired_rooms(mock_db, 1)
+        saved = {"_id": "cleanup_old_games:started_games",
+                 "cutoff": "2025-01-01T00:00:00+00:00", "last_id": 41}
+        mock_db.maintenance.find_one.side_effect = lambda query: (
+            saved if query["_id"] == saved["_id"] else None)
+        mock_db.rooms.delete_many.return_value = MagicMock(deleted_count=1)
+
+        cleanup_old_games()
+
+        query = mock_db.rooms.find.call_args_list[0][0][0]
+        assert query["_id"] == {"$gt": 41}
+        assert query["game_started_at"]["$lt"] == "2025-01-01T00:00:00+00:00"
+
+    @patch('backend.app.cleanup.db')
+    def test_cleanup_expires_idle_rooms_by_policy(self, mock_db):
+        """Test that idle lobbies, finished games and comparison rooms expire"""
+        mock_expired_rooms(mock_db, 0)
+        before = datetime.now(timezone.utc)
+
+        cleanup_old_games()
+
+        queries = [c[0][0] for c in mock_db.rooms.find.call_args_list]
+        lobby, finished, comparison = queries[1:]
+        assert lobby["game_started_at"] is None
+        assert abs(lobby["last_activity_at"]["$lt"] -
+                   (before - timedelta(hours=12))) < timedelta(minutes=1)
+        assert finished["game_started"] is False
+        assert finished["comparison_mode"] == {"$ne": True}
+        assert abs(finished["last_activity_at"]["$lt"] -
+                   (before - timedelta(hours=1))) < timedelta(minutes=1)
+        assert comparison["comparison_mode"] is True
+
+    @patch('backend.app.cleanup.db')
+    @patch('backend.app.cleanup.logger')
+    def test_cleanup_counts_each_policy(self, mock_logger, mock_db):
+        """Test that the run summary breaks deletions down by policy"""
+        mock_expired_rooms(mock_db, 2, policy_field="last_activity_at")
+        mock_db.rooms.delete_many.return_value = MagicMock(deleted_count=2)
+
+        assert cleanup_old_games() == 6
+
+        summary = mock_logger.info.call_args[0]
+        assert "abandoned_lobbies: 2" in summary[-1]
+        assert "comparison_rooms: 2" in summary[-1]
 
 class TestCreateCleanupIndex:
     """Test suite for create_cleanup_index function"""
@@ -189,3 +288,13 @@ class TestCreateCleanupIndex:
 
         # Check sparse parameter
         assert call_args[1]['sparse'] is True
+
+    @patch('backend.app.cleanup.db')
+    def test_activity_index_backfills_old_rooms(self, mock_db):
+        """Test that rooms without last_activity_at get a starting value"""
+        create_activity_index()
+
+        mock_db.rooms.create_index.assert_called_once_with("last_activity_at")
+        query, update = mock_db.rooms.update_many.call_args[0]
+        assert query == {"last_activity_at": {"$exists": False}}
+        assert update == {"$currentDate": {"last_activity_at": True}}
@@ -0,0 +1,46 @@
+"""Tests for counting the CPUs a container may use"""
+from unittest.mock import patch
+
+import pytest
+
+from backend.app import cpus
+
+
+@pytest.fixture(name="cgroup")
+def fixture_cgroup(tmp_path):
+    """Point the cgroup v2 and v1 files at a temporary directory"""
+    paths = {"CGROUP_V2_CPU_MAX": tmp_path / "cpu.max",
+             "CGROUP_V1_QUOTA": tmp_path / "cpu.cfs_quota_us",
+             "CGROUP_V1_PERIOD": tmp_path / "cpu.cfs_period_us"}
+    with patch.multiple(cpus, **{name: str(path)
+                                 for name, path in paths.items()}):
+        yield paths
+
+
+def test_v2_quota_is_rounded_up(cgroup):
+    """Test that 1.5 CPUs of quota on cgroup v2 counts as 2"""
+    cgroup["CGROUP_V2_CPU_MAX"].write_text("150000 100000\n")
+
+    assert cpus.cgroup_cpu_limit() == 2
+
+
+def test_unlimited_cgroups_have_no_limit(cgroup):
+    """Test that "max" on v2, -1 on v1 and missing files mean no limit"""
+    assert cpus.cgroup_cpu_limit() is None
+
+    cgroup["CGROUP_V1_QUOTA"].write_text("-1\n")
+    cgroup["CGROUP_V1_PERIOD"].write_text("100000\n")
+    assert cpus.cgroup_cpu_limit() is None
+
+    cgroup["CGROUP_V2_CPU_MAX"].write_text("max 100000\n")
+    assert cpus.cgroup_cpu_limit() is None
+
+
+def test_v1_quota_caps_available_cpus(cgroup):
+    """Test that a cgroup v1 quota caps the affinity mask's CPU count"""
+    cgroup["CGROUP_V1_QUOTA"].write_text("50000\n")
+    cgroup["CGROUP_V1_PERIOD"].write_text("100000\n")
+
+    with patch('backend.app.cpus.os.sched_getaffinity',
+               return_value=set(range(32))):
+        assert cpus.available_cpus() == 1
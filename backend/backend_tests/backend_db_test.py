@@ -1,7 +1,9 @@
 """Tests for database initialization and connection"""
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
-from backend.app.db import initialize_database, db, client
+from backend.app.db import (LazyProxy, PoolStatistics, client, client_options,
+                            db, initialize_database, pool_snapshot)
 
 
 class TestDatabaseInitialization:
@@ -129,3 +131,125 @@ class TestDatabaseModule:
     def test_client_object_exists(self):
         """Test that client object is available"""
         assert client is not None
+
+
+class TestClientOptions:
+    """Test MongoClient settings read from the environment"""
+
+    def test_defaults_when_unset(self, monkeypatch):
+        """Test that unset variables leave the driver defaults alone"""
+        for name in ("MONGO_MAX_POOL_SIZE", "MONGO_MIN_POOL_SIZE",
+                     "MONGO_WAIT_QUEUE_TIMEOUT_MS", "MONGO_COMPRESSORS",
+                     "MONGO_SERVER_SELECTION_TIMEOUT_MS",
+                     "MONGO_SOCKET_TIMEOUT_MS", "MONGO_CONNECT_TIMEOUT_MS"):
+            monkeypatch.delenv(name, raising=False)
+
+        assert client_options() == {}
+
+    def test_reads_pool_timeout_and_compression(self, monkeypatch):
+        """Test that configured variables map to MongoClient keywords"""
+        monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "40")
+        monkeypatch.setenv("MONGO_MIN_POOL_SIZE", "5")
+        monkeypatch.setenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000")
+        monkeypatch.setenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "3000")
+        monkeypatch.setenv("MONGO_SOCKET_TIMEOUT_MS", "10000")
+        monkeypatch.setenv("MONGO_COMPRESSORS", "zstd,snappy")
+
+        options = client_options()
+
+        assert options["maxPoolSize"] == 40
+        assert options["minPoolSize"] == 5
+        assert options["waitQueueTimeoutMS"] == 2000
+        assert options["serverSelectionTimeoutMS"] == 3000
+        assert options["socketTimeoutMS"] == 10000
+        assert options["compressors"] == "zstd,snappy"
+
+
+class TestPoolStatistics:
+    """Test the connection pool event counters"""
+
+    def test_counts_slow_checkouts_as_waits(self):
+        """Test that only checkouts slower than the threshold are waits"""
+        stats = PoolStatistics(wait_threshold_ms=1)
+        primary = ("db-0", 27017)
+
+        stats.connection_check_out_started(
+            SimpleNamespace(address=primary))
+        stats.connection_created(SimpleNamespace(address=primary))
+        stats.connection_checked_out(
+            SimpleNamespace(address=primary, duration=0.004))
+        stats.connection_checked_in(SimpleNamespace(address=primary))
+
+        stats.connection_check_out_started(
+            SimpleNamespace(address=primary))
+        stats.connection_checked_out(
+            SimpleNamespace(address=primary, duration=0.0001))
+
+        snapshot = stats.snapshot()
+        assert snapshot["checkouts"] == 2
+        assert snapshot["waits"] == 1
+        assert snapshot["in_use"] == 1
+        assert snapshot["waiting"] == 0
+        assert snapshot["wait_time_ms_max"] == 4.0
+
+    def test_keeps_counters_per_server(self):
+        """Test that idle connections on one server don't hide waits on
+        another"""
+        stats = PoolStatistics(wait_threshold_ms=1)
+        secondary = SimpleNamespace(address=("db-1", 27017))
+        for _ in range(3):
+            stats.connection_created(secondary)
+
+        stats.connection_check_out_started(
+            SimpleNamespace(address=("db-0", 27017)))
+        stats.connection_checked_out(
+            SimpleNamespace(address=("db-0", 27017), duration=0.05))
+
+        snapshot = stats.snapshot()
+        assert snapshot["waits"] == 1
+        assert snapshot["open_connections"] == 3
+        assert snapshot["servers"]["db-0:27017"]["in_use"] == 1
+        assert snapshot["servers"]["db-1:27017"]["open_connections"] == 3
+
+    def test_counts_failures_and_pool_clears(self):
+        """Test that failed checkouts and pool clears are recorded"""
+        stats = PoolStatistics()
+        event = SimpleNamespace(address=("db-0", 27017))
+
+        stats.connection_check_out_started(event)
+        stats.connection_check_out_failed(event)
+        stats.pool_cleared(event)
+
+        snapshot = stats.snapshot()
+        assert snapshot["checkout_failures"] == 1
+        assert snapshot["waiting"] == 0
+        assert snapshot["pool_cleared"] == 1
+
+    def test_clients_have_separate_listeners(self):
+        """Test that the sync and async clients are counted apart"""
+        assert set(pool_snapshot()) == {"sync", "async"}
+
+
+class TestLazyProxy:
+    """Test suite for lazily created clients"""
+
+    def test_builds_target_on_first_use_only(self):
+        """Test that the factory runs once, on first attribute access"""
+        factory = MagicMock()
+        proxy = LazyProxy(factory)
+
+        assert not proxy.created
+        assert not factory.called
+
+        proxy.rooms.find_one({})
+        proxy.rooms.find_one({})
+
+        factory.assert_called_once_with()
+        assert proxy.created
+        assert factory.return_value.rooms.find_one.call_count == 2
+
+    def test_supports_item_access(self):
+        """Test that db["collection"] style access reaches the target"""
+        proxy = LazyProxy(lambda: {"rooms": "collection"})
+
+        assert proxy["rooms"] == "collection"
@@ -0,0 +1,112 @@
+"""Tests for per-request MongoDB deadlines"""
+from unittest.mock import MagicMock, patch
+
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+from pymongo import _csot
+from pymongo.errors import ExecutionTimeout, OperationFailure
+
+from backend.app.cleanup import cleanup_old_games
+from backend.app.deadlines import (DEFAULT_REQUEST_TIMEOUT_MS, DeadlineRoute,
+                                   request_timeout)
+from backend.backend_tests.mocks import mock_expired_rooms
+
+router = APIRouter(route_class=DeadlineRoute)
+
+
+def dependency_timeout():
+    return _csot.get_timeout()
+
+
+@router.get("/default")
+def default_route(from_dependency: float = Depends(dependency_timeout)):
+    return {"timeout": _csot.get_timeout(), "dependency": from_dependency}
+
+
+@router.get("/custom")
+@request_timeout(1500)
+def custom_route():
+    return {"timeout": _csot.get_timeout()}
+
+
+@router.get("/slow")
+def slow_route():
+    raise ExecutionTimeout("operation exceeded time limit")
+
+
+@router.get("/broken")
+def broken_route():
+    raise OperationFailure("not a timeout")
+
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app, raise_server_exceptions=False)
+
+
+def test_default_deadline_applies_to_endpoint_and_dependencies():
+    """Test that sync endpoints and dependencies share the route budget"""
+    response = client.get("/default")
+
+    expected = DEFAULT_REQUEST_TIMEOUT_MS / 1000
+    assert response.json() == {"timeout": expected, "dependency": expected}
+
+
+def test_route_specific_deadline():
+    """Test that @request_timeout overrides the default budget"""
+    response = client.get("/custom")
+
+    assert response.json() == {"timeout": 1.5}
+
+
+def test_client_header_can_shorten_deadline():
+    """Test that X-Request-Timeout narrows the budget"""
+    response = client.get("/custom", headers={"X-Request-Timeout": "250"})
+
+    assert response.json() == {"timeout": 0.25}
+
+
+def test_client_header_cannot_extend_deadline():
+    """Test that X-Request-Timeout is capped at the route's budget"""
+    response = client.get("/custom", headers={"X-Request-Timeout": "60000"})
+
+    assert response.json() == {"timeout": 1.5}
+
+
+def test_invalid_timeout_header():
+    """Test that a malformed X-Request-Timeout header is rejected"""
+    response = client.get("/custom", headers={"X-Request-Timeout": "soon"})
+
+    assert response.status_code == 400
+
+
+def test_timeout_returns_503():
+    """Test that a database timeout fails fast with 503"""
+    response = client.get("/slow")
+
+    assert response.status_code == 503
+    assert response.json()["detail"] == "Request deadline exceeded"
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_other_database_errors_are_not_masked():
+    """Test that non-timeout database errors still surface as 500"""
+    response = client.get("/broken")
+
+    assert response.status_code == 500
+
+
+@patch('backend.app.cleanup.db')
+def test_cleanup_runs_under_deadline(mock_db):
+    """Test that the cleanup job's delete runs with a driver timeout"""
+    mock_expired_rooms(mock_db, 1)
+    seen = []
+
+    def delete_many(query):  # pylint: disable=unused-argument
+        seen.append(_csot.get_timeout())
+        return MagicMock(deleted_count=1)
+    mock_db.rooms.delete_many.side_effect = delete_many
+
+    assert cleanup_old_games() == 1
+
+    assert seen and seen[0] is not None
@@ -0,0 +1,62 @@
+"""Tests for the production gunicorn settings"""
+from unittest.mock import MagicMock, patch
+
+from backend import gunicorn_conf
+
+
+@patch('backend.app.cpus.cgroup_cpu_limit', return_value=None)
+@patch('backend.app.cpus.os.sched_getaffinity', return_value={0, 1, 2})
+def test_default_workers_follow_available_cpus(_mock_affinity, _mock_limit):
+    """Test that the default worker count is one per usable CPU"""
+    assert gunicorn_conf.default_workers() == 3
+
+
+@patch('backend.app.cpus.cgroup_cpu_limit', return_value=2)
+@patch('backend.app.cpus.os.sched_getaffinity', return_value=set(range(64)))
+def test_default_workers_respect_cpu_limit(_mock_affinity, _mock_limit):
+    """Test that a container CPU limit caps workers below the host's CPUs"""
+    assert gunicorn_conf.default_workers() == 2
+
+
+def test_worker_uses_uvloop_and_httptools():
+    """Test that production workers don't fall back to asyncio and h11"""
+    assert gunicorn_conf.ProductionWorker.CONFIG_KWARGS == {
+        "loop": "uvloop", "http": "httptools"}
+
+
+def test_startup_logs_effective_concurrency():
+    """Test that the master logs workers and per-worker capacity once ready"""
+    server = MagicMock()
+    server.cfg.workers = 7
+
+    gunicorn_conf.when_ready(server)
+
+    first = server.log.info.call_args_list[0].args
+    assert 7 in first
+    assert "threadpool" in server.log.info.call_args_list[1].args[0]
+
+
+def test_workers_share_a_metrics_directory(tmp_path):
+    """Test that workers get a fresh multiprocess metrics directory"""
+    stale = tmp_path / "metrics" / "counter_123.db"
+    stale.parent.mkdir()
+    stale.touch()
+
+    with patch('backend.gunicorn_conf.metrics_dir', str(stale.parent)):
+        gunicorn_conf.on_starting(MagicMock())
+
+    assert stale.parent.is_dir()
+    assert not stale.exists()
+    assert gunicorn_conf.raw_env == [
+        f"PROMETHEUS_MULTIPROC_DIR={gunicorn_conf.metrics_dir}"]
+
+
+@patch.dict('os.environ', {"WEB_CONCURRENCY": "1"})
+def test_workers_are_told_the_worker_count():
+    """Test that each worker sees the master's worker count"""
+    server = MagicMock()
+    server.cfg.workers = 4
+
+    gunicorn_conf.post_fork(server, MagicMock())
+
+    assert gunicorn_conf.os.environ["WEB_CONCURRENCY"] == "4"
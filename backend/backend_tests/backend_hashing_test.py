@@ -0,0 +1,61 @@
+"""Tests for the password hashing process pool"""
+import asyncio
+import os
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+
+from backend.app.hashing import PasswordHasher
+
+
+def test_hash_and_verify_on_process_pool():
+    """Test that hashing round-trips through a worker process"""
+    hasher = PasswordHasher(workers=1, queue_depth=1)
+
+    async def round_trip():
+        hashed = await hasher.hash("plain_password_123")
+        return (await hasher.verify("plain_password_123", hashed),
+                await hasher.verify("wrong_password", hashed))
+
+    try:
+        assert asyncio.run(round_trip()) == (True, False)
+    finally:
+        hasher.shutdown()
+
+    stats = hasher.snapshot()
+    assert stats["completed"] == 3
+    assert stats["in_flight"] == 0
+    assert stats["hash_time_ms_max"] > 0
+
+
+def test_threadpool_mode_records_timings():
+    """Test that HASH_WORKERS=0 hashes inline and still records stats"""
+    hasher = PasswordHasher(workers=0, queue_depth=4)
+
+    hashed = asyncio.run(hasher.hash("secret"))
+
+    assert asyncio.run(hasher.verify("secret", hashed))
+    assert hasher.snapshot()["completed"] == 2
+
+
+def test_rejects_work_when_queue_is_full():
+    """Test that requests beyond the queue depth get a 503"""
+    hasher = PasswordHasher(workers=0, queue_depth=0)
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(hasher.hash("secret"))
+
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers["Retry-After"] == "1"
+    assert hasher.snapshot()["rejected"] == 1
+
+
+@patch.dict(os.environ, {"WEB_CONCURRENCY": "4"})
+@patch('backend.app.cpus.available_cpus', return_value=8)
+def test_default_pool_is_the_workers_cpu_share(_mock_cpus):
+    """Test that each of 4 workers on 8 CPUs gets 2 hashing processes"""
+    hasher = PasswordHasher(workers=None, queue_depth=4)
+
+    assert hasher.workers == 2
+    assert hasher.snapshot()["workers"] == 2
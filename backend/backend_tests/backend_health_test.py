@@ -0,0 +1,88 @@
+"""Tests for liveness, cached readiness and the database status monitor"""
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pymongo.errors import ServerSelectionTimeoutError
+
+from backend.app.api import router
+from backend.app.health import HealthMonitor, scheduler_state
+from backend.app.warmup import Readiness
+from backend.backend_tests.mocks import AsyncDatabaseMock
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
+def test_livez_does_no_io(mock_db):
+    """Test that /livez answers without touching MongoDB"""
+    response = client.get("/livez")
+
+    assert response.json() == {"status": "alive"}
+    assert not mock_db.mock_calls
+
+
+@patch('backend.app.health.async_db', new_callable=AsyncDatabaseMock)
+def test_readyz_serves_cached_database_status(mock_db):
+    """Test that /readyz reports the last refresh and doesn't ping itself"""
+    monitor = HealthMonitor()
+    asyncio.run(monitor.refresh())
+    assert mock_db.command.await_count == 1
+
+    with patch('backend.app.api.health_monitor', monitor), \
+            patch('backend.app.api.readiness', Readiness()) as state:
+        state.ready = True
+        for _ in range(3):
+            database = client.get("/readyz").json()["database"]
+
+    assert mock_db.command.await_count == 1
+    assert database["status"] == "ok"
+    assert database["ping_ms"] >= 0
+    assert "checkouts" in database["pool"]["async"]
+    assert database["scheduler"]["running"] is False
+
+
+def test_stats_endpoints_report_this_process():
+    """Test that each /health stats endpoint answers with its counters"""
+    expected = {
+        "/health/pool": "async",
+        "/health/hashing": "queue_depth",
+        "/health/threadpool": "total_tokens",
+        "/health/loop": "lag_ms_max",
+        "/health/admission": "max_in_flight",
+    }
+    for path, key in expected.items():
+        response = client.get(path)
+
+        assert response.status_code == 200, path
+        assert key in response.json(), path
+    assert "checkouts" in client.get("/health/pool").json()["sync"]
+
+
+@patch('backend.app.health.async_db', new_callable=AsyncDatabaseMock)
+def test_refresh_records_ping_failures(mock_db):
+    """Test that a failed ping is reported as a database error"""
+    mock_db.command.side_effect = ServerSelectionTimeoutError("down")
+    monitor = HealthMonitor()
+
+    asyncio.run(monitor.refresh())
+
+    assert monitor.snapshot()["status"] == "error"
+    assert monitor.snapshot()["error"] == "down"
+
+
+def test_scheduler_state_lists_next_runs():
+    """Test that the scheduler's state includes its jobs' next runs"""
+    next_run = datetime(2025, 1, 1, 12, tzinfo=timezone.utc)
+    scheduler = MagicMock(created=True, running=True)
+    scheduler.get_jobs.return_value = [
+        MagicMock(id="cleanup_old_games", next_run_time=next_run)]
+
+    state = scheduler_state(scheduler)
+
+    assert state["running"] is True
+    assert state["jobs"] == {"cleanup_old_games": next_run.isoformat()}
@@ -0,0 +1,26 @@
+"""Tests for the cost of importing the backend"""
+import pytest
+
+from backend.importtime import IMPORT_TIME_BUDGET_MS, measure, report, total_ms
+
+
+@pytest.fixture(scope="module", name="records")
+def fixture_records():
+    """Import the app once in a fresh interpreter and time each module"""
+    return measure("backend.main")
+
+
+# Wall-clock, so slow CI runners can raise IMPORT_TIME_BUDGET_MS or
+# deselect it with -m "not import_budget"
+@pytest.mark.import_budget
+def test_backend_imports_within_budget(records):
+    """Test that importing the app stays within the import-time budget"""
+    assert total_ms(records, "backend.main") < IMPORT_TIME_BUDGET_MS, \
+        report(records, "backend.main")
+
+
+def test_deferred_modules_are_not_imported_at_startup(records):
+    """Test that modules only needed later aren't imported with the app"""
+    imported = {record.module for record in records}
+    for module in ("apscheduler", "uvicorn", "jose.jws"):
+        assert module not in imported, report(records, "backend.main")
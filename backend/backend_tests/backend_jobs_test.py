@@ -0,0 +1,148 @@
+"""Tests for scheduled job run history, metrics and alerts"""
+import os
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from apscheduler.events import (EVENT_JOB_ERROR, EVENT_JOB_EXECUTED,
+                                EVENT_JOB_MAX_INSTANCES, EVENT_JOB_SUBMITTED,
+                                JobExecutionEvent, JobSubmissionEvent)
+from apscheduler.schedulers.background import BackgroundScheduler
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from backend.app.api import router
+from backend.app.jobs import JobHistory, job_alerts
+from backend.app.security import get_current_admin_user
+from backend.backend_tests.mocks import AsyncDatabaseMock
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+JOB_ID = "cleanup_old_games"
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.fixture(name="mock_db")
+def fixture_mock_db():
+    """The sync database runs are saved to"""
+    with patch('backend.app.jobs.db') as mock_db:
+        yield mock_db
+
+
+@pytest.fixture(name="history")
+def fixture_history(mock_db):  # pylint: disable=unused-argument
+    """A JobHistory for a job that runs every 2 hours"""
+    history = JobHistory()
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(print, "interval", hours=2, id=JOB_ID)
+    history.listen(scheduler)
+    return history
+
+
+def run_job(history, scheduled_at, retval=None, exception=None):
+    """Dispatch the scheduler's events for one run of the job."""
+    # pylint: disable=protected-access
+    history._scheduler._dispatch_event(
+        JobSubmissionEvent(EVENT_JOB_SUBMITTED, JOB_ID, "default",
+                           [scheduled_at]))
+    history._scheduler._dispatch_event(
+        JobExecutionEvent(EVENT_JOB_ERROR if exception else EVENT_JOB_EXECUTED,
+                          JOB_ID, "default", scheduled_at, retval=retval,
+                          exception=exception))
+
+
+def _saved_runs(mock_db):
+    return [call.args[0]
+            for call in mock_db.job_runs.insert_one.call_args_list]
+
+
+def test_runs_are_recorded_with_lag_and_rows(history, mock_db):
+    """Test that a run's lag, duration and rows are saved and measured"""
+    rows = _sample("scheduler_job_rows_total", job_id=JOB_ID)
+    scheduled_at = datetime.now(timezone.utc) - timedelta(seconds=5)
+
+    run_job(history, scheduled_at, retval=12)
+
+    (run,) = _saved_runs(mock_db)
+    assert run["result"] == "success"
+    assert run["rows"] == 12
+    assert run["lag_seconds"] >= 5
+    assert run["duration_seconds"] >= 0
+    assert run["interval_seconds"] == 7200
+    assert run["overrun"] is False
+    assert run["process"].endswith(f":{os.getpid()}")
+    assert _sample("scheduler_job_rows_total", job_id=JOB_ID) == rows + 12
+
+
+def test_follower_skips_are_only_counted(history, mock_db):
+    """Test that runs skipped by leader_only aren't saved"""
+    skipped = _sample("scheduler_job_runs_total", job_id=JOB_ID,
+                      result="skipped")
+
+    run_job(history, datetime.now(timezone.utc))
+
+    assert not _saved_runs(mock_db)
+    assert _sample("scheduler_job_runs_total", job_id=JOB_ID,
+                   result="skipped") == skipped + 1
+
+
+@patch('backend.app.jobs.logger')
+def test_repeated_failures_alert(mock_logger, history, mock_db):
+    """Test that failures in a row are counted, logged and alerted on"""
+    for _ in range(3):
+        run_job(history, datetime.now(timezone.utc),
+                exception=RuntimeError("Database connection error"))
+
+    assert _sample("scheduler_job_consecutive_failures", job_id=JOB_ID) == 3
+    mock_logger.error.assert_called_once()
+    runs = list(reversed(_saved_runs(mock_db)))
+    assert job_alerts(runs) == [
+        "last 3 runs failed: Database connection error"]
+
+    run_job(history, datetime.now(timezone.utc), retval=0)
+    assert _sample("scheduler_job_consecutive_failures", job_id=JOB_ID) == 0
+
+
+def test_overruns_are_detected(history, mock_db):
+    """Test that long runs and runs skipped behind them are overruns"""
+    overruns = _sample("scheduler_job_overruns_total", job_id=JOB_ID)
+    now = datetime.now(timezone.utc)
+
+    long_run = history.record(JOB_ID, now - timedelta(hours=3),
+                              now - timedelta(hours=3), now, retval=5)
+    history._scheduler._dispatch_event(  # pylint: disable=protected-access
+        JobSubmissionEvent(EVENT_JOB_MAX_INSTANCES, JOB_ID, "default",
+                           [now]))
+
+    assert long_run["overrun"] is True
+    assert job_alerts([long_run]) == [
+        "last run took 10800 s, longer than its 7200 s interval"]
+    assert _saved_runs(mock_db)[-1]["result"] == "overrun"
+    assert _sample("scheduler_job_overruns_total",
+                   job_id=JOB_ID) == overruns + 2
+
+
+@patch('backend.app.jobs.async_db', new_callable=AsyncDatabaseMock)
+def test_admin_endpoint_lists_recent_runs(mock_db):
+    """Test that /admin/jobs lists each job's runs with its alerts"""
+    mock_db.job_runs.distinct.return_value = [JOB_ID]
+    mock_db.job_runs.find.return_value.sort.return_value.to_list\
+        .return_value = [{"job_id": JOB_ID, "result": "success",
+                          "overrun": False, "rows": 4}]
+    app.dependency_overrides[get_current_admin_user] = lambda: {
+        "role": "admin"}
+    try:
+        jobs = client.get("/admin/jobs").json()
+    finally:
+        app.dependency_overrides.clear()
+
+    assert jobs[JOB_ID]["alerts"] == []
+    assert jobs[JOB_ID]["runs"][0]["rows"] == 4
+    mock_db.job_runs.find.return_value.sort.assert_called_with(
+        "started_at", -1)
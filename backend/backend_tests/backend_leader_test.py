@@ -0,0 +1,105 @@
+"""Tests for the maintenance leader lease"""
+import os
+from unittest.mock import MagicMock, patch
+
+from pymongo.errors import DuplicateKeyError, NetworkTimeout
+
+from backend.app.leader import LeaderLease
+
+
+def make_lease():
+    return LeaderLease("maintenance", lease_seconds=15, renew_seconds=5)
+
+
+@patch('backend.app.leader.db')
+def test_acquires_free_lease(mock_db):
+    """Test that a process becomes leader when the lease is free"""
+    lease = make_lease()
+    mock_db.leases.find_one_and_update.return_value = {
+        "_id": "maintenance", "holder": lease.holder}
+
+    assert lease.try_acquire()
+    assert lease.is_leader
+
+    query = mock_db.leases.find_one_and_update.call_args[0][0]
+    assert query["_id"] == "maintenance"
+    assert {"holder": lease.holder} in query["$or"]
+    assert mock_db.leases.find_one_and_update.call_args[1]["upsert"]
+
+
+@patch('backend.app.leader.db')
+def test_lease_held_elsewhere(mock_db):
+    """Test that an unexpired lease held by another process isn't taken"""
+    lease = make_lease()
+    mock_db.leases.find_one_and_update.side_effect = DuplicateKeyError("dup")
+
+    assert not lease.try_acquire()
+    assert not lease.is_leader
+
+
+@patch('backend.app.leader.db')
+def test_database_error_keeps_current_lease(mock_db):
+    """Test that a failed renewal keeps leading until the lease runs out"""
+    lease = make_lease()
+    mock_db.leases.find_one_and_update.return_value = {
+        "holder": lease.holder}
+    lease.try_acquire()
+
+    mock_db.leases.find_one_and_update.side_effect = NetworkTimeout("slow")
+    assert lease.try_acquire()
+
+    with patch('backend.app.leader.time.monotonic',
+               return_value=lease._valid_until + 1):  # pylint: disable=protected-access
+        assert not lease.is_leader
+
+
+@patch('backend.app.leader.db')
+def test_leader_only_skips_followers(mock_db):
+    """Test that wrapped jobs only run while holding the lease"""
+    lease = make_lease()
+    job = MagicMock(return_value=3, __name__="cleanup_old_games")
+    wrapped = lease.leader_only(job)
+
+    assert wrapped() is None
+    assert not job.called
+    assert wrapped.__name__ == "cleanup_old_games"
+
+    mock_db.leases.find_one_and_update.return_value = {
+        "holder": lease.holder}
+    lease.try_acquire()
+    assert wrapped() == 3
+
+
+@patch('backend.app.leader.db')
+def test_stop_releases_lease(mock_db):
+    """Test that stopping hands the lease back for a quick takeover"""
+    lease = make_lease()
+    mock_db.leases.find_one_and_update.return_value = {
+        "holder": lease.holder}
+
+    lease.start()
+    lease.stop()
+
+    mock_db.leases.create_index.assert_called_once_with(
+        "expires_at", expireAfterSeconds=0)
+    mock_db.leases.delete_one.assert_called_once_with(
+        {"_id": "maintenance", "holder": lease.holder})
+    assert not lease.is_leader
+
+
+def test_forked_workers_get_their_own_holder():
+    """Test that a worker forked after import doesn't share the holder"""
+    lease = make_lease()
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(write_end, lease.holder.encode())
+        os._exit(0)  # pylint: disable=protected-access
+    os.close(write_end)
+    child_holder = os.read(read_end, 256).decode()
+    os.close(read_end)
+    os.waitpid(pid, 0)
+
+    assert child_holder
+    assert child_holder != lease.holder
+    assert f":{pid}:" in child_holder
@@ -0,0 +1,88 @@
+"""Tests for structured, queue-backed logging"""
+import io
+import json
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app.logs import (REQUEST_ID_HEADER, ContextFilter,
+                              QueueLogging, RequestIdMiddleware, request_id)
+
+logger = logging.getLogger("backend.tests.logs")
+
+app = FastAPI()
+app.add_middleware(RequestIdMiddleware)
+
+
+@app.get("/echo")
+async def echo():
+    return {"request_id": request_id.get()}
+
+
+client = TestClient(app)
+
+
+def test_request_id_is_generated_and_echoed():
+    """Test that each request gets an ID, returned in a header"""
+    response = client.get("/echo")
+
+    assert response.headers[REQUEST_ID_HEADER] == response.json()["request_id"]
+    assert len(response.json()["request_id"]) == 32
+    assert client.get("/echo").json() != response.json()
+
+
+def test_supplied_request_id_is_kept_only_if_plain():
+    """Test that a client's request ID is reused unless it looks unsafe"""
+    response = client.get("/echo", headers={REQUEST_ID_HEADER: "abc-123"})
+    assert response.headers[REQUEST_ID_HEADER] == "abc-123"
+
+    response = client.get("/echo", headers={REQUEST_ID_HEADER: "a b\"{}"})
+    assert response.headers[REQUEST_ID_HEADER] != "a b\"{}"
+
+
+def test_records_are_written_as_json_with_request_id():
+    """Test that records reach the stream as JSON lines with context"""
+    stream = io.StringIO()
+    queue_logging = QueueLogging()
+    queue_logging.start(stream=stream, log_format="json", level="INFO")
+    token = request_id.set("req-1")
+    try:
+        logger.info("Room %s created", "ABC123", extra={"teams": 2})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("Could not save")
+    finally:
+        request_id.reset(token)
+        queue_logging.stop()
+
+    first, second = [json.loads(line)
+                     for line in stream.getvalue().splitlines()]
+    assert first["message"] == "Room ABC123 created"
+    assert first["level"] == "INFO"
+    assert first["request_id"] == "req-1"
+    assert first["teams"] == 2
+    assert second["message"] == "Could not save"
+    assert "ValueError: boom" in second["exception"]
+    assert queue_logging.handler not in logging.getLogger().handlers
+
+
+def test_debug_records_are_sampled_per_request():
+    """Test that a request keeps all or none of its debug records"""
+    context_filter = ContextFilter(sample_rate=0.5)
+
+    def kept(current_id, level=logging.DEBUG):
+        token = request_id.set(current_id)
+        try:
+            return context_filter.filter(logging.makeLogRecord(
+                {"levelno": level}))
+        finally:
+            request_id.reset(token)
+
+    decisions = {current_id: kept(current_id)
+                 for current_id in (f"req-{n}" for n in range(200))}
+    assert 40 < sum(decisions.values()) < 160
+    assert all(kept(current_id) == decision
+               for current_id, decision in decisions.items())
+    assert all(kept(current_id, logging.INFO) for current_id in decisions)
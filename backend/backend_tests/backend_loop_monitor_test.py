@@ -0,0 +1,84 @@
+"""Tests for event loop lag monitoring and blocking call detection"""
+import asyncio
+import logging
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app.api import router
+from backend.app.loop_monitor import LoopMonitor
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+
+def blocking_handler():
+    """Stands in for a route that calls something blocking"""
+    time.sleep(0.3)
+
+
+def test_lag_is_recorded_and_warned_about(caplog):
+    """Test that late wake-ups are recorded and large ones logged"""
+    monitor = LoopMonitor(warn_ms=100)
+
+    with caplog.at_level(logging.WARNING, logger="backend.app.loop_monitor"):
+        monitor.record(0.002)
+        monitor.record(0.250)
+
+    assert monitor.lag_ms_last == 250
+    assert monitor.lag_ms_max == 250
+    assert [record.getMessage() for record in caplog.records] == [
+        "Event loop lagged 250 ms"]
+
+
+def test_blocking_call_is_reported_with_its_stack(caplog):
+    """Test that the detector logs the stack of a call blocking the loop"""
+    monitor = LoopMonitor(interval_ms=10, detect_blocking=True,
+                          blocking_ms=50)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        blocking_handler()
+        await asyncio.sleep(0.05)
+        monitor.stop()
+
+    with caplog.at_level(logging.WARNING, logger="backend.app.loop_monitor"):
+        asyncio.run(run())
+
+    assert monitor.blocked == 1
+    assert monitor.lag_ms_max >= 200
+    blocked = [record.getMessage() for record in caplog.records
+               if "blocked" in record.getMessage()]
+    assert len(blocked) == 1
+    assert "blocking_handler" in blocked[0]
+    assert "time.sleep(0.3)" in blocked[0]
+
+
+def test_default_detector_catches_calls_between_wake_ups():
+    """Test that a stall shorter than the default interval is reported"""
+    # LOOP_MONITOR_INTERVAL_MS defaults to 500 ms, longer than the stall
+    monitor = LoopMonitor(detect_blocking=True)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        blocking_handler()
+        await asyncio.sleep(0.1)
+        monitor.stop()
+
+    asyncio.run(run())
+
+    assert monitor.interval <= monitor.blocking / 4
+    assert monitor.blocked == 1
+    assert monitor.lag_ms_max >= 200
+
+
+def test_loop_stats_endpoint():
+    """Test that /health/loop reports the worker's lag figures"""
+    response = client.get("/health/loop")
+
+    assert response.status_code == 200
+    assert {"lag_ms_last", "lag_ms_max", "blocked"} <= response.json().keys()
@@ -0,0 +1,143 @@
+"""Tests for Prometheus metrics"""
+import asyncio
+from unittest.mock import MagicMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from pymongo import UpdateOne
+from pymongo.errors import AutoReconnect
+
+from backend.app.api import router
+from backend.app.bandwidth import RoomBandwidth
+from backend.app.cleanup import cleanup_old_games
+from backend.app.metrics import MetricsMiddleware
+from backend.backend_tests.mocks import AsyncDatabaseMock, mock_expired_rooms
+
+app = FastAPI()
+bandwidth = RoomBandwidth()
+app.add_middleware(MetricsMiddleware, bandwidth=bandwidth)
+
+
+@app.get("/rooms/{room_code}/teams/{team_name}/board")
+async def board(room_code: str, team_name: str):
+    return {"room_code": room_code, "team_name": team_name}
+
+
+@app.put("/rooms/{room_code}/teams/{team_name}/board")
+async def update_board(room_code: str, team_name: str, data: dict):
+    return {"room_code": room_code, "team_name": team_name, **data}
+
+
+app.include_router(router)
+client = TestClient(app)
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_requests_are_labelled_by_route_template():
+    """Test that request metrics use the route template, not the raw path"""
+    labels = {"method": "GET",
+              "route": "/rooms/{room_code}/teams/{team_name}/board",
+              "status": "200"}
+    before = _sample("http_requests_total", **labels)
+
+    client.get("/rooms/ABC123/teams/Red/board")
+    client.get("/rooms/XYZ789/teams/Blue/board")
+
+    assert _sample("http_requests_total", **labels) == before + 2
+    assert _sample("http_request_duration_seconds_count", **labels) >= 2
+    assert _sample("http_requests_in_progress", method="GET",
+                   route=labels["route"]) == 0
+    assert "ABC123" not in client.get("/metrics").text
+
+
+def test_unknown_paths_share_one_label():
+    """Test that 404s don't create a label per path"""
+    before = _sample("http_requests_total", method="GET",
+                     route="unmatched", status="404")
+
+    client.get("/no/such/path")
+
+    assert _sample("http_requests_total", method="GET", route="unmatched",
+                   status="404") == before + 1
+
+
+def test_body_sizes_are_measured_by_route():
+    """Test that request and response bodies are measured per route"""
+    labels = {"method": "PUT",
+              "route": "/rooms/{room_code}/teams/{team_name}/board"}
+    request_sum = _sample("http_request_size_bytes_sum", **labels)
+    response_sum = _sample("http_response_size_bytes_sum", **labels)
+
+    response = client.put("/rooms/SIZE01/teams/Red/board",
+                          content=b'{"cells": [1, 2, 3]}')
+
+    assert _sample("http_request_size_bytes_sum", **labels) == \
+        request_sum + 20
+    assert _sample("http_response_size_bytes_sum", **labels) == \
+        response_sum + len(response.content)
+    assert "SIZE01" not in client.get("/metrics").text
+
+
+@patch('backend.app.bandwidth.async_db', new_callable=AsyncDatabaseMock)
+def test_room_bytes_are_flushed_without_naming_rooms(mock_db):
+    """Test that bytes per room go to MongoDB and only a histogram"""
+    asyncio.run(bandwidth.flush())
+    flushes = _sample("room_bandwidth_bytes_count")
+
+    first = client.get("/rooms/size02/teams/Red/board")
+    second = client.get("/rooms/SIZE02/teams/Blue/board")
+    client.put("/rooms/NOSUCH/teams/Red/board", content=b"not json")
+    asyncio.run(bandwidth.flush())
+
+    (operations,), _ = mock_db.room_bandwidth.bulk_write.await_args
+    assert operations == [UpdateOne(
+        {"_id": "SIZE02"},
+        {"$inc": {"bytes": len(first.content) + len(second.content)},
+         "$currentDate": {"updated_at": True}}, upsert=True)]
+    assert _sample("room_bandwidth_bytes_count") == flushes + 1
+    assert "SIZE02" not in client.get("/metrics").text
+
+
+@patch('backend.app.bandwidth.async_db', new_callable=AsyncDatabaseMock)
+def test_room_bytes_are_kept_when_a_flush_fails(mock_db):
+    """Test that a failed flush keeps its counts for the next one"""
+    mock_db.room_bandwidth.bulk_write.side_effect = [
+        AutoReconnect("down"), None]
+    bandwidth.add("SIZE03", 100)
+
+    asyncio.run(bandwidth.flush())
+    asyncio.run(bandwidth.flush())
+
+    (operations,), _ = mock_db.room_bandwidth.bulk_write.await_args
+    assert operations[0] == UpdateOne(
+        {"_id": "SIZE03"}, {"$inc": {"bytes": 100},
+                            "$currentDate": {"updated_at": True}},
+        upsert=True)
+
+
+def test_metrics_endpoint_serves_text_format():
+    """Test that /metrics returns the Prometheus exposition format"""
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE http_requests_total counter" in response.text
+
+
+@patch('backend.app.cleanup.db')
+def test_cleanup_runs_are_recorded(mock_db):
+    """Test that cleanup records its result and deletions per policy"""
+    mock_expired_rooms(mock_db, 3)
+    mock_db.rooms.delete_many.return_value = MagicMock(deleted_count=3)
+    runs = _sample("cleanup_runs_total", result="success")
+    deleted = _sample("cleanup_deleted_rooms_total", policy="started_games")
+
+    cleanup_old_games()
+
+    assert _sample("cleanup_runs_total", result="success") == runs + 1
+    assert _sample("cleanup_deleted_rooms_total",
+                   policy="started_games") == deleted + 3
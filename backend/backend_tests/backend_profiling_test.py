@@ -0,0 +1,100 @@
+"""Tests for on-demand request profiling"""
+import asyncio
+import marshal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from backend.app import security
+from backend.app.api import router
+from backend.app.profiling import (PROFILE_HEADER, PROFILE_ID_HEADER,
+                                   ProfilingMiddleware)
+from backend.app.security import get_current_admin_user
+
+
+def busy_work():
+    return sum(i * i for i in range(1000))
+
+
+store = MagicMock(save=AsyncMock())
+app = FastAPI()
+app.add_middleware(ProfilingMiddleware, store=store)
+
+
+@app.get("/slow")
+async def slow():
+    return {"total": busy_work()}
+
+
+app.include_router(router)
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True, name="token_for")
+def fixture_token_for():
+    """Sign tokens with a test key and return a helper that makes them"""
+    store.save.reset_mock()
+    with patch.object(security, "SECRET_KEY", "test_secret_key"), \
+            patch.object(security, "ALGORITHM", "HS256"):
+        yield lambda role: security.create_access_token(
+            {"sub": f"{role}@example.com", "role": role})
+
+
+def test_admin_can_profile_a_request(token_for):
+    """Test that an admin's opted-in request is profiled and stored"""
+    response = client.get("/slow", headers={
+        PROFILE_HEADER: "1", "Authorization": f"Bearer {token_for('admin')}"})
+
+    assert response.status_code == 200
+    profile_id = response.headers[PROFILE_ID_HEADER]
+    store.save.assert_awaited_once()
+    args, details = store.save.await_args
+    assert args[0] == profile_id
+    assert details["route"] == "/slow"
+    assert details["user"] == "admin@example.com"
+    stats = args[1]
+    stats.create_stats()
+    assert any(func[2] == "busy_work" for func in stats.stats)
+
+
+def test_only_admins_that_ask_are_profiled(token_for):
+    """Test that other requests run without a profiler"""
+    client.get("/slow", headers={
+        PROFILE_HEADER: "1", "Authorization": f"Bearer {token_for('user')}"})
+    client.get("/slow", headers={
+        "Authorization": f"Bearer {token_for('admin')}"})
+    response = client.get("/slow", headers={PROFILE_HEADER: "1"})
+
+    assert PROFILE_ID_HEADER not in response.headers
+    store.save.assert_not_awaited()
+
+
+def test_stored_profile_can_be_downloaded():
+    """Test that admins can read a profile as text or download it"""
+    profile = {"report": "10 function calls", "pstats": b"\xfb0"}
+    app.dependency_overrides[get_current_admin_user] = lambda: {
+        "role": "admin"}
+    try:
+        with patch('backend.app.api.profile_store.load',
+                   new=AsyncMock(return_value=profile)):
+            text = client.get("/admin/profiles/abc")
+            download = client.get("/admin/profiles/abc?download=true")
+        with patch('backend.app.api.profile_store.load',
+                   new=AsyncMock(return_value=None)):
+            missing = client.get("/admin/profiles/abc")
+    finally:
+        app.dependency_overrides = {}
+
+    assert text.text == "10 function calls"
+    assert marshal.loads(download.content) == {}
+    assert "profile-abc.prof" in download.headers["content-disposition"]
+    assert missing.status_code == 404
+
+
+def test_admin_dependency_rejects_other_roles():
+    """Test that non-admin users can't use admin endpoints"""
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(get_current_admin_user({"role": "user"}))
+    assert exc_info.value.status_code == 403
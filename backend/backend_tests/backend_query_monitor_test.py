@@ -0,0 +1,95 @@
+"""Tests for MongoDB command monitoring"""
+import logging
+from itertools import count
+from unittest.mock import MagicMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from backend.app.query_monitor import (QUERY_HEADER, QueryMonitor,
+                                       QueryStatsMiddleware, filter_shape,
+                                       query_monitor)
+
+request_ids = count(1)
+
+
+def run_command(listener, command_name, command, duration_micros=500):
+    """Feed a listener the events PyMongo sends for one command."""
+    request_id = next(request_ids)
+    listener.started(MagicMock(command=command, command_name=command_name,
+                               database_name="walkamile",
+                               request_id=request_id,
+                               connection_id=("db", 27017)))
+    listener.succeeded(MagicMock(command_name=command_name,
+                                 request_id=request_id,
+                                 connection_id=("db", 27017),
+                                 duration_micros=duration_micros))
+
+
+app = FastAPI()
+app.add_middleware(QueryStatsMiddleware, header=True)
+
+
+@app.post("/login")
+async def login():
+    run_command(query_monitor, "find", {"find": "users", "filter": {}})
+    run_command(query_monitor, "find", {"find": "codes", "filter": {}})
+    run_command(query_monitor, "find", {"find": "codes", "filter": {}},
+                duration_micros=1500)
+    return {}
+
+
+client = TestClient(app)
+
+
+def test_response_reports_request_queries():
+    """Test that each response lists the commands its request made"""
+    response = client.post("/login")
+
+    assert response.headers[QUERY_HEADER] == \
+        "count=3; time_ms=2.5; users.find=1, codes.find=2"
+
+
+def test_commands_outside_requests_are_only_timed():
+    """Test that background commands are timed but not attributed"""
+    labels = {"collection": "rooms", "command": "delete",
+              "outcome": "success"}
+    before = REGISTRY.get_sample_value(
+        "mongodb_command_duration_seconds_count", labels) or 0
+
+    run_command(QueryMonitor(), "delete", {"delete": "rooms", "deletes": []})
+
+    assert REGISTRY.get_sample_value(
+        "mongodb_command_duration_seconds_count", labels) == before + 1
+
+
+def test_filter_shape_hides_values():
+    """Test that filter shapes keep fields and operators but not values"""
+    assert filter_shape("find", {"find": "users", "filter": {
+        "email": "a@b.fi", "age": {"$gt": 3}}}) == \
+        {"email": "?", "age": {"$gt": "?"}}
+    assert filter_shape("update", {"updates": [{
+        "q": {"room_code": "ABC123", "_id": {"$in": [1, 2]}}}]}) == \
+        {"room_code": "?", "_id": {"$in": "?"}}
+    assert filter_shape("aggregate", {"pipeline": [
+        {"$match": {"a": 1}}, {"$group": {}}]}) == ["$match", "$group"]
+    assert filter_shape("ping", {"ping": 1}) is None
+
+
+@patch('backend.app.query_monitor.SLOW_QUERY_MS', 10)
+def test_slow_commands_are_logged_with_filter_shape(caplog):
+    """Test that slow commands are logged with their filter shape only"""
+    with caplog.at_level(logging.WARNING, logger="backend.app.query_monitor"):
+        run_command(QueryMonitor(), "find",
+                    {"find": "rooms", "filter": {"room_code": "ABC123"}},
+                    duration_micros=5_000)
+        run_command(QueryMonitor(), "find",
+                    {"find": "rooms", "filter": {"room_code": "ABC123"}},
+                    duration_micros=25_000)
+
+    assert len(caplog.records) == 1
+    message = caplog.records[0].getMessage()
+    assert "Slow MongoDB find on rooms: 25.0 ms" in message
+    assert "{'room_code': '?'}" in message
+    assert "ABC123" not in message
@@ -8,6 +8,7 @@ from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
 from backend.app.security import get_current_active_user
+from backend.backend_tests.mocks import AsyncDatabaseMock
 
 
 os.environ['TESTING'] = 'true'
@@ -16,7 +17,7 @@ os.environ['TESTING'] = 'true'
 app = FastAPI()
 
 # Mock the database before importing router
-with patch("backend.app.api.db") as mock_db:
+with patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock) as mock_db:
     from backend.app.api import router
     app.include_router(router)
 
@@ -39,7 +40,7 @@ def override_auth():
 # Room Creation Tests
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_create_room_success(mock_db_instance):
     """Test successfully creating a new room"""
     mock_db_instance.rooms.find_one.return_value = None
@@ -61,9 +62,11 @@ def test_create_room_success(mock_db_instance):
     }
     mock_db_instance.rooms.find_one.assert_called_once_with(
         {"room_code": "ABC123"})
+    room_doc = mock_db_instance.rooms.insert_one.call_args[0][0]
+    assert "last_activity_at" in room_doc
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_create_room_duplicate_code(mock_db_instance):
     """Test creating a room with an existing room code"""
     mock_db_instance.rooms.find_one.return_value = {"room_code": "ABC123"}
@@ -81,7 +84,7 @@ def test_create_room_duplicate_code(mock_db_instance):
     assert response.json()["detail"] == "Room with this code already exists"
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_create_room_case_insensitive(mock_db_instance):
     """Test that room codes are case-insensitive"""
     mock_db_instance.rooms.find_one.return_value = None
@@ -104,7 +107,7 @@ def test_create_room_case_insensitive(mock_db_instance):
 
 # Room Retrieval Tests
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_get_room_success(mock_db_instance):
     """Test successfully retrieving a room"""
     mock_room = {
@@ -123,7 +126,7 @@ def test_get_room_success(mock_db_instance):
     assert response.json() == mock_room
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_get_room_not_found(mock_db_instance):
     """Test retrieving a non-existent room"""
     mock_db_instance.rooms.find_one.return_value = None
@@ -136,7 +139,7 @@ def test_get_room_not_found(mock_db_instance):
 
 # Team Management Tests
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_add_team_success(mock_db_instance):
     """Test successfully adding a team to a room"""
     mock_db_instance.rooms.find_one.return_value = {
@@ -162,7 +165,7 @@ def test_add_team_success(mock_db_instance):
     assert response.json()["message"] == "Team added successfully"
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_add_team_duplicate_name(mock_db_instance):
     """Test adding a team with a duplicate name"""
     mock_db_instance.rooms.find_one.return_value = {
@@ -187,7 +190,7 @@ def test_add_team_duplicate_name(mock_db_instance):
     assert response.json()["detail"] == "Team name already exists"
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_add_team_room_not_found(mock_db_instance):
     """Test adding a team to a non-existent room"""
     mock_db_instance.rooms.find_one.return_value = None
@@ -209,7 +212,7 @@ def test_add_team_room_not_found(mock_db_instance):
     assert response.json()["detail"] == "Room not found"
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_delete_team_success(mock_db_instance):
     """Test successfully deleting a team"""
     mock_db_instance.rooms.update_one.return_value = MagicMock(
@@ -221,7 +224,7 @@ def test_delete_team_success(mock_db_instance):
     assert response.json()["message"] == "Team deleted successfully"
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_delete_team_not_found(mock_db_instance):
     """Test deleting a non-existent team"""
     mock_db_instance.rooms.update_one.return_value = MagicMock(
@@ -233,7 +236,7 @@ def test_delete_team_not_found(mock_db_instance):
     assert response.json()["detail"] == "Team not found"
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_update_team_circumstance_success(mock_db_instance):
     """Test successfully updating a team's circumstance"""
     mock_db_instance.rooms.update_one.return_value = MagicMock(matched_count=1)
@@ -246,7 +249,7 @@ def test_update_team_circumstance_success(mock_db_instance):
     assert response.json()["message"] == "Circumstance updated successfully"
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_update_team_circumstance_not_found(mock_db_instance):
     """Test updating circumstance for non-existent room/team"""
     mock_db_instance.rooms.update_one.return_value = MagicMock(matched_count=0)
@@ -261,7 +264,7 @@ def test_update_team_circumstance_not_found(mock_db_instance):
 
 # Game Control Tests
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_start_game_success(mock_db_instance):
     """Test successfully starting a game"""
     mock_db_instance.rooms.update_one.return_value = MagicMock(matched_count=1)
@@ -276,9 +279,10 @@ def test_start_game_success(mock_db_instance):
     assert call_args[0][0] == {"room_code": "ABC123"}
     assert call_args[0][1]["$set"]["game_started"] is True
     assert "game_started_at" in call_args[0][1]["$set"]
+    assert call_args[0][1]["$currentDate"] == {"last_activity_at": True}
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_start_game_room_not_found(mock_db_instance):
     """Test starting a non-existent game"""
     mock_db_instance.rooms.update_one.return_value = MagicMock(matched_count=0)
@@ -289,7 +293,7 @@ def test_start_game_room_not_found(mock_db_instance):
     assert response.json()["detail"] == "Room not found"
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_pause_game_success(mock_db_instance):
     """Test successfully pausing a game"""
     mock_db_instance.rooms.update_one.return_value = MagicMock(matched_count=1)
@@ -300,7 +304,7 @@ def test_pause_game_success(mock_db_instance):
     assert response.json()["message"] == "Game paused successfully"
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_resume_game_success(mock_db_instance):
     """Test successfully resuming a game"""
     mock_room = {
@@ -318,7 +322,7 @@ def test_resume_game_success(mock_db_instance):
     assert response.json()["message"] == "Game resumed successfully"
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_resume_game_accumulates_pause_time(mock_db_instance):
     """Test that resume correctly calculates accumulated pause time"""
     # Create a mock room that was paused 10 seconds ago
@@ -343,7 +347,7 @@ def test_resume_game_accumulates_pause_time(mock_db_instance):
     assert call_args[0][1]["$set"]["accumulated_pause_time"] >= 5
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_end_game_success(mock_db_instance):
     """Test successfully ending a game"""
     mock_db_instance.rooms.update_one.return_value = MagicMock(matched_count=1)
@@ -356,7 +360,7 @@ def test_end_game_success(mock_db_instance):
 
 # Time Management Tests
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_update_time_without_reset(mock_db_instance):
     """Test updating time without resetting timer"""
     mock_db_instance.rooms.update_one.return_value = MagicMock(matched_count=1)
@@ -376,7 +380,7 @@ def test_update_time_without_reset(mock_db_instance):
     assert "game_started_at" not in update_fields
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_update_time_with_reset(mock_db_instance):
     """Test updating time with timer reset"""
     mock_db_instance.rooms.update_one.return_value = MagicMock(matched_count=1)
@@ -398,7 +402,7 @@ def test_update_time_with_reset(mock_db_instance):
     assert not update_fields["game_paused"]
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_update_time_room_not_found(mock_db_instance):
     """Test updating time for non-existent room"""
     mock_db_instance.rooms.update_one.return_value = MagicMock(matched_count=0)
@@ -414,7 +418,7 @@ def test_update_time_room_not_found(mock_db_instance):
 
 # Team Board Tests
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_get_team_board_success(mock_db_instance):
     """Test successfully retrieving a team's board"""
     mock_room = {
@@ -432,7 +436,7 @@ def test_get_team_board_success(mock_db_instance):
     assert response.json() == {"ringData": [{"id": 1}]}
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_get_team_board_room_not_found(mock_db_instance):
     """Test retrieving board for non-existent room"""
     mock_db_instance.rooms.find_one.return_value = None
@@ -443,7 +447,7 @@ def test_get_team_board_room_not_found(mock_db_instance):
     assert response.json()["detail"] == "Room not found"
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_get_team_board_team_not_found(mock_db_instance):
     """Test retrieving board for non-existent team"""
     mock_room = {"room_code": "ABC123", "teams": []}
@@ -455,7 +459,36 @@ def test_get_team_board_team_not_found(mock_db_instance):
     assert response.json()["detail"] == "Team not found"
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
+def test_get_team_board_projects_only_target_team(mock_db_instance):
+    """Test that the board read fetches only the requested team's board"""
+    mock_db_instance.rooms.find_one.return_value = {
+        "room_code": "ABC123",
+        "teams": [{
+            "team_name": "Team Alpha",
+            "gameboard_state": {"ringData": []}
+        }]
+    }
+
+    response = client.get("/rooms/abc123/teams/Team Alpha/board")
+
+    assert response.status_code == 200
+    query, projection = mock_db_instance.rooms.find_one.call_args[0]
+    assert query == {"room_code": "ABC123"}
+    assert projection["_id"] == 0
+
+    team_filter = projection["teams"]["$map"]["input"]["$filter"]
+    assert team_filter["cond"] == {
+        "$eq": ["$$team.team_name", {"$literal": "Team Alpha"}]}
+    assert projection["teams"]["$map"]["in"] == {
+        "team_name": "$$team.team_name",
+        "revision": "$$team.revision",
+        "gameboard_state": {"ringData": "$$team.gameboard_state.ringData"}
+    }
+    assert "board_config" not in projection
+
+
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_update_team_board_success(mock_db_instance):
     """Test successfully updating a team's board"""
     mock_db_instance.rooms.update_one.return_value = MagicMock(matched_count=1)
@@ -468,9 +501,93 @@ def test_update_team_board_success(mock_db_instance):
     assert response.json()["message"] == "Board updated successfully"
 
 
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
+def test_update_team_board_with_matching_revision(mock_db_instance):
+    """Test that If-Match turns the board write into a conditional update"""
+    mock_db_instance.rooms.update_one.return_value = MagicMock(matched_count=1)
+
+    response = client.put(
+        "/rooms/ABC123/teams/Team Alpha/board",
+        json={"board_state": {"ringData": []}},
+        headers={"If-Match": '"4"'}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"5"'
+    query, update = mock_db_instance.rooms.update_one.call_args[0]
+    assert query == {
+        "room_code": "ABC123",
+        "teams": {"$elemMatch": {"team_name": "Team Alpha", "revision": 4}}
+    }
+    assert update["$inc"] == {"revision": 1, "teams.$.revision": 1}
+
+
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
+def test_update_team_board_stale_revision_conflict(mock_db_instance):
+    """Test that a stale If-Match gets a 409 with the team's current state"""
+    mock_db_instance.rooms.update_one.return_value = MagicMock(matched_count=0)
+    mock_db_instance.rooms.find_one.return_value = {
+        "room_code": "ABC123",
+        "teams": [{
+            "team_name": "Team Alpha",
+            "revision": 5,
+            "gameboard_state": {"ringData": [{"id": 1}]}
+        }]
+    }
+
+    response = client.put(
+        "/rooms/ABC123/teams/Team Alpha/board",
+        json={"board_state": {"ringData": []}},
+        headers={"If-Match": '"4"'}
+    )
+
+    assert response.status_code == 409
+    assert response.headers["ETag"] == '"5"'
+    detail = response.json()["detail"]
+    assert detail["revision"] == 5
+    assert detail["team"]["gameboard_state"] == {"ringData": [{"id": 1}]}
+
+
+def test_update_team_board_invalid_if_match():
+    """Test that a malformed If-Match header is rejected"""
+    response = client.put(
+        "/rooms/ABC123/teams/Team Alpha/board",
+        json={"board_state": {"ringData": []}},
+        headers={"If-Match": "not-a-revision"}
+    )
+
+    assert response.status_code == 400
+
+
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
+def test_get_room_returns_revision_etag(mock_db_instance):
+    """Test that room reads expose the revision as an ETag"""
+    mock_db_instance.rooms.find_one.return_value = {
+        "room_code": "ABC123", "revision": 7}
+
+    response = client.get("/rooms/ABC123")
+
+    assert response.headers["ETag"] == '"7"'
+
+
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
+def test_start_game_stale_revision_conflict(mock_db_instance):
+    """Test that a conditional room write that lost a race returns 409"""
+    mock_db_instance.rooms.update_one.return_value = MagicMock(matched_count=0)
+    mock_db_instance.rooms.find_one.return_value = {
+        "room_code": "ABC123", "revision": 3, "game_started": True}
+
+    response = client.post("/rooms/ABC123/start", headers={"If-Match": '"2"'})
+
+    assert response.status_code == 409
+    assert response.json()["detail"]["room"]["game_started"] is True
+    query = mock_db_instance.rooms.update_one.call_args[0][0]
+    assert query == {"room_code": "ABC123", "revision": 2}
+
+
 # Team Energy Tests
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_get_team_energy_success(mock_db_instance):
     """Test successfully retrieving a team's energy"""
     mock_room = {
@@ -488,7 +605,7 @@ def test_get_team_energy_success(mock_db_instance):
     assert response.json() == {"current_energy": 75}
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_update_team_energy_increase(mock_db_instance):
     """Test increasing a team's energy"""
     mock_room = {
@@ -509,7 +626,7 @@ def test_update_team_energy_increase(mock_db_instance):
     assert response.json()["current_energy"] == 75
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_update_team_energy_decrease(mock_db_instance):
     """Test decreasing a team's energy"""
     mock_room = {
@@ -530,7 +647,7 @@ def test_update_team_energy_decrease(mock_db_instance):
     assert response.json()["current_energy"] == 30
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_update_team_energy_cannot_go_negative(mock_db_instance):
     """Test that energy cannot go below zero"""
     mock_room = {
@@ -551,7 +668,28 @@ def test_update_team_energy_cannot_go_negative(mock_db_instance):
     assert response.json()["current_energy"] == 0
 
 
-@patch('backend.app.api.db')
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
+def test_update_team_energy_retries_lost_race(mock_db_instance):
+    """Test that an unconditional energy update retries against fresh state"""
+    mock_db_instance.rooms.find_one.side_effect = [
+        {"room_code": "ABC123", "teams": [{
+            "team_name": "Team Alpha", "current_energy": 50, "revision": 1}]},
+        {"room_code": "ABC123", "teams": [{
+            "team_name": "Team Alpha", "current_energy": 40, "revision": 2}]}
+    ]
+    mock_db_instance.rooms.update_one.side_effect = [
+        MagicMock(matched_count=0), MagicMock(matched_count=1)]
+
+    response = client.put("/rooms/ABC123/teams/Team Alpha/energy", json={
+        "change": 5
+    })
+
+    assert response.status_code == 200
+    assert response.json()["current_energy"] == 45
+    assert response.headers["ETag"] == '"3"'
+
+
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
 def test_update_team_energy_team_not_found(mock_db_instance):
     """Test updating energy for non-existent team"""
     mock_room = {"room_code": "ABC123", "teams": []}
@@ -563,3 +701,54 @@ def test_update_team_energy_team_not_found(mock_db_instance):
 
     assert response.status_code == 404
     assert response.json()["detail"] == "Team not found"
+
+
+# Team Mistakes Tests
+
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
+def test_get_team_mistakes_lists_missing_required_tiles(mock_db_instance):
+    """Test that required tiles without energy are reported as mistakes"""
+    mock_db_instance.rooms.find_one.return_value = {
+        "room_code": "ABC123",
+        "board_config": {"ringData": [{
+            "id": 1,
+            "labels": [
+                {"id": 1, "text": "Visa", "required_for": ["Student"]},
+                {"id": 2, "text": "Bank", "required_for": ["Student"]},
+                {"id": 3, "text": "Gym", "required_for": []}
+            ]
+        }]},
+        "teams": [{
+            "team_name": "Team Alpha",
+            "circumstance": "Student",
+            "gameboard_state": {"ringData": [{
+                "labels": [{"energypoint": True}, {}, {}]
+            }]}
+        }]
+    }
+
+    response = client.get("/rooms/ABC123/teams/Team Alpha/mistakes")
+
+    assert response.status_code == 200
+    assert response.json() == {"mistakes": [{
+        "ring_id": 1,
+        "label_id": 2,
+        "tile_text": "Bank",
+        "ring_index": 0,
+        "label_index": 1
+    }]}
+
+    projection = mock_db_instance.rooms.find_one.call_args[0][1]
+    assert projection["board_config.ringData"] == 1
+
+
+@patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
+def test_get_team_mistakes_team_not_found(mock_db_instance):
+    """Test mistakes for a team that isn't in the room"""
+    mock_db_instance.rooms.find_one.return_value = {
+        "room_code": "ABC123", "teams": []}
+
+    response = client.get("/rooms/ABC123/teams/NonExistent/mistakes")
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Team not found"
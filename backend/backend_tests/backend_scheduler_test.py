@@ -1,21 +1,21 @@
 """Integration tests for the cleanup scheduler"""
 import os
 import time
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi.testclient import TestClient
 
 from backend.app.cleanup import cleanup_old_games
+from backend.backend_tests.mocks import mock_expired_rooms
 from backend.main import app, scheduler
 
 
 class TestSchedulerIntegration:
     """Test suite for scheduler integration"""
 
-    @patch('backend.main.initialize_database')
-    @patch('backend.main.create_cleanup_index')
+    @patch('backend.main.warm_up', new_callable=AsyncMock)
     @patch('backend.main.scheduler')
     def test_scheduler_starts_on_app_startup(
-            self, mock_scheduler, mock_create_index, mock_init_db):
+            self, mock_scheduler, mock_warm_up):
         """Test that scheduler starts when app starts (non-testing mode)"""
         os.environ["TESTING"] = "false"
 
@@ -44,11 +44,10 @@ class TestSchedulerIntegration:
             # Verify scheduler.start was called
             assert mock_scheduler.start.called
 
-    @patch('backend.main.initialize_database')
-    @patch('backend.main.create_cleanup_index')
+    @patch('backend.main.warm_up', new_callable=AsyncMock)
     @patch('backend.main.scheduler')
     def test_scheduler_shuts_down_on_app_shutdown(
-            self, mock_scheduler, mock_create_index, mock_init_db):
+            self, mock_scheduler, mock_warm_up):
         """Test that scheduler shuts down when app stops"""
 
         # Mock scheduler as running
@@ -60,11 +59,8 @@ class TestSchedulerIntegration:
         # Verify scheduler.shutdown was called
         assert mock_scheduler.shutdown.called
 
-    @patch('backend.main.initialize_database')
-    @patch('backend.main.create_cleanup_index')
     @patch('backend.main.cleanup_old_games')
-    def test_cleanup_job_configuration(
-            self, mock_cleanup, mock_create_index, mock_init_db):
+    def test_cleanup_job_configuration(self, mock_cleanup):
         """Test that cleanup job is configured with correct parameters"""
 
         # Clear any existing jobs
@@ -97,6 +93,8 @@ class TestSchedulerManualExecution:
     def test_manual_trigger_cleanup(self, mock_db):
         """Test manually triggering the cleanup function as scheduler would"""
 
+        mock_expired_rooms(mock_db, 10)
+
         # Setup mock
         mock_result = MagicMock()
         mock_result.deleted_count = 10
@@ -113,6 +111,8 @@ class TestSchedulerManualExecution:
     def test_rapid_consecutive_cleanups(self, mock_db):
         """Test that cleanup can be called multiple times in succession"""
 
+        mock_expired_rooms(mock_db, 1)
+
         mock_result = MagicMock()
         mock_result.deleted_count = 1
         mock_db.rooms.delete_many.return_value = mock_result
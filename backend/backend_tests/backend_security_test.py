@@ -1,5 +1,6 @@
 """Tests for security.py functions"""
 
+import asyncio
 import os
 from datetime import datetime, timedelta, timezone
 from unittest.mock import MagicMock, patch
@@ -9,6 +10,7 @@ from fastapi import HTTPException, Response, status
 from jose import ExpiredSignatureError, JWTError, jwt
 
 from backend.app import security
+from backend.backend_tests.mocks import AsyncDatabaseMock
 
 os.environ['SECRET_KEY'] = 'test_secret_key'
 os.environ['ALGORITHM'] = 'HS256'
@@ -86,7 +88,7 @@ def test_create_access_token_custom_expiry():
     assert abs(expected_expiry - token_expiry) < timedelta(seconds=5)
 
 
-@patch('backend.app.security.db')
+@patch('backend.app.security.async_db', new_callable=AsyncDatabaseMock)
 @patch('backend.app.security.datetime')
 @patch('backend.app.security.jwt.decode')
 def test_get_current_active_user_success(
@@ -118,8 +120,8 @@ def test_get_current_active_user_success(
     mock_response = MagicMock(spec=Response)
     mock_response.headers = {}
 
-    user = security.get_current_active_user(
-        response=mock_response, token=test_token)
+    user = asyncio.run(security.get_current_active_user(
+        response=mock_response, token=test_token))
 
     mock_datetime_class.now.assert_called_with(timezone.utc)
 
@@ -137,7 +139,7 @@ def test_get_current_active_user_success(
     assert "X-Token-Refresh" not in mock_response.headers
 
 
-@patch('backend.app.security.db')
+@patch('backend.app.security.async_db', new_callable=AsyncDatabaseMock)
 @patch('backend.app.security.datetime')
 @patch('backend.app.security.jwt.decode')
 @patch('backend.app.security.create_access_token')
@@ -173,8 +175,8 @@ def test_get_current_active_user_token_refresh(
     mock_response = MagicMock(spec=Response)
     mock_response.headers = {}
 
-    user = security.get_current_active_user(
-        response=mock_response, token=test_token)
+    user = asyncio.run(security.get_current_active_user(
+        response=mock_response, token=test_token))
 
     mock_datetime_class.now.assert_called_with(timezone.utc)
 
@@ -194,8 +196,8 @@ def test_get_current_active_user_token_expired(mock_jwt_decode):
     mock_response = MagicMock(spec=Response)
 
     with pytest.raises(HTTPException) as exc_info:
-        security.get_current_active_user(
-            response=mock_response, token="expired.token")
+        asyncio.run(security.get_current_active_user(
+            response=mock_response, token="expired.token"))
 
     assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
     assert exc_info.value.detail == "Token expired"
@@ -209,8 +211,8 @@ def test_get_current_active_user_invalid_token(mock_jwt_decode):
     mock_response = MagicMock(spec=Response)
 
     with pytest.raises(HTTPException) as exc_info:
-        security.get_current_active_user(
-            response=mock_response, token="invalid.token")
+        asyncio.run(security.get_current_active_user(
+            response=mock_response, token="invalid.token"))
 
     assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
     assert exc_info.value.detail == "Could not validate token"
@@ -224,8 +226,8 @@ def test_get_current_active_user_invalid_payload_sub(mock_jwt_decode):
     mock_response = MagicMock(spec=Response)
 
     with pytest.raises(HTTPException) as exc_info:
-        security.get_current_active_user(
-            response=mock_response, token="no.sub.token")
+        asyncio.run(security.get_current_active_user(
+            response=mock_response, token="no.sub.token"))
 
     assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
     assert exc_info.value.detail == "Could not validate token"
@@ -239,14 +241,14 @@ def test_get_current_active_user_invalid_payload_iat(mock_jwt_decode):
     mock_response = MagicMock(spec=Response)
 
     with pytest.raises(HTTPException) as exc_info:
-        security.get_current_active_user(
-            response=mock_response, token="no.iat.token")
+        asyncio.run(security.get_current_active_user(
+            response=mock_response, token="no.iat.token"))
 
     assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
     assert exc_info.value.detail == "Could not validate token"
 
 
-@patch('backend.app.security.db')
+@patch('backend.app.security.async_db', new_callable=AsyncDatabaseMock)
 @patch('backend.app.security.jwt.decode')
 def test_get_current_active_user_not_found(mock_jwt_decode, mock_db):
     """Test for a user that exists in the token but not in the database."""
@@ -260,8 +262,8 @@ def test_get_current_active_user_not_found(mock_jwt_decode, mock_db):
     mock_response = MagicMock(spec=Response)
 
     with pytest.raises(HTTPException) as exc_info:
-        security.get_current_active_user(
-            response=mock_response, token="ghost.user.token")
+        asyncio.run(security.get_current_active_user(
+            response=mock_response, token="ghost.user.token"))
 
     assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
     assert exc_info.value.detail == "User not found"
@@ -0,0 +1,76 @@
+"""Tests for Server-Timing response headers"""
+import threading
+
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app.query_monitor import QueryStatsMiddleware, query_monitor
+from backend.app.server_timing import (ServerTimingMiddleware,
+                                       TimedJSONResponse, TimingRoute, timed,
+                                       timed_phase)
+from backend.backend_tests.backend_query_monitor_test import run_command
+
+
+@timed_phase("auth")
+async def fake_user():
+    with timed("jwt"):
+        pass
+    run_command(query_monitor, "find", {"find": "users", "filter": {}})
+    return {"email": "a@b.fi"}
+
+
+router = APIRouter(route_class=TimingRoute,
+                   default_response_class=TimedJSONResponse)
+
+
+@router.get("/rooms/{room_code}")
+async def get_room(room_code: str, user: dict = Depends(fake_user)):
+    run_command(query_monitor, "find", {"find": "rooms", "filter": {}})
+    return {"room_code": room_code, "user": user}
+
+
+@router.get("/sync")
+def sync_route():
+    return {"thread": threading.get_ident()}
+
+
+@router.get("/async")
+async def async_route():
+    return {"thread": threading.get_ident()}
+
+
+app = FastAPI()
+app.include_router(router)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+client = TestClient(app)
+
+
+def _phases(response) -> dict:
+    phases = {}
+    for entry in response.headers["server-timing"].split(", "):
+        name, *params = entry.split(";")
+        phases[name] = dict(param.split("=", 1) for param in params)
+    return phases
+
+
+def test_header_breaks_down_request_phases():
+    """Test that the header reports each phase of a request"""
+    phases = _phases(client.get("/rooms/ABC123"))
+
+    assert set(phases) == {"jwt", "auth", "endpoint", "serialization",
+                           "validation", "db", "total"}
+    assert phases["db"]["desc"] == '"2 queries"'
+    assert all(float(phase["dur"]) >= 0 for phase in phases.values())
+    assert float(phases["total"]["dur"]) >= float(phases["auth"]["dur"])
+
+
+def test_sync_endpoints_stay_in_the_threadpool():
+    """Test that timing a sync endpoint doesn't move it onto the loop"""
+    # One event loop thread for both requests
+    with TestClient(app) as loop_client:
+        response = loop_client.get("/sync")
+        loop_thread = loop_client.get("/async").json()["thread"]
+
+    assert response.json()["thread"] != loop_thread
+    assert "endpoint" in _phases(response)
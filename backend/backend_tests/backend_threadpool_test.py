@@ -0,0 +1,82 @@
+"""Tests for threadpool sizing and saturation statistics"""
+import asyncio
+from unittest.mock import patch
+
+import anyio.to_thread
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+from pymongo import _csot
+
+from backend.app.deadlines import request_timeout
+from backend.app.threadpool import (ThreadpoolRoute, configure_threadpool,
+                                    run_in_threadpool, threadpool_statistics)
+
+router = APIRouter(route_class=ThreadpoolRoute)
+
+
+def dependency_value():
+    return "from dependency"
+
+
+@router.get("/sync/{item}")
+@request_timeout(1500)
+def sync_route(item: str, value: str = Depends(dependency_value)):
+    return {"item": item, "value": value, "timeout": _csot.get_timeout()}
+
+
+@router.get("/stats")
+async def stats_route():
+    return threadpool_statistics.snapshot()
+
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+
+def test_sync_endpoint_records_wait_per_route():
+    """Test that sync endpoints keep injection and deadlines and are timed"""
+    threadpool_statistics.reset()
+
+    response = client.get("/sync/abc")
+
+    assert response.json() == {"item": "abc", "value": "from dependency",
+                               "timeout": 1.5}
+    routes = client.get("/stats").json()["routes"]
+    assert routes["/sync/{item}"]["calls"] == 1
+    assert routes["/sync/{item}"]["wait_ms_max"] >= 0
+
+
+def test_snapshot_reports_limiter_gauges():
+    """Test that the snapshot includes the limiter's capacity and usage"""
+    stats = client.get("/stats").json()
+
+    assert stats["total_tokens"] > 0
+    assert stats["borrowed_tokens"] == 0
+    assert stats["tasks_waiting"] == 0
+
+
+def test_offload_outside_route_is_labelled_by_function():
+    """Test that explicit offloads without a route use the function name"""
+    threadpool_statistics.reset()
+
+    def blocking_work():
+        return 42
+
+    async def offload():
+        result = await run_in_threadpool(blocking_work)
+        return result, threadpool_statistics.snapshot()["routes"]
+
+    result, routes = asyncio.run(offload())
+    assert result == 42
+    assert routes[blocking_work.__qualname__]["calls"] == 1
+
+
+@patch.dict('os.environ', {'THREADPOOL_TOKENS': '7'})
+def test_configure_threadpool_sets_capacity():
+    """Test that THREADPOOL_TOKENS resizes the default thread limiter"""
+    async def configured_tokens():
+        configure_threadpool()
+        return anyio.to_thread.current_default_thread_limiter().total_tokens
+
+    assert asyncio.run(configured_tokens()) == 7
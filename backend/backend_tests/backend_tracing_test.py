@@ -0,0 +1,123 @@
+"""Tests for request, database, bcrypt and cleanup spans"""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import \
+    InMemorySpanExporter
+from opentelemetry.trace import SpanKind, StatusCode
+
+from backend.app import security
+from backend.app.cleanup import cleanup_old_games
+from backend.app.hashing import PasswordHasher, get_password_hash
+from backend.app.query_monitor import query_monitor
+from backend.app.tracing import TRACE_HEADER, TracingMiddleware, tracing
+from backend.backend_tests.backend_query_monitor_test import run_command
+
+app = FastAPI()
+app.add_middleware(TracingMiddleware)
+
+
+@app.get("/rooms/{room_code}")
+async def get_room(room_code: str,
+                   user: dict = Depends(security.get_current_active_user)):
+    run_command(query_monitor, "find", {"find": "rooms", "filter": {}})
+    return {"room_code": room_code, "user": user["email"]}
+
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True, name="exporter")
+def fixture_exporter():
+    """Record spans in memory for the duration of a test"""
+    exporter = tracing.configure(InMemorySpanExporter(), batch=False)
+    yield exporter
+    tracing.shutdown()
+
+
+def _find_user(*_args):
+    run_command(query_monitor, "find", {"find": "users", "filter": {}})
+    return {"email": "gm@example.com"}
+
+
+def test_request_span_contains_auth_and_query_spans(exporter):
+    """Test that a request's auth and MongoDB spans are its children"""
+    with patch.object(security, "SECRET_KEY", "test_secret_key"), \
+            patch.object(security, "ALGORITHM", "HS256"), \
+            patch.object(security, "async_db") as mock_db:
+        mock_db.users.find_one = AsyncMock(side_effect=_find_user)
+        token = security.create_access_token({"sub": "gm@example.com"})
+        response = client.get("/rooms/ABC123",
+                              headers={"Authorization": f"Bearer {token}"})
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert set(spans) == {"GET /rooms/{room_code}",
+                          "auth.get_current_active_user",
+                          "find users", "find rooms"}
+    request = spans["GET /rooms/{room_code}"]
+    auth = spans["auth.get_current_active_user"]
+    assert request.kind == SpanKind.SERVER
+    assert request.parent is None
+    assert request.attributes["http.route"] == "/rooms/{room_code}"
+    assert request.attributes["http.response.status_code"] == 200
+    assert auth.parent.span_id == request.context.span_id
+    assert spans["find users"].parent.span_id == auth.context.span_id
+    assert spans["find rooms"].parent.span_id == request.context.span_id
+    assert spans["find rooms"].attributes["db.collection.name"] == "rooms"
+    assert response.headers[TRACE_HEADER] == \
+        f"{request.context.trace_id:032x}"
+
+
+def test_incoming_traceparent_is_continued(exporter):
+    """Test that a request joins the trace named in its traceparent"""
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    client.get("/missing", headers={
+        "traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"})
+
+    (span,) = exporter.get_finished_spans()
+    assert span.name == "GET"
+    assert f"{span.context.trace_id:032x}" == trace_id
+    assert span.parent.span_id == 0x00f067aa0ba902b7
+    assert span.attributes["http.response.status_code"] == 404
+
+
+def test_bcrypt_work_is_traced(exporter):
+    """Test that password checks get a span with their pool timings"""
+    hasher = PasswordHasher(workers=0, queue_depth=1)
+    hashed = get_password_hash("secret")
+
+    assert asyncio.run(hasher.verify("secret", hashed))
+
+    (span,) = exporter.get_finished_spans()
+    assert span.name == "bcrypt.verify"
+    assert span.attributes["bcrypt.hash_ms"] > 0
+    assert "bcrypt.queue_wait_ms" in span.attributes
+
+
+@patch('backend.app.cleanup.db')
+def test_cleanup_run_is_a_root_span(mock_db, exporter):
+    """Test that each cleanup run is traced with its result"""
+    mock_db.maintenance.find_one.return_value = None
+    cleanup_old_games()
+    mock_db.maintenance.find_one.side_effect = RuntimeError("down")
+    with pytest.raises(RuntimeError):
+        cleanup_old_games()
+
+    success, error = exporter.get_finished_spans()
+    assert success.name == "cleanup_old_games"
+    assert success.parent is None
+    assert success.attributes["cleanup.result"] == "success"
+    assert success.attributes["cleanup.deleted"] == 0
+    assert error.status.status_code == StatusCode.ERROR
+
+
+def test_nothing_is_traced_when_tracing_is_off(exporter):
+    """Test that requests pass through untouched without an exporter"""
+    tracing.shutdown()
+    response = client.get("/missing")
+
+    assert TRACE_HEADER not in response.headers
+    assert not exporter.get_finished_spans()
@@ -0,0 +1,92 @@
+"""Tests for startup warm-up, readiness and document caches"""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pymongo.errors import ServerSelectionTimeoutError
+
+from backend.app.api import router
+from backend.app.cache import CachedQuery
+from backend.app.warmup import Readiness, WARMUP_CONNECTIONS, warm_up
+from backend.backend_tests.mocks import AsyncDatabaseMock
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+
+@patch('backend.app.warmup.create_activity_index')
+@patch('backend.app.warmup.create_cleanup_index')
+@patch('backend.app.warmup.initialize_database')
+@patch('backend.app.warmup.async_db', new_callable=AsyncDatabaseMock)
+def test_warm_up_prepares_pool_indexes_and_caches(
+        mock_db, mock_init_db, mock_cleanup_index, mock_activity_index):
+    """Test that warm-up opens connections, builds indexes and fills caches"""
+    cache = CachedQuery(AsyncMock(return_value=["template"]), 30)
+    with patch('backend.app.warmup.readiness', Readiness()) as state:
+        asyncio.run(warm_up(cache))
+
+        assert state.ready
+        assert state.snapshot()["status"] == "ready"
+    assert mock_db.command.await_count == WARMUP_CONNECTIONS
+    assert mock_init_db.called
+    assert mock_cleanup_index.called
+    assert mock_activity_index.called
+    assert cache._load.await_count == 1  # pylint: disable=protected-access
+
+
+@patch('backend.app.warmup.asyncio.sleep', new_callable=AsyncMock)
+@patch('backend.app.warmup.create_activity_index')
+@patch('backend.app.warmup.create_cleanup_index')
+@patch('backend.app.warmup.initialize_database')
+@patch('backend.app.warmup.async_db', new_callable=AsyncDatabaseMock)
+def test_warm_up_retries_until_database_is_reachable(
+        mock_db, _init_db, _cleanup_index, _activity_index, mock_sleep):
+    """Test that a failed warm-up backs off and tries again"""
+    calls = []
+
+    async def ping(command):  # pylint: disable=unused-argument
+        calls.append(command)
+        if len(calls) == 1:
+            raise ServerSelectionTimeoutError("down")
+        return {"ok": 1}
+    mock_db.command.side_effect = ping
+    with patch('backend.app.warmup.readiness', Readiness()) as state:
+        asyncio.run(warm_up())
+
+        assert state.ready
+        assert state.attempts == 2
+        assert state.last_error is None
+    mock_sleep.assert_awaited_once_with(1)
+
+
+def test_readyz_is_gated_on_warm_up():
+    """Test that /readyz returns 503 until the worker has warmed up"""
+    with patch('backend.app.api.readiness', Readiness()) as state:
+        response = client.get("/readyz")
+        assert response.status_code == 503
+        assert response.json()["status"] == "warming up"
+
+        state.ready = True
+        response = client.get("/readyz")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+
+
+def test_cached_query_reuses_result_until_invalidated():
+    """Test that a cached query loads once and reloads after invalidation"""
+    load = AsyncMock(return_value={"instructions": "Walk a mile"})
+    cache = CachedQuery(load, ttl_seconds=30)
+
+    async def read_twice():
+        first = await cache.get()
+        first["instructions"] = "modified by caller"
+        return await cache.get()
+
+    assert asyncio.run(read_twice()) == {"instructions": "Walk a mile"}
+    assert load.await_count == 1
+
+    cache.invalidate()
+    asyncio.run(cache.get())
+    assert load.await_count == 2
@@ -0,0 +1,284 @@
+"""Tests for the write-behind buffer for team board and energy updates"""
+import os
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pymongo.errors import PyMongoError
+
+from backend.app.api import router
+from backend.app.security import get_current_active_user
+from backend.app.write_behind import (RevisionConflict, WriteBehindBuffer,
+                                      write_buffer)
+from backend.backend_tests.mocks import AsyncDatabaseMock
+
+os.environ['TESTING'] = 'true'
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+
+def _loaded_buffer(*teams):
+    buffer = WriteBehindBuffer(enabled=True, flush_interval_ms=200)
+    for room_code, team_name, team in teams:
+        buffer.load(room_code, team_name, team)
+    return buffer
+
+
+class TestWriteBehindBuffer:
+    """Test suite for buffering and flushing team updates"""
+
+    def test_apply_unbuffered_team_returns_none(self):
+        """Test that teams must be loaded before they can be updated"""
+        buffer = _loaded_buffer()
+
+        assert buffer.apply("ABC123", "Team Alpha",
+                            lambda _: {"current_energy": 1}) is None
+
+    def test_apply_updates_state_and_revision(self):
+        """Test that updates are visible immediately with a new revision"""
+        buffer = _loaded_buffer(
+            ("abc123", "Team Alpha", {"current_energy": 30, "revision": 2}))
+
+        team = buffer.apply(
+            "ABC123", "Team Alpha",
+            lambda state: {"current_energy": state["current_energy"] + 5})
+
+        assert team["current_energy"] == 35
+        assert team["revision"] == 3
+        assert buffer.get("ABC123", "Team Alpha")["current_energy"] == 35
+
+    def test_apply_stale_revision_raises_conflict(self):
+        """Test that a mismatched expected revision is rejected"""
+        buffer = _loaded_buffer(
+            ("ABC123", "Team Alpha", {"current_energy": 30, "revision": 2}))
+
+        with pytest.raises(RevisionConflict) as exc_info:
+            buffer.apply("ABC123", "Team Alpha",
+                         lambda _: {"current_energy": 0}, expected=1)
+
+        assert exc_info.value.team["revision"] == 2
+
+    @patch('backend.app.write_behind.db')
+    def test_flush_coalesces_updates_into_one_bulk_write_per_room(
+            self, mock_db):
+        """Test that several updates become one bulk_write per room"""
+        buffer = _loaded_buffer(
+            ("ABC123", "Team Alpha", {"current_energy": 30}),
+            ("ABC123", "Team Beta", {"current_energy": 30}),
+            ("XYZ789", "Team Gamma", {"current_energy": 30}))
+        for _ in range(3):
+            buffer.apply("ABC123", "Team Alpha",
+                         lambda state: {
+                             "current_energy": state["current_energy"] - 1})
+        buffer.apply("ABC123", "Team Beta",
+                     lambda _: {"gameboard_state": {"ringData": []}})
+        buffer.apply("XYZ789", "Team Gamma",
+                     lambda _: {"current_energy": 10})
+
+        assert buffer.flush() == 3
+
+        assert mock_db.rooms.bulk_write.call_count == 2
+        requests = mock_db.rooms.bulk_write.call_args_list[0][0][0]
+        alpha = requests[0]._doc  # pylint: disable=protected-access
+        assert requests[0]._filter == {  # pylint: disable=protected-access
+            "room_code": "ABC123", "teams.team_name": "Team Alpha"}
+        assert alpha["$set"] == {"teams.$.current_energy": 27}
+        assert alpha["$inc"] == {"revision": 3, "teams.$.revision": 3}
+
+        # Flushed teams are evicted and nothing is left to write
+        assert buffer.get("ABC123", "Team Alpha") is None
+        assert buffer.flush() == 0
+
+    @patch('backend.app.write_behind.db')
+    def test_failed_flush_keeps_updates_for_retry(self, mock_db):
+        """Test that a failed bulk_write doesn't lose buffered updates"""
+        buffer = _loaded_buffer(
+            ("ABC123", "Team Alpha", {"current_energy": 30}))
+        buffer.apply("ABC123", "Team Alpha",
+                     lambda _: {"current_energy": 20})
+        mock_db.rooms.bulk_write.side_effect = PyMongoError("down")
+
+        assert buffer.flush() == 0
+        assert buffer.get("ABC123", "Team Alpha")["current_energy"] == 20
+
+        mock_db.rooms.bulk_write.side_effect = None
+        assert buffer.flush() == 1
+        update = mock_db.rooms.bulk_write.call_args[0][0][0]._doc  # pylint: disable=protected-access
+        assert update["$inc"]["teams.$.revision"] == 1
+
+    @patch('backend.app.write_behind.db')
+    def test_stop_flushes_remaining_updates(self, mock_db):
+        """Test that stopping the buffer writes out pending updates"""
+        buffer = _loaded_buffer(
+            ("ABC123", "Team Alpha", {"current_energy": 30}))
+        buffer.start()
+        buffer.apply("ABC123", "Team Alpha",
+                     lambda _: {"current_energy": 20})
+
+        buffer.stop()
+
+        assert mock_db.rooms.bulk_write.called
+        assert buffer.get("ABC123", "Team Alpha") is None
+
+    @patch('backend.app.write_behind.db')
+    def test_load_refuses_state_older_than_last_flush(self, mock_db):  # pylint: disable=unused-argument
+        """Test that a read from before a flush can't replace its writes"""
+        buffer = WriteBehindBuffer(enabled=True, flush_interval_ms=200)
+        stale = {"current_energy": 30, "revision": 2}
+        assert buffer.load("ABC123", "Team Alpha", stale)
+        buffer.apply("ABC123", "Team Alpha",
+                     lambda _: {"current_energy": 20})
+        buffer.flush()
+
+        assert not buffer.load("ABC123", "Team Alpha", stale)
+        assert buffer.get("ABC123", "Team Alpha") is None
+        assert buffer.load("ABC123", "Team Alpha",
+                           {"current_energy": 20, "revision": 3})
+
+    def test_deleted_team_can_be_loaded_again(self):
+        """Test that discard forgets the revisions of evicted teams"""
+        buffer = _loaded_buffer(
+            ("ABC123", "Team Alpha", {"current_energy": 30, "revision": 5}))
+        buffer.flush()
+
+        buffer.discard("ABC123")
+
+        assert buffer.load("ABC123", "Team Alpha", {"current_energy": 30})
+
+    def test_recreated_room_is_not_refused(self):
+        """Test that a new room under the same code isn't taken as stale"""
+        buffer = _loaded_buffer()
+        buffer.load("ABC123", "Team Alpha",
+                    {"current_energy": 30, "revision": 5}, "room-1")
+        buffer.flush()
+
+        assert not buffer.load("ABC123", "Team Alpha",
+                               {"current_energy": 30}, "room-1")
+        assert buffer.load("ABC123", "Team Alpha",
+                           {"current_energy": 30}, "room-2")
+
+    @patch.dict(os.environ, {"WEB_CONCURRENCY": "4"})
+    def test_start_disables_buffer_with_several_workers(self):
+        """Test that per-process buffering is refused with several workers"""
+        buffer = WriteBehindBuffer(enabled=True, flush_interval_ms=200)
+
+        buffer.start()
+
+        assert buffer.enabled is False
+        assert buffer._thread is None  # pylint: disable=protected-access
+
+
+class TestWriteBehindEndpoints:
+    """Test the team routes with write-behind enabled"""
+
+    @pytest.fixture(autouse=True)
+    def enable_buffer(self):
+        write_buffer.enabled = True
+        yield
+        write_buffer.enabled = False
+        write_buffer.discard("ABC123")
+
+    @patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
+    def test_energy_updates_are_buffered(self, mock_db_instance):
+        """Test that energy updates skip the database and read back"""
+        mock_db_instance.rooms.find_one.return_value = {
+            "_id": "room-1",
+            "room_code": "ABC123",
+            "teams": [{"team_name": "Team Alpha", "current_energy": 30}]
+        }
+
+        for _ in range(2):
+            response = client.put(
+                "/rooms/ABC123/teams/Team Alpha/energy", json={"change": -5})
+            assert response.status_code == 200
+        assert response.json() == {"current_energy": 20}
+        assert response.headers["ETag"] == '"2"'
+
+        response = client.get("/rooms/ABC123/teams/Team Alpha/energy")
+        assert response.json() == {"current_energy": 20}
+
+        # Only the initial load touched the database
+        assert mock_db_instance.rooms.find_one.call_count == 1
+        assert not mock_db_instance.rooms.update_one.called
+
+    @patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
+    def test_buffered_board_is_visible_in_room(self, mock_db_instance):
+        """Test that room reads include buffered board state"""
+        mock_db_instance.rooms.find_one.return_value = {
+            "_id": "room-1",
+            "room_code": "ABC123",
+            "teams": [{"team_name": "Team Alpha", "gameboard_state": None}]
+        }
+        board = {"ringData": [{"id": 1}]}
+
+        client.put("/rooms/ABC123/teams/Team Alpha/board",
+                   json={"board_state": board})
+        response = client.get("/rooms/ABC123")
+
+        assert response.json()["teams"][0]["gameboard_state"] == board
+
+    @patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
+    def test_buffered_update_with_stale_revision(self, mock_db_instance):
+        """Test that If-Match is checked against the buffered revision"""
+        mock_db_instance.rooms.find_one.return_value = {
+            "_id": "room-1",
+            "room_code": "ABC123",
+            "teams": [{"team_name": "Team Alpha", "revision": 3}]
+        }
+
+        response = client.put(
+            "/rooms/ABC123/teams/Team Alpha/board",
+            json={"board_state": {"ringData": []}},
+            headers={"If-Match": '"2"'})
+
+        assert response.status_code == 409
+        assert response.json()["detail"]["revision"] == 3
+        assert not mock_db_instance.rooms.update_one.called
+
+    @patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
+    def test_circumstance_follows_buffered_revision(self, mock_db_instance):
+        """Test that a board write's ETag is good for a circumstance write"""
+        mock_db_instance.rooms.find_one.return_value = {
+            "_id": "room-1",
+            "room_code": "ABC123",
+            "teams": [{"team_name": "Team Alpha", "revision": 0}]
+        }
+        app.dependency_overrides[get_current_active_user] = lambda: {}
+        board = {"ringData": [{"id": 1}]}
+        try:
+            etag = client.put("/rooms/ABC123/teams/Team Alpha/board",
+                              json={"board_state": board}).headers["ETag"]
+            response = client.put(
+                "/rooms/ABC123/teams/Team Alpha/circumstance",
+                json={"circumstance": "Flood"}, headers={"If-Match": etag})
+            stale = client.put(
+                "/rooms/ABC123/teams/Team Alpha/circumstance",
+                json={"circumstance": "Drought"}, headers={"If-Match": etag})
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 200
+        assert response.headers["ETag"] == '"2"'
+        assert stale.status_code == 409
+        assert stale.json()["detail"]["team"]["gameboard_state"] == board
+        assert stale.json()["detail"]["team"]["circumstance"] == "Flood"
+        assert not mock_db_instance.rooms.update_one.called
+
+    @patch('backend.app.api.async_db', new_callable=AsyncDatabaseMock)
+    def test_reads_overtaken_by_flushes_give_up(self, mock_db_instance):
+        """Test that a team that can't be loaded gets a 503, not a loop"""
+        mock_db_instance.rooms.find_one.return_value = {
+            "_id": "room-1",
+            "room_code": "ABC123",
+            "teams": [{"team_name": "Team Alpha", "revision": 2}]
+        }
+        with patch.object(write_buffer, "load", return_value=False):
+            response = client.put(
+                "/rooms/ABC123/teams/Team Alpha/energy", json={"change": 1})
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert mock_db_instance.rooms.find_one.call_count == 3
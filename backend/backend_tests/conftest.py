@@ -1,12 +1,21 @@
 """ backend/backend_tests/conftest.py """
 from unittest.mock import MagicMock, patch
 
+import pytest
+
+from backend.backend_tests.mocks import AsyncDatabaseMock
+
 _MONGO_PATCHER = None
+_ASYNC_MONGO_PATCHER = None
 
 
-def pytest_configure(config):  # pylint: disable=unused-argument
+def pytest_configure(config):
     """Patch MongoDB before any test modules are imported"""
-    global _MONGO_PATCHER  # pylint: disable=global-statement
+    global _MONGO_PATCHER, _ASYNC_MONGO_PATCHER  # pylint: disable=global-statement
+
+    config.addinivalue_line(
+        "markers", "import_budget: checks wall-clock import time against "
+        "IMPORT_TIME_BUDGET_MS")
 
     mock_client = MagicMock()
     mock_db = MagicMock()
@@ -19,8 +28,28 @@ def pytest_configure(config):  # pylint: disable=unused-argument
         return_value=mock_client)
     _MONGO_PATCHER.start()
 
+    mock_async_client = MagicMock()
+    mock_async_client.get_database.return_value = AsyncDatabaseMock()
+
+    _ASYNC_MONGO_PATCHER = patch(
+        'pymongo.asynchronous.mongo_client.AsyncMongoClient',
+        return_value=mock_async_client)
+    _ASYNC_MONGO_PATCHER.start()
+
 
 def pytest_unconfigure(config):  # pylint: disable=unused-argument
     """Clean up the patch after all tests"""
     if _MONGO_PATCHER:
         _MONGO_PATCHER.stop()
+    if _ASYNC_MONGO_PATCHER:
+        _ASYNC_MONGO_PATCHER.stop()
+
+
+@pytest.fixture(autouse=True)
+def empty_document_caches():
+    """Stop cached templates and instructions leaking between tests"""
+    # Imported here so the app is only loaded once MongoDB is patched
+    from backend.app.api import (  # pylint: disable=import-outside-toplevel
+        board_templates, instructions)
+    board_templates.invalidate()
+    instructions.invalidate()
@@ -0,0 +1,44 @@
+""" backend/backend_tests/mocks.py """
+from unittest.mock import AsyncMock, MagicMock
+
+# Methods that are coroutines on the async driver's databases, collections
+# and cursors
+ASYNC_METHODS = {
+    "bulk_write", "command", "count_documents", "create_index", "distinct",
+    "delete_many", "delete_one", "find_one", "find_one_and_update",
+    "insert_many", "insert_one", "list_collection_names", "server_info",
+    "to_list", "update_many", "update_one",
+}
+
+
+class AsyncDatabaseMock(MagicMock):
+    """
+    MagicMock standing in for an AsyncDatabase.
+
+    Collection methods such as find_one are awaitable and return their
+    return_value, while find() stays synchronous and returns a cursor whose
+    to_list() is awaitable, matching the async driver's API.
+    """
+
+    def _get_child_mock(self, /, **kwargs):
+        if kwargs.get("name") in ASYNC_METHODS:
+            return AsyncMock(**kwargs)
+        return super()._get_child_mock(**kwargs)
+
+
+def mock_expired_rooms(mock_db, count: int, policy_field="game_started_at"):
+    """
+    Make a mocked sync database return `count` rooms for cleanup from the
+    expiry policy that filters `policy_field` by age, and none from others.
+    """
+    rooms = [{"_id": room_id} for room_id in range(count)]
+
+    def find(query, *args, **kwargs):  # pylint: disable=unused-argument
+        cursor = MagicMock()
+        aged = isinstance(query.get(policy_field), dict) and \
+            "$lt" in query[policy_field]
+        cursor.sort.return_value.limit.return_value = rooms if aged else []
+        return cursor
+
+    mock_db.maintenance.find_one.return_value = None
+    mock_db.rooms.find.side_effect = find
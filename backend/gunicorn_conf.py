@@ -0,0 +1,93 @@
+"""
+Gunicorn settings for running the backend in production.
+
+Gunicorn supervises uvicorn workers that run on uvloop and httptools. On
+SIGTERM it stops accepting connections and gives each worker GRACEFUL_TIMEOUT
+seconds to finish in-flight requests and run the app's shutdown (scheduler
+stop, write-behind flush) before it is killed.
+
+Settings come from the environment:
+    PORT               port to bind on all interfaces (8000)
+    WEB_CONCURRENCY    worker processes (one per CPU the container may
+                       use, within its cpuset and CPU limit). Each
+                       worker is told the count, and write-behind
+                       buffering stays off with more than one, since its
+                       buffer is per process
+    KEEP_ALIVE         seconds to hold idle keep-alive connections (5)
+    BACKLOG            pending connections the listen socket queues (2048)
+    GRACEFUL_TIMEOUT   seconds workers get to drain on shutdown (30)
+    WORKER_TIMEOUT     seconds before a silent worker is restarted (60)
+    PRELOAD            "true" imports the app once before forking workers
+    PROMETHEUS_MULTIPROC_DIR
+                       where workers keep their metrics, so /metrics can
+                       add them up (a directory under the temp dir)
+"""
+import os
+import shutil
+import tempfile
+
+from prometheus_client import multiprocess
+from pymongo.common import MAX_POOL_SIZE
+from uvicorn_worker import UvicornWorker
+
+from backend.app.cpus import available_cpus, cpus_per_worker
+
+
+def default_workers() -> int:
+    """
+    One worker per CPU the pod may use, counting a CPU limit as well as
+    cpusets. Each worker is an event loop that already overlaps its
+    requests' database waits, so extra workers only add contention.
+    """
+    return max(1, available_cpus())
+
+
+class ProductionWorker(UvicornWorker):
+    """Uvicorn worker pinned to uvloop and httptools"""
+
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(default_workers())))
+worker_class = "backend.gunicorn_conf.ProductionWorker"
+keepalive = int(os.getenv("KEEP_ALIVE", "5"))
+backlog = int(os.getenv("BACKLOG", "2048"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+preload_app = os.getenv("PRELOAD", "false").lower() == "true"
+metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR", os.path.join(
+    tempfile.gettempdir(), "prometheus_multiproc"))
+# Set by gunicorn in the master before the app is imported
+raw_env = [f"PROMETHEUS_MULTIPROC_DIR={metrics_dir}"]
+
+
+def on_starting(server):  # pylint: disable=unused-argument
+    """Start without metrics left over from an earlier run."""
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_fork(server, worker):  # pylint: disable=unused-argument
+    """Tell the worker how many workers there are, including -w overrides."""
+    os.environ["WEB_CONCURRENCY"] = str(server.cfg.workers)
+
+
+def child_exit(server, worker):  # pylint: disable=unused-argument
+    """Drop an exited worker's in-progress gauges from /metrics."""
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def when_ready(server):
+    """Log the concurrency the deployment actually gets."""
+    server.log.info(
+        "Serving on %s with %d workers (uvloop, httptools, keep-alive %ds, "
+        "backlog %d, preload %s)",
+        bind, server.cfg.workers, keepalive, backlog, preload_app)
+    server.log.info(
+        "Per worker: %s threadpool threads, %s MongoDB connections per "
+        "client, %s password hashing processes",
+        os.getenv("THREADPOOL_TOKENS", "40"),
+        os.getenv("MONGO_MAX_POOL_SIZE", str(MAX_POOL_SIZE)),
+        os.getenv("HASH_WORKERS",
+                  str(min(4, cpus_per_worker(server.cfg.workers)))))
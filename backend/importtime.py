@@ -0,0 +1,75 @@
+"""
+Import-time report for the backend.
+
+Imports a module in a fresh interpreter under `python -X importtime` and
+lists the slowest imports by cumulative time:
+
+    python -m backend.importtime                  # backend.main, top 25
+    python -m backend.importtime backend.app.api --top 10
+
+backend_tests/backend_importtime_test.py fails if importing backend.main
+takes longer than IMPORT_TIME_BUDGET_MS.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, NamedTuple
+
+IMPORT_TIME_BUDGET_MS = int(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def measure(module: str = "backend.main") -> List[ImportTime]:
+    """Import `module` in a new interpreter and return its import times."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True)
+
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        records.append(ImportTime(name.strip(), int(self_us),
+                                  int(cumulative_us), depth))
+    return records
+
+
+def total_ms(records: List[ImportTime], module: str) -> float:
+    """Cumulative import time of `module` in milliseconds."""
+    return next(record.cumulative_us for record in records
+                if record.module == module) / 1000
+
+
+def report(records: List[ImportTime], module: str, top: int = 25) -> str:
+    """The `top` slowest imports, one per line."""
+    lines = [f"{module}: {total_ms(records, module):.0f} ms "
+             f"(budget {IMPORT_TIME_BUDGET_MS} ms)",
+             f"{'cumulative':>12} {'self':>10}  module"]
+    slowest = sorted(records, key=lambda record: record.cumulative_us,
+                     reverse=True)[:top]
+    for record in slowest:
+        lines.append(f"{record.cumulative_us / 1000:>9.1f} ms "
+                     f"{record.self_us / 1000:>7.1f} ms  "
+                     f"{'  ' * record.depth}{record.module}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("module", nargs="?", default="backend.main")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args(argv)
+    print(report(measure(args.module), args.module, args.top))
+
+
+if __name__ == "__main__":
+    main()
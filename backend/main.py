@@ -1,52 +1,96 @@
 """run uvicorn app"""
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
 
-import uvicorn
-from apscheduler.schedulers.background import BackgroundScheduler
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from backend.app.api import router
-from backend.app.cleanup import cleanup_old_games, create_cleanup_index
-from backend.app.db import initialize_database
+from backend.app.admission import AdmissionControlMiddleware
+from backend.app.api import board_templates, instructions, router
+from backend.app.bandwidth import room_bandwidth
+from backend.app.cleanup import cleanup_old_games
+from backend.app.hashing import password_hasher
+from backend.app.health import health_monitor
+from backend.app.jobs import job_history
+from backend.app.lazy import LazyProxy
+from backend.app.leader import maintenance_lease
+from backend.app.logs import RequestIdMiddleware, queue_logging
+from backend.app.loop_monitor import loop_monitor
+from backend.app.metrics import MetricsMiddleware
+from backend.app.profiling import PROFILING_ENABLED, ProfilingMiddleware
+from backend.app.query_monitor import QueryStatsMiddleware
+from backend.app.server_timing import SERVER_TIMING, ServerTimingMiddleware
+from backend.app.threadpool import configure_threadpool
+from backend.app.tracing import TracingMiddleware, tracing
+from backend.app.warmup import warm_up
+from backend.app.write_behind import write_buffer
+
+def _create_scheduler():
+    # APScheduler is only needed once the app starts outside tests
+    from apscheduler.schedulers.background import (  # pylint: disable=import-outside-toplevel
+        BackgroundScheduler)
+    return BackgroundScheduler()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 
 # Create scheduler instance
-scheduler = BackgroundScheduler()
+scheduler = LazyProxy(_create_scheduler)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):  # pylint: disable=unused-argument
     """Handle startup and shutdown events"""
     # Startup
+    # Each worker starts its own log listener thread
+    queue_logging.start()
+    # Each worker exports its own spans
+    tracing.configure()
+    configure_threadpool()
+    warm_up_task = None
     if os.getenv('TESTING') != 'true':
-        initialize_database()
-        create_cleanup_index()
+        # Connections, indexes and caches are prepared in the background;
+        # /readyz reports ready once they are
+        warm_up_task = asyncio.create_task(
+            warm_up(board_templates, instructions))
+        loop_monitor.start()
+
+        # Every process runs the scheduler, but maintenance jobs only do
+        # work in the one holding the maintenance lease
+        maintenance_lease.start()
 
         # Schedule cleanup task to run every 2 hours
         scheduler.add_job(
-            cleanup_old_games,
+            maintenance_lease.leader_only(cleanup_old_games),
             'interval',
             hours=2,
             id='cleanup_old_games',
             replace_existing=True
         )
+        job_history.listen(scheduler)
         scheduler.start()
         logging.info("Scheduler started: cleanup runs every 2 hours")
+        health_monitor.start(scheduler)
+        write_buffer.start()
+        room_bandwidth.start()
 
     yield
 
     # Shutdown
-    if scheduler.running:
+    if warm_up_task:
+        warm_up_task.cancel()
+    loop_monitor.stop()
+    health_monitor.stop()
+    if scheduler.created and scheduler.running:
         scheduler.shutdown()
         logging.info("Scheduler shut down")
+    maintenance_lease.stop()
+    # Flush buffered board and energy updates before the process exits
+    write_buffer.stop()
+    await room_bandwidth.stop()
+    password_hasher.shutdown()
+    tracing.shutdown()
+    queue_logging.stop()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -57,6 +101,19 @@ origins = [
     "https://walkamile.ext.ocp-test-0.k8s.it.helsinki.fi"
 ]
 ORIGIN_REGEX = r"^https?://([a-z0-9-]+\.)*ext\.ocp-test-0\.k8s\.it\.helsinki\.fi(:\d+)?$"
+# Each middleware added wraps the ones before it. CORS is outermost so shed
+# responses still carry CORS headers, and request IDs, metrics and tracing
+# wrap admission control so shed requests are counted, logged and traced too
+if SERVER_TIMING:
+    # Inside QueryStatsMiddleware, so it can read the request's DB time
+    app.add_middleware(ServerTimingMiddleware)
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(AdmissionControlMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(MetricsMiddleware, bandwidth=room_bandwidth)
+app.add_middleware(RequestIdMiddleware)
 app.add_middleware(
     CORSMiddleware,
     # This must be changed before production.
@@ -65,11 +122,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-Token-Refresh"]
+    expose_headers=["X-Token-Refresh", "ETag", "Retry-After",
+                    "X-Request-ID", "X-Profile-ID", "Server-Timing",
+                    "X-Trace-ID"]
 )
 
 app.include_router(router)
 
 # test
 if __name__ == "__main__":
+    import uvicorn  # pylint: disable=import-outside-toplevel
     uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, reload=True)
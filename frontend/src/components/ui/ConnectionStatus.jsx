@@ -8,18 +8,15 @@ const ConnectionStatus = () => {
   const checkConnection = async () => {
     setBackendStatus('checking');
     try {
-      const response = await fetch(`${API_BASE}/health`);
+      // /readyz serves a database status the backend refreshes on its own,
+      // so polling it costs MongoDB nothing
+      const response = await fetch(`${API_BASE}/readyz`);
+      const data = await response.json();
 
-      if (response.ok) {
-        const data = await response.json();
-
-        if (data.status === 'healthy') {
-          setBackendStatus('connected');
-        } else if (data.status === 'unhealthy') {
-          setBackendStatus('unhealthy');
-        } else {
-          setBackendStatus('error');
-        }
+      if (data.database?.status === 'ok') {
+        setBackendStatus('connected');
+      } else if (data.database?.status === 'error') {
+        setBackendStatus('unhealthy');
       } else {
         setBackendStatus('error');
       }
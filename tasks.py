@@ -86,7 +86,10 @@ def server(c, backend=False, frontend=False):
                 stderr=subprocess.STDOUT,
                 universal_newlines=True,
                 bufsize=1,
-                preexec_fn=os.setsid
+                preexec_fn=os.setsid,
+                # Readable log lines and blocking call reports locally
+                env={"LOG_FORMAT": "text", "LOOP_BLOCKING_DETECTOR": "true",
+                     **os.environ}
             )
             proc.pgid = proc.pid  # process group ID
             _processes.append(proc)
@@ -166,6 +169,16 @@ def server(c, backend=False, frontend=False):
     except KeyboardInterrupt:
         signal_handler(signal.SIGINT, None)
 
+@task
+def serve(c):
+    """Run the backend for production: gunicorn with uvicorn workers"""
+    c.run("gunicorn backend.main:app -c backend/gunicorn_conf.py", pty=False)
+
+@task
+def importtime(c, module="backend.main", top=25):
+    """Show the slowest imports when importing the backend"""
+    c.run(f"python -m backend.importtime {module} --top {top}", pty=False)
+
 @task
 def test(c, backend=False, frontend=False, e2e=False):
     """Run tests for frontend and/or backend pytest and vitest respectively, or e2e tests"""